@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import argparse
+import firebase_client
+
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 400
+
+# School code the uploader used when none was given
+DEFAULT_SCHOOL_CODE = 'DMT'
+
+
+def storage_school_codes(bucket):
+    """
+    Map lesson IDs to the school their images are stored under
+
+    Images live under schools/SCHOOL_CODE/lessons/LESSON_ID/, so listing the
+    folder names alone (no objects) finds the school of every lesson with
+    images in a few listing pages.
+
+    Returns:
+        dict: lesson_id -> school code
+    """
+    schools = bucket.list_blobs(prefix='schools/', delimiter='/')
+    for _ in schools:
+        pass
+
+    lesson_schools = {}
+    for school_prefix in sorted(schools.prefixes):
+        school_code = school_prefix.split('/')[1]
+        lessons = bucket.list_blobs(prefix=f"{school_prefix}lessons/", delimiter='/')
+        for _ in lessons:
+            pass
+        for lesson_prefix in lessons.prefixes:
+            lesson_schools.setdefault(lesson_prefix.rstrip('/').split('/')[-1], school_code)
+
+    return lesson_schools
+
+
+def backfill_school_code(db, bucket, default_school_code=DEFAULT_SCHOOL_CODE, dry_run=False):
+    """
+    Add school_code to lessons uploaded before the uploader wrote it
+
+    lesson_catalog.py filters on school_code, which only matches lessons
+    that have the field. Each lesson gets the school its images are stored
+    under in Storage, or default_school_code if it has no images.
+
+    Args:
+        db: Firestore client
+        bucket: Storage bucket of the lessons
+        default_school_code (str): School code for lessons without images
+        dry_run (bool): Only count the lessons that would be updated
+
+    Returns:
+        dict: school code -> number of lessons updated (or that would be updated)
+    """
+    lesson_schools = storage_school_codes(bucket)
+
+    batch = db.batch()
+    pending = 0
+    updated = {}
+
+    for snapshot in db.collection('lessons').select(['school_code']).stream():
+        if snapshot.to_dict().get('school_code'):
+            continue
+
+        school_code = lesson_schools.get(snapshot.id, default_school_code)
+        updated[school_code] = updated.get(school_code, 0) + 1
+
+        if dry_run:
+            continue
+
+        batch.update(snapshot.reference, {'school_code': school_code})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add school_code to previously uploaded lessons')
+    parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--storage-bucket', help='Firebase Storage bucket name (optional)')
+    parser.add_argument('--default-school-code', default=DEFAULT_SCHOOL_CODE,
+                        help='School code for lessons without images in Storage')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the lessons that need a school code')
+
+    args = parser.parse_args()
+
+    updated = backfill_school_code(
+        firebase_client.get_firestore(args.firebase_credentials),
+        firebase_client.get_bucket(args.firebase_credentials, args.storage_bucket),
+        args.default_school_code,
+        args.dry_run
+    )
+
+    for school_code, count in sorted(updated.items()):
+        print(f"  {school_code}: {count} lessons")
+    if args.dry_run:
+        print(f"{sum(updated.values())} lessons need a school code")
+    else:
+        print(f"Added a school code to {sum(updated.values())} lessons")
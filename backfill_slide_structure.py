@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import argparse
+import firebase_client
+import slide_structure
+
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 400
+
+
+def backfill_slide_structure(db, dry_run=False):
+    """
+    Add structured titles and blocks to slides uploaded before the structured model
+
+    Every slide is read once through a collection group query; slides that
+    already have blocks are skipped and the rest are updated in batches.
+
+    Args:
+        db: Firestore client
+        dry_run (bool): Only count the slides that would be updated
+
+    Returns:
+        int: Number of slides updated (or that would be updated)
+    """
+    batch = db.batch()
+    pending = 0
+    updated = 0
+
+    for snapshot in db.collection_group('slides').select(['title', 'content', 'blocks']).stream():
+        slide_data = snapshot.to_dict()
+        if 'blocks' in slide_data:
+            continue
+
+        slide_structure.ensure_slide_structure(slide_data)
+        updated += 1
+
+        if dry_run:
+            continue
+
+        batch.update(snapshot.reference, {'title': slide_data['title'], 'blocks': slide_data['blocks']})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add structured titles and blocks to previously uploaded slides')
+    parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the slides that need updating')
+
+    args = parser.parse_args()
+
+    updated = backfill_slide_structure(firebase_client.get_firestore(args.firebase_credentials), args.dry_run)
+
+    if args.dry_run:
+        print(f"{updated} slides need structured content")
+    else:
+        print(f"Updated {updated} slides with structured content")
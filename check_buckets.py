@@ -1,19 +1,19 @@
 #!/usr/bin/env python3
-import firebase_admin
-from firebase_admin import credentials, storage
+import firebase_client
 import json
 import argparse
 
 def check_firebase_connection(firebase_credentials_path):
     """
-    Check Firebase connection and list available storage buckets
+    Check Firebase connection and find the project's storage bucket
+    
+    The bucket found here is cached for the other tools (see firebase_client.py).
     
     Args:
         firebase_credentials_path (str): Path to Firebase credentials JSON file
     """
     # Load credentials
     print(f"Loading credentials from {firebase_credentials_path}")
-    cred = credentials.Certificate(firebase_credentials_path)
     
     # Get project ID from credentials
     with open(firebase_credentials_path, 'r') as f:
@@ -21,39 +21,17 @@ def check_firebase_connection(firebase_credentials_path):
         project_id = cred_data.get('project_id')
         print(f"Project ID: {project_id}")
     
-    # Initialize Firebase without specifying bucket
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        firebase_admin.initialize_app(cred)
+    firebase_client.get_app(firebase_credentials_path)
     
     print("Firebase initialized successfully")
     
-    # Try to access default bucket
+    # Probe the candidate bucket names and refresh the cached answer
+    print("\nTrying bucket names:")
     try:
-        bucket = storage.bucket()
-        print(f"Default bucket name: {bucket.name}")
-        print(f"Testing bucket exists: {bucket.exists()}")
+        bucket_name = firebase_client.resolve_bucket_name(firebase_credentials_path, refresh=True, verbose=True)
+        print(f"\nUsing bucket: {bucket_name}")
     except Exception as e:
-        print(f"Error accessing default bucket: {e}")
-    
-    # Try alternative bucket names
-    alternative_buckets = [
-        f"{project_id}.appspot.com",
-        project_id,
-        f"gs://{project_id}.appspot.com",
-        f"gs://{project_id}"
-    ]
-    
-    print("\nTrying alternative bucket names:")
-    for bucket_name in alternative_buckets:
-        try:
-            bucket = storage.bucket(bucket_name)
-            exists = bucket.exists()
-            print(f"Bucket '{bucket_name}': {'Exists' if exists else 'Does not exist'}")
-        except Exception as e:
-            print(f"Error accessing bucket '{bucket_name}': {e}")
+        print(f"Error resolving storage bucket: {e}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Check Firebase connection and storage')
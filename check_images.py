@@ -1,20 +1,11 @@
 #!/usr/bin/env python3
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+import firebase_client
 import sys
 
 def check_images():
-    # Initialize Firebase
-    try:
-        app = firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        cred = credentials.Certificate('config/service_account.json')
-        app = firebase_admin.initialize_app(cred, {'storageBucket': 'logit-lms.appspot.com'})
-    
     # Initialize Firestore and Storage
-    db = firestore.client()
-    bucket = storage.bucket()
+    db = firebase_client.get_firestore()
+    bucket = firebase_client.get_bucket()
     
     print("\n===== CHECKING FOR LESSON IMAGES IN FIREBASE =====\n")
     
@@ -1,20 +1,11 @@
 #!/usr/bin/env python3
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+import firebase_client
 import sys
 
 def check_images():
-    # Initialize Firebase
-    try:
-        app = firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        cred = credentials.Certificate('config/service_account.json')
-        app = firebase_admin.initialize_app(cred, {'storageBucket': 'diving-app-8fa28.firebasestorage.app'})
-    
     # Initialize Firestore and Storage
-    db = firestore.client()
-    bucket = storage.bucket()
+    db = firebase_client.get_firestore()
+    bucket = firebase_client.get_bucket()
     
     print("\n===== CHECKING FOR LESSON IMAGES IN FIREBASE =====\n")
     print(f"Using storage bucket: {bucket.name}")
@@ -1,67 +1,67 @@
 #!/usr/bin/env python3
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+import firebase_client
 import sys
+import argparse
+from itertools import islice
+import lesson_catalog
+import lesson_mirror
 
-def check_lessons():
-    # Initialize Firebase
-    try:
-        app = firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        cred = credentials.Certificate('config/service_account.json')
-        app = firebase_admin.initialize_app(cred)
-    
-    # Initialize Firestore
-    db = firestore.client()
-    
-    # Get all lessons
-    lessons = db.collection('lessons').stream()
-    
-    found_lesson_01 = False
-    found_lesson_02 = False
+def check_lessons(mirror_path=None, limit=50):
+    """
+    Check which lessons exist in Firebase
+
+    Args:
+        mirror_path (str): Read from this local SQLite mirror instead of Firestore (optional)
+        limit (int): Number of most recent lessons to list (None lists every lesson)
+    """
+    if mirror_path:
+        conn = lesson_mirror.open_mirror(mirror_path)
+        lessons = islice(lesson_mirror.mirror_lessons(conn), limit)
+        find_lessons = lambda title: lesson_mirror.mirror_lessons_by_title(conn, title)[:1]
+        get_slides = lambda lesson_id: lesson_mirror.mirror_slides(conn, lesson_id)
+    else:
+        # Initialize Firestore
+        db = firebase_client.get_firestore()
+        
+        # Page through the most recent lessons instead of streaming the whole collection
+        lessons = lesson_catalog.iter_catalog(db, limit=limit)
+        find_lessons = lambda title: list(db.collection('lessons').where('title', '==', title).limit(1).stream())
+        get_slides = lambda lesson_id: list(db.collection('lessons').document(lesson_id).collection('slides').stream())
     
     print("\n===== CHECKING FOR LESSONS IN FIREBASE =====\n")
     
-    # List all lessons
-    print("All lessons in the database:")
+    # List the most recent lessons, newest first
+    print("All lessons in the database:" if limit is None else f"{limit} most recent lessons in the database:")
     for lesson in lessons:
         lesson_data = lesson.to_dict()
         title = lesson_data.get('title')
         print(f"  - Lesson ID: {lesson.id}, Title: {title}")
-        
-        if title == "Lesson_01":
-            found_lesson_01 = True
-        elif title == "Lesson_02":
-            found_lesson_02 = True
+    
+    # Look the lessons up by title rather than relying on them being listed above
+    lesson_01_docs = find_lessons('Lesson_01')
+    lesson_02_docs = find_lessons('Lesson_02')
     
     print("\nSearching for specific lessons:")
-    print(f"Lesson_01: {'Found ✅' if found_lesson_01 else 'Not Found ❌'}")
-    print(f"Lesson_02: {'Found ✅' if found_lesson_02 else 'Not Found ❌'}")
+    print(f"Lesson_01: {'Found ✅' if lesson_01_docs else 'Not Found ❌'}")
+    print(f"Lesson_02: {'Found ✅' if lesson_02_docs else 'Not Found ❌'}")
     
     # Check if we can query specifically
     print("\nTrying direct query for Lesson_01 and Lesson_02:")
     
-    lesson_01_query = db.collection('lessons').where('title', '==', 'Lesson_01').limit(1).stream()
-    lesson_01_docs = list(lesson_01_query)
     if lesson_01_docs:
         print(f"Lesson_01 found via query: {lesson_01_docs[0].id}")
         
         # Check if it has slides
-        slides = db.collection('lessons').document(lesson_01_docs[0].id).collection('slides').stream()
-        slides_list = list(slides)
+        slides_list = get_slides(lesson_01_docs[0].id)
         print(f"  - Has {len(slides_list)} slides")
     else:
         print("Lesson_01 not found via direct query")
     
-    lesson_02_query = db.collection('lessons').where('title', '==', 'Lesson_02').limit(1).stream()
-    lesson_02_docs = list(lesson_02_query)
     if lesson_02_docs:
         print(f"Lesson_02 found via query: {lesson_02_docs[0].id}")
         
         # Check if it has slides
-        slides = db.collection('lessons').document(lesson_02_docs[0].id).collection('slides').stream()
-        slides_list = list(slides)
+        slides_list = get_slides(lesson_02_docs[0].id)
         print(f"  - Has {len(slides_list)} slides")
     else:
         print("Lesson_02 not found via direct query")
@@ -69,4 +69,10 @@ def check_lessons():
     print("\n====== END OF LESSON CHECK ======\n")
 
 if __name__ == "__main__":
-    check_lessons() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Check which lessons exist in Firebase')
+    parser.add_argument('--mirror', help='Read from a local SQLite mirror (see lesson_mirror.py) instead of Firestore')
+    parser.add_argument('--limit', type=int, default=50, help='Number of most recent lessons to list')
+    parser.add_argument('--all', action='store_true', help='List every lesson instead of the most recent ones')
+    
+    args = parser.parse_args()
+    check_lessons(args.mirror, None if args.all else args.limit) 
\ No newline at end of file
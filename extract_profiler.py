@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Default time between stack samples of the profiled thread, in seconds
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Image size buckets used to group image work, in bytes
+IMAGE_SIZE_BUCKETS = [
+    (100 * 1024, '< 100 KB'),
+    (1024 * 1024, '100 KB - 1 MB'),
+    (5 * 1024 * 1024, '1 - 5 MB'),
+    (None, '> 5 MB')
+]
+
+
+def image_size_bucket(size):
+    """
+    Label of the IMAGE_SIZE_BUCKETS range a byte count falls in
+    """
+    for limit, label in IMAGE_SIZE_BUCKETS:
+        if limit is None or size < limit:
+            return label
+
+
+class _Stats:
+    __slots__ = ('calls', 'seconds', 'peak_bytes', 'image_bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_bytes = 0
+        self.image_bytes = 0
+
+
+class ExtractionProfiler:
+    """
+    Opt-in profiler for extract_pptx_content
+
+    Code marks its phases with profiler.phase(...); every phase records wall
+    time and the peak memory allocated while it ran (tracemalloc), grouped
+    by phase name, slide, shape type and image size. A background thread
+    samples the profiled thread's stack at a fixed interval, which gives
+    function-level hot spots and a collapsed-stack file for flame graphs.
+    """
+
+    def __init__(self, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.groups = {'phase': {}, 'slide': {}, 'shape type': {}, 'image size': {}}
+        self.stacks = Counter()
+        self.total_seconds = 0.0
+        self.peak_bytes = 0
+        self._frames = []
+        self._thread_id = None
+        self._sampler = None
+        self._stopping = threading.Event()
+        self._started = None
+
+    def start(self):
+        """
+        Start memory tracing and stack sampling of the calling thread
+        """
+        tracemalloc.start()
+        self._thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._sampler = threading.Thread(target=self._sample, name='extract-profiler', daemon=True)
+        self._sampler.start()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """
+        Stop sampling and memory tracing
+        """
+        self.total_seconds = time.perf_counter() - self._started
+        self._stopping.set()
+        self._sampler.join()
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    def _sample(self):
+        while not self._stopping.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    @contextmanager
+    def phase(self, name, slide=None, shape_type=None, image_bytes=None):
+        """
+        Time a block of work and attribute it to its slide, shape type and image size
+
+        Phases may be nested; the peak memory and image bytes of an inner
+        phase also count towards the phases around it.
+
+        Args:
+            name (str): Phase name, e.g. 'load', 'text', 'image write'
+            slide (int): Slide number the work belongs to (optional)
+            shape_type (str): Shape type the work belongs to (optional)
+            image_bytes (int): Size of the image being handled (optional)
+        """
+        current, peak_so_far = tracemalloc.get_traced_memory()
+        if self._frames:
+            # Resetting the peak below would lose the enclosing phase's peak so far
+            self._frames[-1]['peak'] = max(self._frames[-1]['peak'], peak_so_far)
+        frame = {'start': current, 'peak': current, 'image_bytes': image_bytes or 0}
+        self._frames.append(frame)
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            peak = max(tracemalloc.get_traced_memory()[1], frame['peak'])
+            self._frames.pop()
+            if self._frames:
+                self._frames[-1]['peak'] = max(self._frames[-1]['peak'], peak)
+                self._frames[-1]['image_bytes'] += frame['image_bytes']
+            self.peak_bytes = max(self.peak_bytes, peak)
+            tracemalloc.reset_peak()
+
+            allocated = peak - frame['start']
+            total_image_bytes = frame['image_bytes']
+            self._record('phase', name, seconds, allocated, total_image_bytes)
+            if slide is not None:
+                self._record('slide', slide, seconds, allocated, total_image_bytes)
+            if shape_type is not None:
+                self._record('shape type', shape_type, seconds, allocated, total_image_bytes)
+            if image_bytes is not None:
+                self._record('image size', image_size_bucket(image_bytes), seconds, allocated, total_image_bytes)
+
+    def _record(self, group, key, seconds, allocated, image_bytes):
+        stats = self.groups[group].get(key)
+        if stats is None:
+            stats = self.groups[group][key] = _Stats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.peak_bytes = max(stats.peak_bytes, allocated)
+        stats.image_bytes += image_bytes
+
+    def hot_functions(self, limit=20):
+        """
+        Functions ranked by the number of samples in which they were running
+
+        Returns:
+            list: (function, self samples, total samples) tuples
+        """
+        self_samples = Counter()
+        total_samples = Counter()
+        for stack, count in self.stacks.items():
+            functions = stack.split(';')
+            self_samples[functions[-1]] += count
+            for function in set(functions):
+                total_samples[function] += count
+        return [(function, count, total_samples[function]) for function, count in self_samples.most_common(limit)]
+
+    def write_report(self, path, title='', limit=15):
+        """
+        Write the ranked hot-spot report as plain text
+        """
+        sample_count = sum(self.stacks.values())
+        lines = [
+            f"Extraction profile: {title}",
+            f"Total: {self.total_seconds:.2f} s, peak traced memory {self.peak_bytes / (1024 * 1024):.1f} MB, "
+            f"{sample_count} stack samples every {self.sample_interval * 1000:.0f} ms",
+        ]
+
+        for group, groups in self.groups.items():
+            if not groups:
+                continue
+            lines.append("")
+            lines.append(f"By {group} (slowest first)")
+            lines.append(f"  {'':<24} {'calls':>7} {'total s':>9} {'mean ms':>9} {'peak MB':>9} {'image MB':>9}")
+            ranked = sorted(groups.items(), key=lambda item: item[1].seconds, reverse=True)[:limit]
+            for key, stats in ranked:
+                lines.append(
+                    f"  {str(key):<24} {stats.calls:>7} {stats.seconds:>9.3f} "
+                    f"{stats.seconds / stats.calls * 1000:>9.2f} {stats.peak_bytes / (1024 * 1024):>9.2f} "
+                    f"{stats.image_bytes / (1024 * 1024):>9.2f}"
+                )
+
+        if sample_count:
+            lines.append("")
+            lines.append("Hot functions (self samples)")
+            for function, self_count, total_count in self.hot_functions(limit):
+                lines.append(
+                    f"  {self_count / sample_count:>6.1%} self {total_count / sample_count:>6.1%} total  {function}"
+                )
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def write_folded(self, path):
+        """
+        Write collapsed stacks ("frame;frame;frame count" per line), the input
+        format of flamegraph.pl, speedscope and similar flame graph tools
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def phase(profiler, name, **labels):
+    """
+    profiler.phase(name, **labels), or a no-op when profiling is off (profiler is None)
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.phase(name, **labels)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+import os
+import json
+import threading
+import argparse
+import firebase_admin
+import usage_meter
+from firebase_admin import credentials, firestore, storage
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CREDENTIALS_PATH = 'config/service_account.json'
+
+# Resolved bucket names, per credentials file, survive between runs here
+BUCKET_CACHE_PATH = '.cache/firebase_buckets.json'
+
+# Connections kept open to Storage, enough for the thread pools used by the tools
+HTTP_POOL_SIZE = 32
+
+_lock = threading.RLock()
+_apps = {}
+_buckets = {}
+
+
+def _read_credentials(credentials_path):
+    with open(credentials_path, 'r') as f:
+        return json.load(f)
+
+
+def _cache_key(credentials_path, project_id):
+    return f"{os.path.abspath(credentials_path)}#{project_id}"
+
+
+def _load_bucket_cache():
+    if os.path.exists(BUCKET_CACHE_PATH):
+        try:
+            with open(BUCKET_CACHE_PATH, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def _save_bucket_cache(cache):
+    directory = os.path.dirname(BUCKET_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(BUCKET_CACHE_PATH, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+
+def candidate_bucket_names(project_id):
+    """
+    Bucket names a Firebase project may use, newest naming scheme first
+    """
+    return [f"{project_id}.firebasestorage.app", f"{project_id}.appspot.com"]
+
+
+def get_app(credentials_path=DEFAULT_CREDENTIALS_PATH):
+    """
+    Return the Firebase app for a credentials file, initializing it on first use
+
+    Every credentials file gets its own app, named after its absolute path,
+    so tools that work with two projects (e.g. migrate_lessons.py) never get
+    one project's client for the other. The [DEFAULT] app is never reused,
+    as nothing records which credentials it was created from.
+
+    Args:
+        credentials_path (str): Path to Firebase credentials JSON file
+
+    Returns:
+        firebase_admin.App: The app
+    """
+    key = os.path.abspath(credentials_path)
+
+    with _lock:
+        if key not in _apps:
+            try:
+                _apps[key] = firebase_admin.get_app(name=key)
+            except ValueError:
+                _apps[key] = firebase_admin.initialize_app(credentials.Certificate(credentials_path), name=key)
+
+        return _apps[key]
+
+
+def get_firestore(credentials_path=DEFAULT_CREDENTIALS_PATH):
+    """
+    Return the Firestore client of the shared app (cached per app by firebase_admin)
+
+    The client is metered: its reads, writes and deletes count towards the
+    run's usage summary and cost budget (see usage_meter.py).
+    """
+    return usage_meter.metered(firestore.client(app=get_app(credentials_path)))
+
+
+def resolve_bucket_name(credentials_path=DEFAULT_CREDENTIALS_PATH, refresh=False, verbose=False):
+    """
+    Find the Storage bucket that exists for the project in the credentials file
+
+    The answer is cached on disk per credentials file, so only the first run
+    (or a run with refresh=True) probes candidate bucket names.
+
+    Args:
+        credentials_path (str): Path to Firebase credentials JSON file
+        refresh (bool): Probe again even if a cached answer exists
+        verbose (bool): Print every probed bucket name and its result
+
+    Returns:
+        str: Bucket name
+    """
+    project_id = _read_credentials(credentials_path).get('project_id')
+    if not project_id:
+        raise ValueError(f"No project_id found in {credentials_path}")
+
+    key = _cache_key(credentials_path, project_id)
+
+    with _lock:
+        cache = _load_bucket_cache()
+        if not refresh and key in cache:
+            return cache[key]
+
+        app = get_app(credentials_path)
+        for bucket_name in candidate_bucket_names(project_id):
+            usage_meter.get_meter().record('class_b')
+            exists = storage.bucket(bucket_name, app=app).exists()
+            if verbose:
+                print(f"Bucket '{bucket_name}': {'Exists' if exists else 'Does not exist'}")
+            if exists:
+                cache[key] = bucket_name
+                _save_bucket_cache(cache)
+                return bucket_name
+
+    raise ValueError(f"No Storage bucket found for project {project_id}")
+
+
+def get_bucket(credentials_path=DEFAULT_CREDENTIALS_PATH, bucket_name=None):
+    """
+    Return a Storage bucket on the shared app, with a pooled HTTP session
+
+    Like the Firestore client, the bucket is metered (see usage_meter.py).
+
+    Args:
+        credentials_path (str): Path to Firebase credentials JSON file
+        bucket_name (str): Bucket to use instead of the resolved project bucket (optional)
+
+    Returns:
+        google.cloud.storage.Bucket
+    """
+    app = get_app(credentials_path)
+    bucket_name = bucket_name or resolve_bucket_name(credentials_path)
+
+    # Buckets are cached per app, as two projects may open the same bucket
+    key = (app.name, bucket_name)
+
+    with _lock:
+        if key not in _buckets:
+            bucket = storage.bucket(bucket_name, app=app)
+
+            # The storage client is shared per app; widen its connection pool once
+            session = getattr(bucket.client, '_http', None)
+            if session is not None and not getattr(session, '_logit_pooled', False):
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('https://', adapter)
+                session._logit_pooled = True
+
+            _buckets[key] = bucket
+
+        return usage_meter.metered(_buckets[key])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Resolve and cache the Firebase Storage bucket for a credentials file')
+    parser.add_argument('firebase_credentials', nargs='?', default=DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--refresh', action='store_true', help='Probe bucket names again instead of using the cache')
+
+    args = parser.parse_args()
+
+    bucket_name = resolve_bucket_name(args.firebase_credentials, refresh=args.refresh, verbose=args.refresh)
+    print(f"Storage bucket: {bucket_name}")
@@ -1,30 +1,23 @@
 #!/usr/bin/env python3
 import os
-import firebase_admin
-from firebase_admin import credentials, storage
+import firebase_client
 import argparse
+import signed_urls
+import usage_meter
 
-def list_firebase_storage(firebase_credentials_path):
+def list_firebase_storage(firebase_credentials_path, max_workers=8, cache_path=signed_urls.DEFAULT_CACHE_PATH):
     """
     List all files in Firebase Storage and get their download URLs
     
     Args:
         firebase_credentials_path (str): Path to Firebase credentials JSON file
+        max_workers (int): Number of URLs signed in parallel
+        cache_path (str): Signed URL cache file, reused across runs (None disables the cache)
     """
     try:
-        # Initialize Firebase
-        try:
-            app = firebase_admin.get_app()
-            print("Firebase already initialized")
-        except ValueError:
-            cred = credentials.Certificate(firebase_credentials_path)
-            app = firebase_admin.initialize_app(cred, {
-                'storageBucket': 'diving-app-8fa28.appspot.com'
-            })
-            print("Firebase initialized")
-        
         # Get bucket
-        bucket = storage.bucket(app=app)
+        bucket = firebase_client.get_bucket(firebase_credentials_path)
+        print(f"Using storage bucket: {bucket.name}")
         
         print("\n===== FILES IN FIREBASE STORAGE =====\n")
         
@@ -34,14 +27,17 @@ def list_firebase_storage(firebase_credentials_path):
             print("No files found in storage.")
             return
         
+        # Generate signed URLs that last for 1 hour, reusing still-valid ones from earlier runs
+        urls = signed_urls.generate_signed_urls(
+            blobs,
+            expiration=60 * 60,  # 1 hour
+            max_workers=max_workers,
+            cache=signed_urls.SignedUrlCache(cache_path)
+        )
+        
         # Print all files with their download URLs
         for i, blob in enumerate(blobs):
-            # Generate a signed URL that lasts for 1 hour
-            url = blob.generate_signed_url(
-                version="v4",
-                expiration=60 * 60,  # 1 hour
-                method="GET"
-            )
+            url = urls[blob.name]
             
             print(f"File {i+1}: {blob.name}")
             print(f"URL: {url}")
@@ -61,16 +57,21 @@ def list_firebase_storage(firebase_credentials_path):
                 """)
                 print("-" * 80)
     
+    except usage_meter.BudgetExceeded:
+        raise
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='List files in Firebase Storage')
     parser.add_argument('credentials', help='Path to Firebase credentials JSON file')
+    parser.add_argument('--workers', type=int, default=8, help='Number of URLs signed in parallel')
+    parser.add_argument('--url-cache', default=signed_urls.DEFAULT_CACHE_PATH, help='Signed URL cache file')
+    parser.add_argument('--no-url-cache', action='store_true', help='Sign every URL again instead of reusing cached ones')
     
     args = parser.parse_args()
     
-    list_firebase_storage(args.credentials)
+    list_firebase_storage(args.credentials, args.workers, None if args.no_url_cache else args.url_cache)
     
-    print("\nNOTE: The URLs generated are signed and will expire after 1 hour.")
+    print("\nNOTE: The URLs generated are signed and will expire within 1 hour.")
     print("To use in your app, you need to handle authentication properly.") 
\ No newline at end of file
@@ -1,64 +1,251 @@
 #!/usr/bin/env python3
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
+import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import firebase_client
 import argparse
+import lesson_mirror
 
-def check_firebase_structure(firebase_credentials_path):
+def firestore_type_name(value):
     """
-    Analyze the current structure of the Firebase database
+    Return the Firestore type name of a field value
+    """
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'double'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, bytes):
+        return 'bytes'
+    if isinstance(value, dict):
+        return 'map'
+    if isinstance(value, (list, tuple)):
+        return 'array'
+    if isinstance(value, datetime.datetime):
+        return 'timestamp'
+    if hasattr(value, 'path') and hasattr(value, 'collection'):
+        return 'reference'
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return 'geopoint'
+    return type(value).__name__
+
+def _estimate_value_size(value):
+    # Storage sizes from the Firestore documentation
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key.encode('utf-8')) + 1 + _estimate_value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_value_size(item) for item in value)
+    if isinstance(value, (bool, type(None))):
+        return 1
+    if hasattr(value, 'path') and hasattr(value, 'collection'):
+        return len(value.path.encode('utf-8')) + 1
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return 16
+    return 8
+
+def estimate_document_size(document_path, data):
+    """
+    Approximate the stored size of a document in bytes
     
     Args:
-        firebase_credentials_path (str): Path to Firebase credentials JSON file
+        document_path (str): Document path, e.g. lessons/LES_.../slides/SLIDE_1
+        data (dict): Document fields
     """
-    # Initialize Firebase
-    cred = credentials.Certificate(firebase_credentials_path)
+    name_size = sum(len(part.encode('utf-8')) + 1 for part in document_path.split('/')) + 16
+    return name_size + _estimate_value_size(data) + 32
+
+def _collection_pattern(path):
+    # lessons/LES_1/slides -> lessons/*/slides, so sibling subcollections merge
+    parts = path.split('/')
+    return '/'.join('*' if i % 2 else part for i, part in enumerate(parts))
+
+def _sample_collection(collection_ref, depth, max_depth, sample_size):
+    """
+    Sample documents of one collection and list their subcollections
+    
+    Returns:
+        tuple: (collection path, [(document path, fields)], [child collection references])
+    """
+    documents = []
+    children = []
     
-    # Check if Firebase app is already initialized
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        firebase_admin.initialize_app(cred)
+    for doc in collection_ref.limit(sample_size).stream():
+        documents.append((doc.reference.path, doc.to_dict() or {}))
+        
+        if depth < max_depth:
+            children.extend(doc.reference.collections())
     
+    parent = collection_ref.parent
+    path = f"{parent.path}/{collection_ref.id}" if parent is not None else collection_ref.id
+    return path, documents, children
+
+def _merge_documents(schema, documents):
+    # Fold sampled documents into the merged schema of their collection
+    for document_path, data in documents:
+        schema['sampled_documents'] += 1
+        schema['total_size_bytes'] += estimate_document_size(document_path, data)
+        
+        for field, value in data.items():
+            field_info = schema['fields'].setdefault(field, {'present': 0, 'types': {}})
+            field_info['present'] += 1
+            type_name = firestore_type_name(value)
+            field_info['types'][type_name] = field_info['types'].get(type_name, 0) + 1
+
+def explore_schema(db, max_depth=2, sample_size=5, max_workers=8):
+    """
+    Infer a merged schema for every collection, sampling collections concurrently
+    
+    Collections are explored breadth-first on a thread pool. Subcollections
+    of different parent documents share one schema entry, e.g. lessons/*/slides.
+    
+    Args:
+        db: Firestore client
+        max_depth (int): Number of collection levels to explore (1 = top-level only)
+        sample_size (int): Documents sampled per collection
+        max_workers (int): Number of collections sampled in parallel
+    
+    Returns:
+        dict: Collection pattern -> schema with field names, types, presence
+              ratios and approximate document size
+    """
+    schemas = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {
+            executor.submit(_sample_collection, collection, 1, max_depth, sample_size): 1
+            for collection in db.collections()
+        }
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                depth = pending.pop(future)
+                path, documents, children = future.result()
+                
+                pattern = _collection_pattern(path)
+                schema = schemas.setdefault(pattern, {
+                    'depth': depth,
+                    'sampled_collections': 0,
+                    'sampled_documents': 0,
+                    'total_size_bytes': 0,
+                    'fields': {}
+                })
+                schema['sampled_collections'] += 1
+                _merge_documents(schema, documents)
+                
+                for child in children:
+                    pending[executor.submit(_sample_collection, child, depth + 1, max_depth, sample_size)] = depth + 1
+    
+    # Turn the running totals into ratios and averages
+    report = {}
+    for pattern in sorted(schemas):
+        schema = schemas[pattern]
+        sampled = schema['sampled_documents']
+        report[pattern] = {
+            'depth': schema['depth'],
+            'sampled_collections': schema['sampled_collections'],
+            'sampled_documents': sampled,
+            'avg_document_size_bytes': round(schema['total_size_bytes'] / sampled) if sampled else 0,
+            'fields': {
+                field: {
+                    'types': dict(sorted(info['types'].items())),
+                    'presence': round(info['present'] / sampled, 3)
+                }
+                for field, info in sorted(schema['fields'].items())
+            }
+        }
+    
+    return report
+
+def check_firebase_structure(firebase_credentials_path, max_depth=2, sample_size=5, max_workers=8, report_path=None):
+    """
+    Analyze the current structure of the Firebase database
+    
+    Args:
+        firebase_credentials_path (str): Path to Firebase credentials JSON file
+        max_depth (int): Number of collection levels to explore
+        sample_size (int): Documents sampled per collection
+        max_workers (int): Number of collections sampled in parallel
+        report_path (str): Write the inferred schema to this JSON file (optional)
+    """
     # Initialize Firestore
-    db = firestore.client()
+    db = firebase_client.get_firestore(firebase_credentials_path)
     
-    # Get top-level collections
-    collections = db.collections()
+    report = explore_schema(db, max_depth, sample_size, max_workers)
     
     print("\n===== FIREBASE DATABASE STRUCTURE =====\n")
     
-    for collection in collections:
-        print(f"Collection: {collection.id}")
+    for pattern, schema in report.items():
+        indent = "  " * (schema['depth'] - 1)
+        print(f"{indent}Collection: {pattern}")
+        print(f"{indent}  Sampled {schema['sampled_documents']} documents, ~{schema['avg_document_size_bytes']} bytes each")
         
-        # Get some sample documents from each collection
-        docs = collection.limit(5).stream()
+        for field, info in schema['fields'].items():
+            types = '|'.join(info['types'])
+            print(f"{indent}  - {field}: {types} ({info['presence']:.0%})")
+    
+    print("\n========= END OF STRUCTURE ===========\n")
+    
+    if report_path:
+        # Sorted keys and stable formatting keep reports diffable between runs
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Schema report saved to: {report_path}")
+    
+    return report
+
+def check_mirror_structure(mirror_path):
+    """
+    Show the structure of the lessons collection from the local SQLite mirror,
+    without any Firestore reads
+    
+    Args:
+        mirror_path (str): Path to the SQLite mirror file (see lesson_mirror.py)
+    """
+    conn = lesson_mirror.open_mirror(mirror_path)
+    
+    print("\n===== LESSON MIRROR STRUCTURE =====\n")
+    print(f"Last sync: {lesson_mirror.last_sync_time(conn) or 'never'}")
+    print("Collection: lessons")
+    
+    for lesson in lesson_mirror.mirror_lessons(conn):
+        print(f"  - Document: {lesson.id}")
+        print(f"    Fields: {', '.join(lesson.to_dict().keys())}")
         
-        for doc in docs:
-            print(f"  - Document: {doc.id}")
-            
-            # Get fields from document
-            doc_data = doc.to_dict()
-            print(f"    Fields: {', '.join(doc_data.keys())}")
-            
-            # If this document has subcollections, show them
-            subcollections = doc.reference.collections()
-            for subcol in subcollections:
-                print(f"    - Subcollection: {subcol.id}")
-                
-                # Get sample documents from subcollection
-                subdocs = subcol.limit(3).stream()
-                for subdoc in subdocs:
-                    print(f"      - Document: {subdoc.id}")
+        slides = lesson_mirror.mirror_slides(conn, lesson.id)
+        if slides:
+            print(f"    - Subcollection: slides ({len(slides)} documents)")
+            for slide in slides:
+                print(f"      - Document: {slide.id}")
     
     print("\n========= END OF STRUCTURE ===========\n")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Check Firebase database structure')
-    parser.add_argument('firebase_credentials', help='Path to Firebase credentials JSON file')
+    parser.add_argument('firebase_credentials', nargs='?', help='Path to Firebase credentials JSON file')
+    parser.add_argument('--mirror', help='Read the lessons structure from a local SQLite mirror instead of Firestore')
+    parser.add_argument('--depth', type=int, default=2, help='Number of collection levels to explore')
+    parser.add_argument('--sample-size', type=int, default=5, help='Documents sampled per collection')
+    parser.add_argument('--workers', type=int, default=8, help='Number of collections sampled in parallel')
+    parser.add_argument('--report', help='Write the inferred schema to this JSON file')
     
     args = parser.parse_args()
     
-    check_firebase_structure(args.firebase_credentials) 
\ No newline at end of file
+    if args.mirror:
+        check_mirror_structure(args.mirror)
+    elif args.firebase_credentials:
+        check_firebase_structure(args.firebase_credentials, args.depth, args.sample_size, args.workers, args.report)
+    else:
+        parser.error('firebase_credentials is required unless --mirror is given') 
\ No newline at end of file
@@ -1,13 +1,239 @@
 #!/usr/bin/env python3
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+import firebase_client
+from firebase_admin import firestore
 import argparse
 import uuid
 import datetime
+import slide_structure
+import lesson_stats
+import upload_verifier
+from concurrent.futures import ThreadPoolExecutor
 
-def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_id=None, module_id=None, school_code="DMT", storage_bucket_name=None):
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 400
+
+# Lesson status while its slides are still being written, and once complete
+STATUS_PUBLISHING = "publishing"
+STATUS_READY = "ready"
+
+def _upload_image(bucket, local_image_path, storage_path):
+    """
+    Upload one image, make it public and return its URL
+    """
+    print(f"Uploading image: {local_image_path} to {storage_path}")
+    
+    # Upload image to Firebase Storage
+    blob = bucket.blob(storage_path)
+    blob.upload_from_filename(local_image_path)
+    
+    # Make the image publicly accessible
+    blob.make_public()
+    
+    return blob.public_url
+
+def _link_lesson_to_module(db, module_id, lesson_id):
+    """
+    Append a lesson to the lessons array of its module
+    """
+    # Get the module
+    module_ref = db.collection("modules").document(module_id)
+    module = module_ref.get()
+    
+    if module.exists:
+        # Add this lesson to the module's lessons server-side, so concurrent uploads don't overwrite each other
+        module_ref.update({"lessons": firestore.ArrayUnion([lesson_id])})
+        print(f"Module {module_id} updated with new lesson")
+    else:
+        print(f"Warning: Module {module_id} not found")
+
+def new_lesson_id():
+    """
+    Generate a lesson ID (LES_[timestamp]_[uuid])
+    """
+    # Generate a timestamp for the ID
+    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    
+    # Generate a unique ID for the lesson
+    return f"LES_{timestamp}_{str(uuid.uuid4())[:18]}"
+
+def delete_lesson(db, bucket, lesson_id, school_code="DMT", module_id=None):
+    """
+    Delete a lesson with its slides and images, e.g. what a failed upload left behind
+    
+    The lesson is removed from its module, and taken out of the module and
+    school rollups if it was complete enough to be counted in them.
+    
+    Args:
+        db: Firestore client
+        bucket: Storage bucket
+        lesson_id (str): Lesson to delete (it may not exist, or only partly)
+        school_code (str): School code the lesson was uploaded for
+        module_id (str): Module the lesson was attached to (optional)
+    
+    Returns:
+        int: Number of slides and images deleted
+    """
+    lesson_ref = db.collection("lessons").document(lesson_id)
+    lesson = lesson_ref.get()
+    lesson_data = lesson.to_dict() if lesson.exists else {}
+    module_id = lesson_data.get("module_id", module_id)
+    school_code = lesson_data.get("school_code", school_code)
+    deleted = 0
+    
+    # Images first, so a lesson document is never left pointing at missing images
+    for blob in bucket.list_blobs(prefix=f"schools/{school_code}/lessons/{lesson_id}/"):
+        blob.delete()
+        deleted += 1
+    
+    batch = db.batch()
+    pending = 0
+    for slide in lesson_ref.collection("slides").select([]).stream():
+        batch.delete(slide.reference)
+        deleted += 1
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    
+    # The lesson, its rollup counts and its module entry go together in the last batch
+    if lesson.exists:
+        batch.delete(lesson_ref)
+        if lesson_data.get("stats"):
+            lesson_stats.add_rollup_increments(batch, db, lesson_data["stats"], module_id, school_code, sign=-1)
+    if module_id and db.collection("modules").document(module_id).get().exists:
+        batch.update(db.collection("modules").document(module_id), {"lessons": firestore.ArrayRemove([lesson_id])})
+    batch.commit()
+    
+    return deleted
+
+def _finish_lesson(db, batch, lesson_data, slides, image_info):
+    """
+    Add the lesson stats and the module and school rollups to the batch that completes the lesson
+    """
+    stats = lesson_stats.compute_lesson_stats(
+        [slide_data for slide_data, _ in slides], lesson_data["boilerplate"], image_info
+    )
+    lesson_stats.add_rollup_increments(batch, db, stats, lesson_data.get("module_id"), lesson_data["school_code"])
+    return stats
+
+def _publish_progressively(db, bucket, lesson_ref, lesson_data, slides, image_info, max_workers=8):
+    """
+    Write a lesson so readers can open it while its images are still uploading
+    
+    The lesson document is written first with status "publishing". Images
+    are uploaded in parallel, queued in slide order so the first slides
+    finish first, and each slide document is written as soon as its own
+    images are done, together with the lesson's publishedSlides count.
+    The lesson becomes "ready" after the last slide, in the same batch as
+    its stats and the module and school rollups. If anything fails, the
+    remaining uploads are cancelled and the partly published lesson is
+    deleted again (see delete_lesson) before the error is raised.
+    
+    Args:
+        db: Firestore client
+        bucket: Storage bucket
+        lesson_ref: Reference of the lesson document
+        lesson_data (dict): Lesson document
+        slides (list): (slide_data, [(filename, local path, storage path)]) in slide order
+        image_info (dict): storage path -> (md5 hash, size in bytes) of every image
+        max_workers (int): Number of images uploaded in parallel
+    """
+    lesson_ref.set({**lesson_data, "status": STATUS_PUBLISHING, "publishedSlides": 0})
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # The executor runs uploads in submission order, i.e. first slide first
+        uploads = [
+            [(filename, storage_path, executor.submit(_upload_image, bucket, local_image_path, storage_path))
+             for filename, local_image_path, storage_path in images]
+            for _, images in slides
+        ]
+        
+        for published, ((slide_data, _), slide_uploads) in enumerate(zip(slides, uploads), start=1):
+            for filename, storage_path, future in slide_uploads:
+                slide_data["images"].append({
+                    "filename": filename,
+                    "url": future.result(),
+                    "storagePath": storage_path
+                })
+            slide_data["imageCount"] = len(slide_data["images"])
+            
+            # The slide and the published count become visible together
+            batch = db.batch()
+            batch.set(lesson_ref.collection("slides").document(f"SLIDE_{slide_data['slideNumber']}"), slide_data)
+            batch.update(lesson_ref, {"publishedSlides": published})
+            batch.commit()
+            print(f"Published slide {slide_data['slideNumber']} ({published} of {len(slides)})")
+        
+        batch = db.batch()
+        stats = _finish_lesson(db, batch, lesson_data, slides, image_info)
+        batch.update(lesson_ref, {"status": STATUS_READY, "stats": stats})
+        batch.commit()
+    except BaseException:
+        # Drop the queued uploads and wait for the running ones, so no image lands after the cleanup
+        executor.shutdown(wait=True, cancel_futures=True)
+        print(f"Publishing failed, removing the partly published lesson {lesson_ref.id}")
+        try:
+            delete_lesson(db, bucket, lesson_ref.id, lesson_data["school_code"], lesson_data.get("module_id"))
+        except Exception as e:
+            print(f"Warning: Could not remove lesson {lesson_ref.id}: {e}")
+        raise
+    finally:
+        executor.shutdown()
+
+def _publish_in_batches(db, bucket, lesson_ref, lesson_data, slides, image_info):
+    """
+    Upload every image, then write the slides and the lesson in batches
+    
+    The lesson document goes in the last batch, so it only appears once all
+    of its slides are in.
+    """
+    # Upload images and update paths
+    for slide_data, images in slides:
+        for filename, local_image_path, storage_path in images:
+            # Add the image URL to the slide data
+            slide_data["images"].append({
+                "filename": filename,
+                "url": _upload_image(bucket, local_image_path, storage_path),
+                "storagePath": storage_path
+            })
+        
+        # Store the image count so listings can total it with an aggregation query
+        slide_data["imageCount"] = len(slide_data["images"])
+    
+    # Store slides as a subcollection of the lesson, in batches
+    batch = db.batch()
+    pending = 0
+    for slide_data, _ in slides:
+        slide_id = f"SLIDE_{slide_data['slideNumber']}"
+        batch.set(lesson_ref.collection("slides").document(slide_id), slide_data)
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    
+    # The lesson document, its stats and the rollups go in the last batch, after every slide
+    lesson_data["stats"] = _finish_lesson(db, batch, lesson_data, slides, image_info)
+    batch.set(lesson_ref, lesson_data)
+    batch.commit()
+
+def _finish_verification(verifier):
+    """
+    Wait for a verifier attached during the upload and report its result
+    """
+    if verifier is None:
+        return
+    
+    report = verifier.wait()
+    upload_verifier.print_report(report)
+    if not report["consistent"]:
+        raise upload_verifier.VerificationFailed(f"Lesson {report['lessonId']} is not consistent")
+
+def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_id=None, module_id=None, school_code="DMT", storage_bucket_name=None, progressive=False, max_workers=8, verify=False, lesson_id=None):
     """
     Upload extracted PowerPoint content to Firebase, integrating with existing LMS structure
     
@@ -19,34 +245,20 @@ def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_
         module_id (str): Module ID to attach this lesson to (optional)
         school_code (str): School code to identify the content source
         storage_bucket_name (str): Firebase Storage bucket name (optional)
-    """
-    # Initialize Firebase with options
-    cred = credentials.Certificate(firebase_credentials_path)
+        progressive (bool): Publish slide by slide while images upload (see _publish_progressively)
+        max_workers (int): Number of images uploaded in parallel when progressive
+        verify (bool): Verify the lesson from snapshot listeners while it is written (see upload_verifier.py)
+        lesson_id (str): ID to create the lesson under, e.g. to clean it up if the upload fails (optional)
     
-    # Configure app options with the project ID from credentials if no bucket specified
-    if storage_bucket_name:
-        options = {'storageBucket': storage_bucket_name}
-    else:
-        # Get project ID from credentials
-        with open(firebase_credentials_path, 'r') as f:
-            cred_data = json.load(f)
-            project_id = cred_data.get('project_id')
-            if project_id:
-                options = {'storageBucket': f"{project_id}.appspot.com"}
-            else:
-                options = {}
-                print("Warning: No project ID found in credentials, using default bucket")
-    
-    # Check if Firebase app is already initialized
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        firebase_admin.initialize_app(cred, options)
+    Returns:
+        str: ID of the new lesson
     
-    # Initialize Firestore and Storage
-    db = firestore.client()
-    bucket = storage.bucket()
+    Raises:
+        upload_verifier.VerificationFailed: verify is set and the lesson is not consistent
+    """
+    # Initialize Firestore and Storage (the project bucket is resolved unless one is given)
+    db = firebase_client.get_firestore(firebase_credentials_path)
+    bucket = firebase_client.get_bucket(firebase_credentials_path, storage_bucket_name)
     
     print(f"Connected to Firebase project with bucket: {bucket.name}")
     
@@ -57,101 +269,94 @@ def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_
     # Extract title from the course data
     title = course_data["title"]
     
-    # Generate a timestamp for the ID
-    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    
-    # Generate a unique ID for the lesson
-    lesson_id = f"LES_{timestamp}_{str(uuid.uuid4())[:18]}"
+    # Generate a unique ID for the lesson unless the caller chose one
+    lesson_id = lesson_id or new_lesson_id()
     
     # Prepare lesson data to match existing structure
     lesson_data = {
         "id": lesson_id,
         "title": title,
         "code": f"{school_code}_{title}",
+        "school_code": school_code,
         "sortcode": 0,
         "is_lesson_material": True,
         "is_case_study": False,
-        "is_additional_material": False
+        "is_additional_material": False,
+        "status": STATUS_READY,
+        "slideCount": len(course_data["slides"])
     }
     
     # If module_id is provided, link this lesson to that module
     if module_id:
         lesson_data["module_id"] = module_id
     
-    # Create a slides subcollection
-    slides_data = []
+    # Collect each slide with the images it needs uploaded, and the size and hash of every image
+    slides = []
+    image_info = {}
     
     # Process each slide
     for i, slide in enumerate(course_data["slides"]):
+        # Extracts made before the structured slide model get it here
+        slide_structure.ensure_slide_structure(slide)
+        
         # Create a slide document
         slide_data = {
             "slideNumber": slide["slideNumber"],
             "title": slide["title"],
+            "blocks": slide["blocks"],
             "content": slide["content"],
             "images": []
         }
         
-        # Upload images and update paths
+        images = []
         for image_data in slide["images"]:
             local_image_path = os.path.join(images_dir, image_data["filename"])
             
             if os.path.exists(local_image_path):
                 # Create a path in Firebase Storage
                 storage_path = f"schools/{school_code}/lessons/{lesson_id}/images/{image_data['filename']}"
-                
-                print(f"Uploading image: {local_image_path} to {storage_path}")
-                
-                # Upload image to Firebase Storage
-                blob = bucket.blob(storage_path)
-                blob.upload_from_filename(local_image_path)
-                
-                # Make the image publicly accessible
-                blob.make_public()
-                
-                # Add the image URL to the slide data
-                slide_data["images"].append({
-                    "filename": image_data["filename"],
-                    "url": blob.public_url,
-                    "storagePath": storage_path
-                })
+                images.append((image_data["filename"], local_image_path, storage_path))
+                image_info[storage_path] = (lesson_stats.file_md5(local_image_path), os.path.getsize(local_image_path))
         
-        # Add slide to slides collection
-        slides_data.append(slide_data)
+        slides.append((slide_data, images))
     
-    # Store the lesson data in Firestore
-    lesson_ref = db.collection("lessons").document(lesson_id)
-    lesson_ref.set(lesson_data)
+    # Deck boilerplate is stored once on the lesson; extracts may have lifted it already
+    slides_data = [slide_data for slide_data, _ in slides]
+    slide_structure.restore_boilerplate(slides_data, course_data.get("boilerplate"))
+    lesson_data["boilerplate"] = slide_structure.lift_boilerplate(slides_data)
     
-    # Store slides as a subcollection of the lesson
-    for slide_data in slides_data:
-        slide_id = f"SLIDE_{slide_data['slideNumber']}"
-        lesson_ref.collection("slides").document(slide_id).set(slide_data)
+    lesson_ref = db.collection("lessons").document(lesson_id)
     
-    print(f"Lesson '{title}' uploaded successfully to Firebase")
-    print(f"Lesson ID: {lesson_id}")
+    # Listen before the first write, so every write is checked as it lands
+    verifier = upload_verifier.LessonVerifier(db, bucket, lesson_id, max_workers).start() if verify else None
     
-    # If course_id is provided, update the course to include this lesson
-    if course_id and module_id:
-        print(f"Linking lesson to course: {course_id}, module: {module_id}")
-        
-        # Get the module
-        module_ref = db.collection("modules").document(module_id)
-        module = module_ref.get()
-        
-        if module.exists:
-            # Create a lessons array if it doesn't exist
-            module_data = module.to_dict()
-            if "lessons" not in module_data:
-                module_data["lessons"] = []
-            
-            # Add this lesson to the module's lessons
-            module_data["lessons"].append(lesson_id)
+    try:
+        if progressive:
+            # The lesson is listed in its module from the start, like its first slides
+            if course_id and module_id:
+                print(f"Linking lesson to course: {course_id}, module: {module_id}")
+                _link_lesson_to_module(db, module_id, lesson_id)
             
-            # Update the module
-            module_ref.update({"lessons": module_data["lessons"]})
-            print(f"Module {module_id} updated with new lesson")
+            print(f"Publishing lesson '{title}' progressively (Lesson ID: {lesson_id})")
+            _publish_progressively(db, bucket, lesson_ref, lesson_data, slides, image_info, max_workers)
+            print(f"Lesson '{title}' uploaded successfully to Firebase")
         else:
-            print(f"Warning: Module {module_id} not found")
+            _publish_in_batches(db, bucket, lesson_ref, lesson_data, slides, image_info)
+            print(f"Lesson '{title}' uploaded successfully to Firebase")
+            print(f"Lesson ID: {lesson_id}")
+            
+            # If course_id is provided, update the course to include this lesson
+            if course_id and module_id:
+                print(f"Linking lesson to course: {course_id}, module: {module_id}")
+                _link_lesson_to_module(db, module_id, lesson_id)
+    except BaseException:
+        # Nothing is left to verify; detach the listeners and their image checks
+        if verifier is not None:
+            verifier.stop()
+        raise
+    
+    _finish_verification(verifier)
+    return lesson_id
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Upload extracted PowerPoint content to Firebase')
@@ -162,6 +367,11 @@ if __name__ == "__main__":
     parser.add_argument('--module-id', help='Module ID to attach this lesson to')
     parser.add_argument('--school-code', default='DMT', help='School code to identify the content source')
     parser.add_argument('--storage-bucket', help='Firebase Storage bucket name (optional)')
+    parser.add_argument('--progressive', action='store_true',
+                        help='Make each slide readable as soon as its images are uploaded')
+    parser.add_argument('--workers', type=int, default=8, help='Number of images uploaded in parallel with --progressive')
+    parser.add_argument('--verify', action='store_true',
+                        help='Verify the lesson while it is written and report once it is consistent')
     
     args = parser.parse_args()
     
@@ -172,5 +382,8 @@ if __name__ == "__main__":
         args.course_id,
         args.module_id,
         args.school_code,
-        args.storage_bucket
+        args.storage_bucket,
+        args.progressive,
+        args.workers,
+        args.verify
     ) 
\ No newline at end of file
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
+import firebase_client
 import argparse
 import uuid
 import datetime
+import slide_structure
 
 def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_id=None, module_id=None, school_code="DMT"):
     """
@@ -19,18 +19,8 @@ def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_
         module_id (str): Module ID to attach this lesson to (optional)
         school_code (str): School code to identify the content source
     """
-    # Initialize Firebase
-    cred = credentials.Certificate(firebase_credentials_path)
-    
-    # Check if Firebase app is already initialized
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        firebase_admin.initialize_app(cred)
-    
     # Initialize Firestore
-    db = firestore.client()
+    db = firebase_client.get_firestore(firebase_credentials_path)
     
     print(f"Connected to Firebase Firestore")
     
@@ -52,6 +42,7 @@ def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_
         "id": lesson_id,
         "title": title,
         "code": f"{school_code}_{title}",
+        "school_code": school_code,
         "sortcode": 0,
         "is_lesson_material": True,
         "is_case_study": False,
@@ -67,10 +58,14 @@ def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_
     
     # Process each slide
     for i, slide in enumerate(course_data["slides"]):
+        # Extracts made before the structured slide model get it here
+        slide_structure.ensure_slide_structure(slide)
+        
         # Create a slide document
         slide_data = {
             "slideNumber": slide["slideNumber"],
             "title": slide["title"],
+            "blocks": slide["blocks"],
             "content": slide["content"],
             "images": []
         }
@@ -88,9 +83,16 @@ def upload_to_firebase(json_path, images_dir, firebase_credentials_path, course_
                 })
                 print(f"Added reference to image: {image_data['filename']} (not uploaded)")
         
+        # Store the image count so listings can total it with an aggregation query
+        slide_data["imageCount"] = len(slide_data["images"])
+        
         # Add slide to slides collection
         slides_data.append(slide_data)
     
+    # Deck boilerplate is stored once on the lesson; extracts may have lifted it already
+    slide_structure.restore_boilerplate(slides_data, course_data.get("boilerplate"))
+    lesson_data["boilerplate"] = slide_structure.lift_boilerplate(slides_data)
+    
     # Store the lesson data in Firestore
     lesson_ref = db.collection("lessons").document(lesson_id)
     lesson_ref.set(lesson_data)
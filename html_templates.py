@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import io
+import re
+import json
+import html
+
+# {{ name }} is HTML-escaped, {{ name|raw }} is written as-is
+_PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*(\|\s*raw)?\s*\}\}')
+
+# Blocks whose contents are not markup and are minified by their own rules
+_RAW_BLOCK = re.compile(r'(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>|$)', re.IGNORECASE | re.DOTALL)
+
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+# Spaces before ':' are kept, since "a :hover" and "a:hover" are different selectors
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+
+_SCRIPT_ESCAPES = {
+    ord('<'): '\\u003c',
+    ord('>'): '\\u003e',
+    ord('&'): '\\u0026',
+    0x2028: '\\u2028',
+    0x2029: '\\u2029'
+}
+
+
+class HtmlTemplate:
+    """
+    HTML template compiled once into literal text and placeholders
+
+    Rendering writes each fragment straight to an open file, so pages are
+    produced in linear time without building the whole document in memory.
+    Values are HTML-escaped unless the placeholder is marked |raw.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._minified = None
+        self._parts = []
+        position = 0
+
+        for match in _PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                self._parts.append((source[position:match.start()], None, False))
+            self._parts.append((None, match.group(1), bool(match.group(2))))
+            position = match.end()
+
+        if position < len(source):
+            self._parts.append((source[position:], None, False))
+
+    def render_to(self, out, **values):
+        """
+        Write the rendered template to a file-like object
+
+        Args:
+            out: Object with a write(str) method
+            **values: Placeholder values; missing placeholders raise KeyError
+        """
+        write = out.write
+        for literal, name, raw in self._parts:
+            if literal is not None:
+                write(literal)
+            else:
+                value = values[name]
+                text = '' if value is None else str(value)
+                write(text if raw else html.escape(text, quote=True))
+
+    def minified(self):
+        """
+        Return this template with its markup minified (see minify_html)
+
+        The minified copy is compiled once and reused, so compact output costs
+        nothing extra per render.
+        """
+        if self._minified is None:
+            self._minified = HtmlTemplate(minify_html(self.source))
+        return self._minified
+
+    def render(self, **values):
+        """
+        Render the template to a string (for small fragments)
+        """
+        out = io.StringIO()
+        self.render_to(out, **values)
+        return out.getvalue()
+
+
+def minify_css(source):
+    """
+    Remove comments and insignificant whitespace from a stylesheet
+    """
+    css = _CSS_COMMENT.sub('', source)
+    css = re.sub(r'\s+', ' ', css)
+    css = _CSS_PUNCTUATION.sub(lambda match: match.group(1) or match.group(2), css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """
+    Remove indentation, blank lines and whole-line comments from a script
+
+    Line breaks are kept, so automatic semicolon insertion and the meaning of
+    the script are unchanged; the viewer scripts have no multi-line strings.
+    """
+    lines = (line.strip() for line in source.split('\n'))
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def _collapse_markup(markup):
+    # Runs of whitespace render as a single space, so that is all we keep
+    return re.sub(r'\s+', ' ', _HTML_COMMENT.sub('', markup))
+
+
+def minify_html(source):
+    """
+    Minify markup, including inline <style> and <script> blocks
+
+    Whitespace runs in markup collapse to a single space (never removed, so
+    inline elements keep their spacing) and <pre>/<textarea> are left alone.
+    A block left open at the end of the source, as in a template that is
+    split around a placeholder, is minified by its own rules up to the end.
+    """
+    output = []
+    position = 0
+
+    for match in _RAW_BLOCK.finditer(source):
+        output.append(_collapse_markup(source[position:match.start()]))
+        open_tag, tag, body, close_tag = match.groups()
+        tag = tag.lower()
+
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script':
+            # Scripts may end in a line comment, so the closing tag goes on its own line
+            body = minify_js(body) + ('\n' if close_tag else '')
+
+        output.append(_collapse_markup(open_tag) + body + close_tag)
+        position = match.end()
+
+    output.append(_collapse_markup(source[position:]))
+    minified = ''.join(output)
+
+    # Whitespace before the first tag of a document or fragment is never rendered
+    return minified[1:] if minified.startswith(' <') else minified
+
+
+def write_script_json(out, data):
+    """
+    Stream a value as JSON that is safe to embed inside a <script> element
+
+    '<', '>', '&' and the JavaScript line separators are written as unicode
+    escapes so lesson text can never close the script tag or break the script.
+
+    Args:
+        out: Object with a write(str) method
+        data: JSON-serializable value
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    for chunk in encoder.iterencode(data):
+        out.write(chunk.translate(_SCRIPT_ESCAPES))
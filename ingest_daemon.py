@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+import os
+import time
+import json
+import shutil
+import hashlib
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import firebase_client
+import usage_meter
+from pptx_extractor import extract_pptx_content
+from firebase_uploader import upload_to_firebase, new_lesson_id, delete_lesson
+
+DEFAULT_STATE_DIR = 'ingest'
+
+# Seconds between scans of the drop folder and of the job queue
+POLL_INTERVAL = 1.0
+
+# A file is picked up once its size and modification time have not changed for this long
+STABLE_SECONDS = 3.0
+
+# Failed jobs are retried after RETRY_BASE_SECONDS, doubling every attempt
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30
+
+# Finished jobs used for the latency figures in the metrics
+LATENCY_SAMPLE_SIZE = 200
+
+# Lock files and partial downloads left by PowerPoint, browsers and sync clients
+IGNORED_PREFIXES = ('~$', '.')
+IGNORED_SUFFIXES = ('.tmp', '.part', '.crdownload', '.download')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lesson_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, next_attempt_at);
+"""
+
+
+def _file_sha256(path, stopping=None):
+    # Returns None if stopping is set before the whole file is read
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            if stopping is not None and stopping.is_set():
+                return None
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class JobQueue:
+    """
+    Persistent job queue in SQLite, safe to use from several threads
+
+    A job is one dropped deck, identified by its content hash so the same
+    file dropped twice is only published once. Jobs move from "queued" to
+    "running" to "done" or "failed"; jobs left "running" by a crash are
+    queued again on startup.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def recover(self):
+        """
+        Queue again the jobs that were running when the daemon stopped
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+
+    def enqueue(self, path, sha256):
+        """
+        Add a job for a dropped file
+
+        Returns:
+            bool: False if the same content is already queued or was published
+        """
+        now = time.time()
+        with self._lock:
+            # A deck that failed before is tried again when it is dropped again
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (path, sha256, status, enqueued_at, next_attempt_at) "
+                "VALUES (?, ?, 'queued', ?, ?) "
+                "ON CONFLICT (sha256) DO UPDATE SET path = excluded.path, status = 'queued', attempts = 0, "
+                "enqueued_at = excluded.enqueued_at, next_attempt_at = excluded.next_attempt_at, "
+                "started_at = NULL, finished_at = NULL, error = NULL "
+                "WHERE jobs.status = 'failed'",
+                (path, sha256, now, now)
+            )
+            return cursor.rowcount == 1
+
+    def claim(self):
+        """
+        Mark the oldest due job as running and return it as (id, path, attempts, lesson_id), or None
+
+        lesson_id is the lesson of an earlier attempt that may still need cleaning up.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, path, attempts, lesson_id FROM jobs WHERE status = 'queued' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (now, row[0])
+            )
+            return row[0], row[1], row[2] + 1, row[3]
+
+    def release(self, job_id, error):
+        """
+        Queue a running job again without counting the attempt, e.g. when the run stops early
+        """
+        self._execute(
+            "UPDATE jobs SET status = 'queued', started_at = NULL, attempts = attempts - 1, error = ? WHERE id = ?",
+            (error, job_id)
+        )
+
+    def set_lesson_id(self, job_id, lesson_id):
+        """
+        Record the lesson an attempt writes to (None once it has been cleaned up)
+        """
+        self._execute("UPDATE jobs SET lesson_id = ? WHERE id = ?", (lesson_id, job_id))
+
+    def finish(self, job_id, lesson_id):
+        self._execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, lesson_id = ?, error = NULL WHERE id = ?",
+            (time.time(), lesson_id, job_id)
+        )
+
+    def fail(self, job_id, error, retry_at=None):
+        """
+        Record a failed attempt; the job is queued again at retry_at, or marked failed if None
+        """
+        if retry_at is None:
+            self._execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                (time.time(), error, job_id)
+            )
+        else:
+            self._execute(
+                "UPDATE jobs SET status = 'queued', next_attempt_at = ?, error = ? WHERE id = ?",
+                (retry_at, error, job_id)
+            )
+
+    def known_paths(self):
+        return {row[0] for row in self._execute("SELECT path FROM jobs WHERE status IN ('queued', 'running')")}
+
+    def metrics(self):
+        """
+        Queue depth by status and latency of recently finished jobs, in seconds
+
+        Latency is from the drop being queued to the lesson being published;
+        run time is the extraction and upload alone.
+        """
+        depth = {status: 0 for status in ('queued', 'running', 'done', 'failed')}
+        for status, count in self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            depth[status] = count
+
+        rows = self._execute(
+            "SELECT finished_at - enqueued_at, finished_at - started_at FROM jobs WHERE status = 'done' "
+            "ORDER BY finished_at DESC LIMIT ?",
+            (LATENCY_SAMPLE_SIZE,)
+        )
+        metrics = {'depth': depth, 'finished': len(rows)}
+        for name, values in (('latency', sorted(row[0] for row in rows)), ('runTime', sorted(row[1] for row in rows))):
+            if values:
+                metrics[name] = {
+                    'median': round(_percentile(values, 0.5), 2),
+                    'p95': round(_percentile(values, 0.95), 2),
+                    'max': round(values[-1], 2)
+                }
+
+        oldest = self._execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = 'queued'")[0][0]
+        metrics['oldestQueuedSeconds'] = round(time.time() - oldest, 2) if oldest else 0
+        return metrics
+
+    def recent_jobs(self, limit=20):
+        return self._execute(
+            "SELECT id, path, status, attempts, lesson_id, error FROM jobs ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+
+
+class DropFolderWatcher:
+    """
+    Polls a drop folder and reports .pptx files once they stop changing
+
+    Files are tracked by size and modification time; a file still being
+    copied keeps changing and is only reported after STABLE_SECONDS of quiet.
+    """
+
+    def __init__(self, drop_dir, stable_seconds=STABLE_SECONDS):
+        self.drop_dir = drop_dir
+        self.stable_seconds = stable_seconds
+        self._seen = {}
+
+    def poll(self):
+        """
+        Return the paths of files that became stable since the last poll
+        """
+        now = time.monotonic()
+        ready = []
+        present = set()
+
+        for entry in os.scandir(self.drop_dir):
+            name = entry.name
+            if (not entry.is_file() or not name.lower().endswith('.pptx')
+                    or name.startswith(IGNORED_PREFIXES) or name.endswith(IGNORED_SUFFIXES)):
+                continue
+
+            present.add(entry.path)
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            seen = self._seen.get(entry.path)
+
+            if seen is None or seen[0] != signature:
+                self._seen[entry.path] = (signature, now, False)
+            elif not seen[2] and now - seen[1] >= self.stable_seconds and stat.st_size > 0:
+                self._seen[entry.path] = (signature, seen[1], True)
+                ready.append(entry.path)
+
+        for path in set(self._seen) - present:
+            del self._seen[path]
+
+        return ready
+
+
+class IngestDaemon:
+    """
+    Watches a drop folder and extracts and publishes every deck dropped into it
+
+    Jobs run on a bounded worker pool. A failed job is retried with
+    exponential backoff up to max_attempts times. The lesson of a failed
+    attempt is deleted before the next one, so students never see a lesson
+    stuck half published. Decks end up in processed/ or failed/ next to the
+    drop folder contents.
+    """
+
+    def __init__(self, drop_dir, credentials_path, state_dir=DEFAULT_STATE_DIR, course_id=None, module_id=None,
+                 school_code='DMT', max_workers=2, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.drop_dir = drop_dir
+        self.credentials_path = credentials_path
+        self.state_dir = state_dir
+        self.course_id = course_id
+        self.module_id = module_id
+        self.school_code = school_code
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.queue = JobQueue(os.path.join(state_dir, 'queue.sqlite3'))
+        self.db = None
+        self.bucket = None
+        self.watcher = DropFolderWatcher(drop_dir)
+        self._running = 0
+        self._running_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _move(self, path, folder, tag):
+        """
+        Move a deck into a subfolder, adding tag to its name if that name is taken
+        """
+        target_dir = os.path.join(self.drop_dir, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        if not os.path.exists(path):
+            return
+
+        target = os.path.join(target_dir, os.path.basename(path))
+        if os.path.exists(target):
+            root, ext = os.path.splitext(os.path.basename(path))
+            target = os.path.join(target_dir, f"{root}-{tag}{ext}")
+        shutil.move(path, target)
+
+    def _clean_up_lesson(self, job_id, lesson_id):
+        """
+        Delete what a failed attempt published; the lesson stays on the job if this fails too
+        """
+        try:
+            deleted = delete_lesson(self.db, self.bucket, lesson_id, self.school_code, self.module_id)
+        except usage_meter.BudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"[job {job_id}] could not clean up lesson {lesson_id}: {type(e).__name__}: {e}")
+            return False
+        self.queue.set_lesson_id(job_id, None)
+        print(f"[job {job_id}] cleaned up lesson {lesson_id} ({deleted} slides and images)")
+        return True
+
+    def _stop_for_budget(self, job_id, output_dir, error):
+        """
+        Put a job back in the queue and stop taking new ones once the cost budget is spent
+
+        Retrying would only spend more, so the lesson of the attempt stays on
+        the job and is cleaned up when the job runs again.
+        """
+        shutil.rmtree(output_dir, ignore_errors=True)
+        self.queue.release(job_id, f"{type(error).__name__}: {error}")
+        if not self._stopping.is_set():
+            print(f"[job {job_id}] {error}; not starting any more jobs")
+        self.stop()
+
+    def process(self, job_id, path, attempt, previous_lesson_id=None):
+        """
+        Extract and publish one deck (runs on a worker thread)
+        """
+        started = time.time()
+        output_dir = os.path.join(self.state_dir, 'work', str(job_id))
+        lesson_id = previous_lesson_id
+        try:
+            # A crash may have left an earlier attempt's lesson and extraction behind
+            if lesson_id:
+                if not self._clean_up_lesson(job_id, lesson_id):
+                    raise RuntimeError(f"lesson {lesson_id} of the previous attempt is still in place")
+                lesson_id = None
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+            json_path = extract_pptx_content(path, output_dir)
+
+            # The lesson ID is on the job before the first write, so a failed attempt can be cleaned up
+            lesson_id = new_lesson_id()
+            self.queue.set_lesson_id(job_id, lesson_id)
+            upload_to_firebase(
+                json_path,
+                os.path.join(output_dir, 'images'),
+                self.credentials_path,
+                self.course_id,
+                self.module_id,
+                self.school_code,
+                progressive=True,
+                lesson_id=lesson_id
+            )
+        except usage_meter.BudgetExceeded as e:
+            self._stop_for_budget(job_id, output_dir, e)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            shutil.rmtree(output_dir, ignore_errors=True)
+            if lesson_id:
+                try:
+                    self._clean_up_lesson(job_id, lesson_id)
+                except usage_meter.BudgetExceeded as budget_error:
+                    self._stop_for_budget(job_id, output_dir, budget_error)
+                    return
+            if attempt < self.max_attempts:
+                delay = RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                self.queue.fail(job_id, error, retry_at=time.time() + delay)
+                print(f"[job {job_id}] attempt {attempt} failed ({error}), retrying in {delay}s")
+            else:
+                self.queue.fail(job_id, error)
+                self._move(path, 'failed', job_id)
+                print(f"[job {job_id}] failed after {attempt} attempts: {error}")
+        else:
+            self.queue.finish(job_id, lesson_id)
+            self._move(path, 'processed', job_id)
+            shutil.rmtree(output_dir, ignore_errors=True)
+            print(f"[job {job_id}] published {os.path.basename(path)} as {lesson_id} in {time.time() - started:.1f}s")
+        finally:
+            with self._running_lock:
+                self._running -= 1
+
+    def run(self):
+        """
+        Watch, queue and dispatch until stop() is called
+        """
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Re-queued {recovered} jobs interrupted by the last shutdown")
+
+        # Initialize Firebase once, before the workers share the client
+        self.db = firebase_client.get_firestore(self.credentials_path)
+        self.bucket = firebase_client.get_bucket(self.credentials_path)
+
+        print(f"Watching {self.drop_dir} with {self.max_workers} workers")
+        # Large decks are hashed on their own thread, so they never hold up dispatch or shutdown
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                ThreadPoolExecutor(max_workers=1) as hasher:
+            try:
+                self._loop(executor, hasher)
+            except KeyboardInterrupt:
+                print("Stopping after the running jobs; queued jobs stay in the queue")
+                self.stop()
+                hasher.shutdown(wait=False, cancel_futures=True)
+
+    def _enqueue(self, path):
+        """
+        Hash a deck that stopped changing and queue it (runs on the hashing thread)
+        """
+        try:
+            sha256 = _file_sha256(path, self._stopping)
+            if sha256 is None:
+                return
+            if self.queue.enqueue(path, sha256):
+                print(f"Queued {os.path.basename(path)}")
+            else:
+                print(f"Skipping {os.path.basename(path)}: this deck was already ingested")
+                self._move(path, 'processed', f"duplicate-{int(time.time())}")
+        except Exception as e:
+            # The watcher reports the deck again if it changes
+            print(f"Could not queue {os.path.basename(path)}: {type(e).__name__}: {e}")
+
+    def _loop(self, executor, hasher):
+        while not self._stopping.is_set():
+            known = self.queue.known_paths()
+            for path in self.watcher.poll():
+                if path not in known:
+                    hasher.submit(self._enqueue, path)
+
+            while True:
+                with self._running_lock:
+                    if self._running >= self.max_workers:
+                        break
+                    job = self.queue.claim()
+                    if job is None:
+                        break
+                    self._running += 1
+                executor.submit(self.process, *job)
+
+            self._stopping.wait(POLL_INTERVAL)
+
+    def stop(self):
+        self._stopping.set()
+
+
+def serve_metrics(queue, port):
+    """
+    Serve the queue metrics as JSON on http://localhost:<port>/metrics, in a background thread
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/metrics'):
+                self.send_error(404)
+                return
+            body = json.dumps(queue.metrics()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='ingest-metrics', daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extract and publish PowerPoint decks dropped into a folder')
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR, help='Directory for the job queue and work files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Watch the drop folder and publish new decks')
+    run_parser.add_argument('drop_dir', help='Folder instructors drop .pptx files into')
+    run_parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                            help='Path to Firebase credentials JSON file')
+    run_parser.add_argument('--course-id', help='Course ID to attach new lessons to')
+    run_parser.add_argument('--module-id', help='Module ID to attach new lessons to')
+    run_parser.add_argument('--school-code', default='DMT', help='School code to identify the content source')
+    run_parser.add_argument('--workers', type=int, default=2, help='Number of decks processed at once')
+    run_parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help='Attempts per deck before it is moved to failed/')
+    run_parser.add_argument('--metrics-port', type=int, help='Serve queue metrics as JSON on this local port')
+
+    subparsers.add_parser('status', help='Print queue metrics and the most recent jobs')
+
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        queue = JobQueue(os.path.join(args.state_dir, 'queue.sqlite3'))
+        print(json.dumps(queue.metrics(), indent=2))
+        for job_id, path, status, attempts, lesson_id, error in queue.recent_jobs():
+            line = f"  #{job_id} {status:<8} {os.path.basename(path)} (attempts: {attempts})"
+            if lesson_id:
+                line += f" -> {lesson_id}"
+            if error and status != 'done':
+                line += f" [{error}]"
+            print(line)
+    else:
+        daemon = IngestDaemon(
+            args.drop_dir,
+            args.firebase_credentials,
+            state_dir=args.state_dir,
+            course_id=args.course_id,
+            module_id=args.module_id,
+            school_code=args.school_code,
+            max_workers=args.workers,
+            max_attempts=args.max_attempts
+        )
+        if args.metrics_port:
+            serve_metrics(daemon.queue, args.metrics_port)
+            print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+        daemon.run()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+from firebase_admin import firestore
+import firebase_client
+import lesson_stats
+import argparse
+
+DEFAULT_PAGE_SIZE = 10
+
+
+def _lesson_id_bound(date_string):
+    # Lesson IDs start with LES_[YYYYMMDDHHMMSS], so dates map onto ID ranges
+    return f"LES_{date_string.replace('-', '')}"
+
+
+def catalog_query(db, page_size=DEFAULT_PAGE_SIZE, module_id=None, school_code=None,
+                  date_from=None, date_to=None, cursor=None):
+    """
+    Build the Firestore query for one page of the lesson catalog
+
+    Lessons are ordered newest first by document ID (which starts with the
+    upload timestamp), filtered and limited server-side, and paged with a
+    start_after cursor, so a page costs page_size reads however large the
+    collection is.
+
+    Args:
+        db: Firestore client
+        page_size (int): Number of lessons per page
+        module_id (str): Only lessons of this module (optional)
+        school_code (str): Only lessons uploaded for this school (optional)
+        date_from (str): Only lessons uploaded on or after this date, YYYY-MM-DD (optional)
+        date_to (str): Only lessons uploaded on or before this date, YYYY-MM-DD (optional)
+        cursor (str): Lesson ID of the last lesson on the previous page (optional)
+
+    Returns:
+        google.cloud.firestore.Query: The page query
+    """
+    lessons_ref = db.collection('lessons')
+    document_id = firestore.FieldPath.document_id()
+
+    query = lessons_ref
+    if module_id:
+        query = query.where('module_id', '==', module_id)
+    if school_code:
+        query = query.where('school_code', '==', school_code)
+    if date_from:
+        query = query.where(document_id, '>=', lessons_ref.document(_lesson_id_bound(date_from)))
+    if date_to:
+        # '~' sorts after every timestamp digit and '_', so the whole day is included
+        query = query.where(document_id, '<', lessons_ref.document(_lesson_id_bound(date_to) + '~'))
+
+    query = query.order_by(document_id, direction=firestore.Query.DESCENDING)
+
+    if cursor:
+        query = query.start_after({document_id: lessons_ref.document(cursor)})
+
+    return query.limit(page_size)
+
+
+def fetch_catalog_page(db, page_size=DEFAULT_PAGE_SIZE, module_id=None, school_code=None,
+                       date_from=None, date_to=None, cursor=None):
+    """
+    Fetch one page of the lesson catalog
+
+    Args:
+        db: Firestore client
+        page_size (int): Number of lessons per page
+        module_id (str): Only lessons of this module (optional)
+        school_code (str): Only lessons uploaded for this school (optional)
+        date_from (str): Only lessons uploaded on or after this date, YYYY-MM-DD (optional)
+        date_to (str): Only lessons uploaded on or before this date, YYYY-MM-DD (optional)
+        cursor (str): Lesson ID of the last lesson on the previous page (optional)
+
+    Returns:
+        tuple: (list of lesson DocumentSnapshots, cursor for the next page or None)
+    """
+    query = catalog_query(db, page_size, module_id, school_code, date_from, date_to, cursor)
+    page = list(query.stream())
+
+    next_cursor = page[-1].id if len(page) == page_size else None
+    return page, next_cursor
+
+
+def iter_catalog(db, page_size=DEFAULT_PAGE_SIZE, limit=None, **filters):
+    """
+    Yield lessons from the catalog page by page, newest first
+
+    Args:
+        db: Firestore client
+        page_size (int): Number of lessons fetched per round trip
+        limit (int): Stop after this many lessons (optional)
+        **filters: module_id, school_code, date_from and date_to (see fetch_catalog_page)
+    """
+    cursor = None
+    yielded = 0
+
+    while True:
+        size = page_size if limit is None else min(page_size, limit - yielded)
+        if size <= 0:
+            return
+
+        page, cursor = fetch_catalog_page(db, size, cursor=cursor, **filters)
+        for lesson_doc in page:
+            yield lesson_doc
+        yielded += len(page)
+
+        if cursor is None:
+            return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Browse the lesson catalog one page at a time')
+    parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Number of lessons per page')
+    parser.add_argument('--cursor', help='Lesson ID printed as the next-page cursor by the previous run')
+    parser.add_argument('--module-id', help='Only lessons of this module')
+    parser.add_argument('--school-code', help='Only lessons uploaded for this school')
+    parser.add_argument('--from', dest='date_from', help='Only lessons uploaded on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Only lessons uploaded on or before this date (YYYY-MM-DD)')
+
+    args = parser.parse_args()
+
+    db = firebase_client.get_firestore(args.firebase_credentials)
+    page, next_cursor = fetch_catalog_page(
+        db,
+        args.page_size,
+        args.module_id,
+        args.school_code,
+        args.date_from,
+        args.date_to,
+        args.cursor
+    )
+
+    print(f"\n===== LESSON CATALOG ({len(page)} lessons) =====\n")
+    if args.module_id or args.school_code:
+        totals = lesson_stats.get_rollup(db, args.module_id, args.school_code)
+        print(f"  {'Module' if args.module_id else 'School'} totals: {totals['lessonCount']} lessons, "
+              f"{totals['slideCount']} slides, {totals['imageCount']} images "
+              f"({totals['imageBytes'] / (1024 * 1024):.1f} MB)\n")
+    for lesson_doc in page:
+        lesson_data = lesson_doc.to_dict()
+        line = f"  - Lesson ID: {lesson_doc.id}, Title: {lesson_data.get('title')}, Module: {lesson_data.get('module_id', '-')}"
+        if lesson_data.get('stats'):
+            line += f", Slides: {lesson_data['stats']['slideCount']}, Images: {lesson_data['stats']['imageCount']}"
+        print(line)
+
+    if next_cursor:
+        print(f"\nNext page: --cursor {next_cursor}")
+    else:
+        print("\nNo more lessons")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+import os
+import json
+import sqlite3
+import argparse
+import firebase_client
+
+DEFAULT_MIRROR_PATH = 'mirror/lessons.sqlite3'
+
+# Number of document references passed to a single get_all call
+GET_ALL_CHUNK_SIZE = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    id TEXT PRIMARY KEY,
+    update_time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slides (
+    lesson_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    slide_number INTEGER,
+    update_time TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (lesson_id, id)
+);
+CREATE INDEX IF NOT EXISTS slides_by_number ON slides (lesson_id, slide_number);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class MirrorDocument:
+    """
+    Read-only stand-in for a Firestore DocumentSnapshot backed by the mirror,
+    so reporting code can iterate mirror rows exactly like streamed documents
+    """
+
+    def __init__(self, doc_id, data, update_time=None):
+        self.id = doc_id
+        self.exists = True
+        self.update_time = update_time
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+    def get(self, field):
+        return self._data.get(field)
+
+
+def open_mirror(mirror_path=DEFAULT_MIRROR_PATH):
+    """
+    Open (and create if needed) the local SQLite lesson mirror
+
+    Args:
+        mirror_path (str): Path to the SQLite database file
+
+    Returns:
+        sqlite3.Connection: Connection with the mirror schema in place
+    """
+    directory = os.path.dirname(mirror_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(mirror_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _update_time_key(snapshot):
+    # DatetimeWithNanoseconds keeps full precision in its RFC 3339 form
+    update_time = snapshot.update_time
+    if hasattr(update_time, 'rfc3339'):
+        return update_time.rfc3339()
+    return update_time.isoformat()
+
+
+def _fetch_changed(db, refs):
+    # Fetch full documents for the given references in batched get_all calls
+    for start in range(0, len(refs), GET_ALL_CHUNK_SIZE):
+        for snapshot in db.get_all(refs[start:start + GET_ALL_CHUNK_SIZE]):
+            if snapshot.exists:
+                yield snapshot
+
+
+def sync_mirror(db, conn):
+    """
+    Bring the local mirror up to date with Firestore
+
+    Only document names and update times are scanned (keys-only queries);
+    full documents are fetched only for lessons and slides whose update time
+    differs from the mirrored copy. Documents deleted remotely are removed.
+
+    Args:
+        db: Firestore client
+        conn (sqlite3.Connection): Open mirror connection
+
+    Returns:
+        dict: Counts of fetched and deleted lessons and slides
+    """
+    stats = {"lessons_fetched": 0, "lessons_deleted": 0, "slides_fetched": 0, "slides_deleted": 0}
+
+    # Scan lesson update times without transferring document bodies
+    remote_lessons = {}
+    lesson_refs = {}
+    for snapshot in db.collection('lessons').select([]).stream():
+        remote_lessons[snapshot.id] = _update_time_key(snapshot)
+        lesson_refs[snapshot.id] = snapshot.reference
+
+    local_lessons = dict(conn.execute("SELECT id, update_time FROM lessons"))
+
+    changed_lessons = [
+        lesson_refs[lesson_id]
+        for lesson_id, update_time in remote_lessons.items()
+        if local_lessons.get(lesson_id) != update_time
+    ]
+
+    for snapshot in _fetch_changed(db, changed_lessons):
+        conn.execute(
+            "INSERT OR REPLACE INTO lessons (id, update_time, data) VALUES (?, ?, ?)",
+            (snapshot.id, _update_time_key(snapshot), json.dumps(snapshot.to_dict(), default=str))
+        )
+        stats["lessons_fetched"] += 1
+
+    for lesson_id in set(local_lessons) - set(remote_lessons):
+        conn.execute("DELETE FROM lessons WHERE id = ?", (lesson_id,))
+        conn.execute("DELETE FROM slides WHERE lesson_id = ?", (lesson_id,))
+        stats["lessons_deleted"] += 1
+
+    # Slide writes do not touch the parent lesson, so scan slides on their own
+    remote_slides = {}
+    slide_refs = {}
+    for snapshot in db.collection_group('slides').select([]).stream():
+        lesson_ref = snapshot.reference.parent.parent
+        if lesson_ref is None or lesson_ref.parent.id != 'lessons':
+            continue
+        key = (lesson_ref.id, snapshot.id)
+        remote_slides[key] = _update_time_key(snapshot)
+        slide_refs[key] = snapshot.reference
+
+    local_slides = {
+        (lesson_id, slide_id): update_time
+        for lesson_id, slide_id, update_time in conn.execute(
+            "SELECT lesson_id, id, update_time FROM slides"
+        )
+    }
+
+    changed_slides = [
+        slide_refs[key]
+        for key, update_time in remote_slides.items()
+        if local_slides.get(key) != update_time
+    ]
+
+    for snapshot in _fetch_changed(db, changed_slides):
+        slide_data = snapshot.to_dict()
+        conn.execute(
+            "INSERT OR REPLACE INTO slides (lesson_id, id, slide_number, update_time, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                snapshot.reference.parent.parent.id,
+                snapshot.id,
+                slide_data.get('slideNumber'),
+                _update_time_key(snapshot),
+                json.dumps(slide_data, default=str)
+            )
+        )
+        stats["slides_fetched"] += 1
+
+    for lesson_id, slide_id in set(local_slides) - set(remote_slides):
+        conn.execute("DELETE FROM slides WHERE lesson_id = ? AND id = ?", (lesson_id, slide_id))
+        stats["slides_deleted"] += 1
+
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_sync', datetime('now'))"
+    )
+    conn.commit()
+
+    return stats
+
+
+def last_sync_time(conn):
+    """
+    Return the UTC time of the last successful sync, or None if never synced
+    """
+    row = conn.execute("SELECT value FROM sync_state WHERE key = 'last_sync'").fetchone()
+    return row[0] if row else None
+
+
+def mirror_lessons(conn):
+    """
+    Yield mirrored lessons as MirrorDocument objects, newest ID first
+    """
+    for lesson_id, update_time, data in conn.execute(
+        "SELECT id, update_time, data FROM lessons ORDER BY id DESC"
+    ):
+        yield MirrorDocument(lesson_id, json.loads(data), update_time)
+
+
+def mirror_lesson(conn, lesson_id):
+    """
+    Return a single mirrored lesson as a MirrorDocument, or None if missing
+    """
+    row = conn.execute(
+        "SELECT update_time, data FROM lessons WHERE id = ?", (lesson_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return MirrorDocument(lesson_id, json.loads(row[1]), row[0])
+
+
+def mirror_lessons_by_title(conn, title):
+    """
+    Return mirrored lessons with the given title, newest ID first
+    """
+    return [lesson for lesson in mirror_lessons(conn) if lesson.get('title') == title]
+
+
+def mirror_slides(conn, lesson_id):
+    """
+    Return the mirrored slides of a lesson as MirrorDocument objects, in slide order
+    """
+    return [
+        MirrorDocument(slide_id, json.loads(data), update_time)
+        for slide_id, update_time, data in conn.execute(
+            "SELECT id, update_time, data FROM slides WHERE lesson_id = ? "
+            "ORDER BY slide_number, id",
+            (lesson_id,)
+        )
+    ]
+
+
+def lesson_versions(conn):
+    """
+    Return a version key per mirrored lesson, computed in a single query
+
+    The key changes whenever the lesson document or any of its slides is
+    updated, added or removed, so callers can tell which lessons changed
+    without loading their slides.
+
+    Returns:
+        dict: lesson_id -> version string
+    """
+    return {
+        lesson_id: f"{update_time}|{slide_count}|{latest_slide or ''}"
+        for lesson_id, update_time, slide_count, latest_slide in conn.execute(
+            "SELECT lessons.id, lessons.update_time, COUNT(slides.id), MAX(slides.update_time) "
+            "FROM lessons LEFT JOIN slides ON slides.lesson_id = lessons.id "
+            "GROUP BY lessons.id"
+        )
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sync lessons and slides into a local SQLite mirror')
+    parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--mirror', default=DEFAULT_MIRROR_PATH, help='Path to the SQLite mirror file')
+
+    args = parser.parse_args()
+
+    conn = open_mirror(args.mirror)
+    print(f"Syncing lessons into mirror: {args.mirror} (last sync: {last_sync_time(conn) or 'never'})")
+
+    stats = sync_mirror(firebase_client.get_firestore(args.firebase_credentials), conn)
+
+    print(f"Lessons fetched: {stats['lessons_fetched']}, deleted: {stats['lessons_deleted']}")
+    print(f"Slides fetched: {stats['slides_fetched']}, deleted: {stats['slides_deleted']}")
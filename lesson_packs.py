@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+import os
+import io
+import json
+import glob
+import hashlib
+import mimetypes
+import zipfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, UnidentifiedImageError
+import firebase_client
+import lesson_mirror
+import student_lesson_viewer
+
+# Offline lesson packs live in Storage as
+#   packs/<lesson id>/manifest.json        entry hashes; the only object that is ever replaced
+#   packs/<lesson id>/pack-<hash>.zip      lesson.json and images/..., for a first download
+#   packs/<lesson id>/objects/<sha256>     every entry on its own, for delta updates
+# Names in the manifest are relative to the manifest, and everything but the
+# manifest is content-addressed, so it can be cached forever.
+
+PACK_FORMAT_VERSION = 1
+PACK_PREFIX = 'packs'
+MANIFEST_NAME = 'manifest.json'
+
+# Images are scaled down to fit this size; photos are re-encoded as JPEG
+MAX_IMAGE_DIMENSION = 1600
+JPEG_QUALITY = 82
+
+# Optimized images by source storage path (the uploader never reuses a path)
+IMAGE_CACHE_DIR = '.cache/pack_images'
+
+# Fixed timestamp for zip entries, so the same content gives the same archive
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MANIFEST_CACHE_CONTROL = 'no-cache'
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def optimize_image(data, original_extension='png'):
+    """
+    Scale an image down to MAX_IMAGE_DIMENSION and re-encode it compactly
+
+    Images with transparency stay PNG; everything else becomes a progressive
+    JPEG. The original is kept if re-encoding does not make it smaller, or
+    if Pillow cannot decode it (EMF and WMF drawings are common in decks) or
+    refuses to as a decompression bomb.
+
+    Args:
+        data (bytes): Original image
+        original_extension (str): Extension of the original, used when it is kept undecoded
+
+    Returns:
+        tuple: (image bytes, file extension without the dot)
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return data, original_extension
+    original_format = (image.format or 'png').lower()
+    resized = max(image.size) > MAX_IMAGE_DIMENSION
+    if resized:
+        image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image.save(output, format='PNG', optimize=True)
+        extension = 'png'
+    else:
+        image.convert('RGB').save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        extension = 'jpg'
+
+    if not resized and len(output.getvalue()) >= len(data):
+        return data, 'jpg' if original_format in ('jpeg', 'mpo') else original_format
+    return output.getvalue(), extension
+
+
+def _cached_optimized_image(bucket, storage_path, cache_dir=IMAGE_CACHE_DIR):
+    # Download and optimize an image once; later builds read it from the cache
+    key = sha256_hex(f"{bucket.name}/{storage_path}".encode('utf-8'))
+    for cached_path in glob.glob(os.path.join(cache_dir, f"{key}.*")):
+        if not cached_path.endswith('.tmp'):
+            with open(cached_path, 'rb') as f:
+                return f.read(), cached_path.rsplit('.', 1)[-1]
+
+    filename = storage_path.rsplit('/', 1)[-1]
+    original_extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    data, extension = optimize_image(bucket.blob(storage_path).download_as_bytes(), original_extension)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cached_path = os.path.join(cache_dir, f"{key}.{extension}")
+    with open(f"{cached_path}.tmp", 'wb') as f:
+        f.write(data)
+    os.replace(f"{cached_path}.tmp", cached_path)
+    return data, extension
+
+
+def build_pack(lesson_id, lesson_data, slides, bucket, max_workers=8):
+    """
+    Build the pack archive and manifest of a lesson
+
+    Every image with a storagePath is optimized and stored under a
+    content-addressed name; its slide entry gets that name as "packPath",
+    next to the online "url".
+
+    Args:
+        lesson_id (str): Lesson ID
+        lesson_data (dict): Lesson document
+        slides (list): Slide dictionaries (prepared as for the viewer)
+        bucket: Storage bucket holding the lesson images
+        max_workers (int): Number of images downloaded and optimized in parallel
+
+    Returns:
+        tuple: (zip bytes, manifest dict, {entry path: bytes})
+    """
+    images = [
+        image
+        for slide in slides
+        for image in slide.get('images') or []
+        if image.get('storagePath')
+    ]
+    storage_paths = sorted({image['storagePath'] for image in images})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        optimized = dict(zip(
+            storage_paths,
+            executor.map(lambda path: _cached_optimized_image(bucket, path), storage_paths)
+        ))
+
+    entries = {}
+    for image in images:
+        data, extension = optimized[image['storagePath']]
+        pack_path = f"images/{sha256_hex(data)[:16]}.{extension}"
+        image['packPath'] = pack_path
+        entries[pack_path] = data
+
+    lesson_pack = dict(lesson_data, id=lesson_id, slides=slides)
+    entries['lesson.json'] = json.dumps(lesson_pack, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as pack:
+        for path in sorted(entries):
+            info = zipfile.ZipInfo(path, date_time=ZIP_DATE_TIME)
+            # Images are already compressed
+            info.compress_type = zipfile.ZIP_DEFLATED if path.endswith('.json') else zipfile.ZIP_STORED
+            pack.writestr(info, entries[path])
+
+    pack_bytes = archive.getvalue()
+    pack_hash = sha256_hex(pack_bytes)
+
+    manifest = {
+        'version': PACK_FORMAT_VERSION,
+        'lessonId': lesson_id,
+        'title': lesson_data.get('title'),
+        'pack': {'object': f"pack-{pack_hash[:16]}.zip", 'sha256': pack_hash, 'size': len(pack_bytes)},
+        'entries': {
+            path: {'sha256': sha256_hex(data), 'size': len(data), 'object': f"objects/{sha256_hex(data)}"}
+            for path, data in sorted(entries.items())
+        }
+    }
+
+    return pack_bytes, manifest, entries
+
+
+def diff_manifests(old_manifest, new_manifest):
+    """
+    Compare two manifests of the same lesson
+
+    Returns:
+        tuple: (entry paths to fetch, entry paths to delete)
+    """
+    old_entries = (old_manifest or {}).get('entries', {})
+    new_entries = new_manifest['entries']
+
+    changed = [
+        path for path, entry in new_entries.items()
+        if old_entries.get(path, {}).get('sha256') != entry['sha256']
+    ]
+    removed = [path for path in old_entries if path not in new_entries]
+    return changed, removed
+
+
+def _upload(bucket, name, data, content_type, cache_control):
+    blob = bucket.blob(name)
+    blob.cache_control = cache_control
+    blob.upload_from_string(data, content_type=content_type)
+    blob.make_public()
+
+
+def publish_pack(bucket, lesson_id, pack_bytes, manifest, entries):
+    """
+    Upload a pack, uploading only objects that are not in Storage yet
+
+    The manifest goes last, so clients never see a manifest whose objects
+    are missing. The objects of the previous manifest are kept until the
+    next publish, so a client that fetched it just before it was replaced
+    can still finish its sync; only older objects are deleted.
+
+    Returns:
+        dict: Number of objects uploaded, kept and deleted
+    """
+    prefix = f"{PACK_PREFIX}/{lesson_id}/"
+    existing = {blob.name for blob in bucket.list_blobs(prefix=prefix)}
+    wanted = {prefix + manifest['pack']['object'], prefix + MANIFEST_NAME}
+
+    previous = set()
+    if prefix + MANIFEST_NAME in existing:
+        previous_manifest = json.loads(bucket.blob(prefix + MANIFEST_NAME).download_as_bytes())
+        previous = {prefix + previous_manifest['pack']['object']}
+        previous.update(prefix + entry['object'] for entry in previous_manifest['entries'].values())
+    stats = {'uploaded': 0, 'kept': 0, 'deleted': 0}
+
+    for path, entry in manifest['entries'].items():
+        name = prefix + entry['object']
+        if name in wanted:
+            continue
+        wanted.add(name)
+        if name in existing:
+            stats['kept'] += 1
+            continue
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        _upload(bucket, name, entries[path], content_type, IMMUTABLE_CACHE_CONTROL)
+        stats['uploaded'] += 1
+
+    pack_name = prefix + manifest['pack']['object']
+    if pack_name in existing:
+        stats['kept'] += 1
+    else:
+        _upload(bucket, pack_name, pack_bytes, 'application/zip', IMMUTABLE_CACHE_CONTROL)
+        stats['uploaded'] += 1
+
+    _upload(bucket, prefix + MANIFEST_NAME, json.dumps(manifest, indent=2), 'application/json', MANIFEST_CACHE_CONTROL)
+
+    for name in existing - wanted - previous:
+        bucket.blob(name).delete()
+        stats['deleted'] += 1
+
+    return stats
+
+
+def build_lesson_packs(mirror_path, lesson_ids=None, module_id=None, credentials_path=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                       storage_bucket_name=None, max_workers=8):
+    """
+    Build and publish packs for lessons in the local mirror
+
+    Lesson and slide documents come from the mirror (no Firestore reads);
+    images are downloaded from Storage only the first time they are packed.
+
+    Returns:
+        dict: lesson_id -> publish stats (see publish_pack)
+    """
+    bucket = firebase_client.get_bucket(credentials_path, storage_bucket_name)
+    conn = lesson_mirror.open_mirror(mirror_path)
+    results = {}
+
+    try:
+        if not lesson_ids:
+            lesson_ids = [
+                lesson.id for lesson in lesson_mirror.mirror_lessons(conn)
+                if not module_id or lesson.get('module_id') == module_id
+            ]
+
+        for lesson_id in lesson_ids:
+            lesson = lesson_mirror.mirror_lesson(conn, lesson_id)
+            if lesson is None:
+                print(f"Warning: Lesson {lesson_id} is not in the mirror")
+                continue
+
+            slides = student_lesson_viewer.prepare_slides(
+                [slide.to_dict() for slide in lesson_mirror.mirror_slides(conn, lesson_id)]
+            )
+            pack_bytes, manifest, entries = build_pack(lesson_id, lesson.to_dict(), slides, bucket, max_workers)
+            results[lesson_id] = publish_pack(bucket, lesson_id, pack_bytes, manifest, entries)
+            print(f"  {lesson_id}: {len(manifest['entries'])} entries, pack {len(pack_bytes) / 1024:.0f} KB, "
+                  f"{results[lesson_id]['uploaded']} objects uploaded, {results[lesson_id]['deleted']} deleted")
+    finally:
+        conn.close()
+
+    return results
+
+
+def sync_pack(bucket, lesson_id, local_dir):
+    """
+    Bring a local copy of a lesson pack up to date (reference client)
+
+    A first sync downloads the whole archive. Later syncs download the
+    manifest, then only the entries whose hashes changed, unless those add
+    up to more than half the archive. The local manifest is written last,
+    so an interrupted sync is simply repeated.
+
+    Args:
+        bucket: Storage bucket holding the packs
+        lesson_id (str): Lesson to sync
+        local_dir (str): Directory holding lesson.json, images/ and manifest.json
+
+    Returns:
+        dict: Number of entries downloaded and deleted, and whether the archive was used
+    """
+    prefix = f"{PACK_PREFIX}/{lesson_id}/"
+    manifest = json.loads(bucket.blob(prefix + MANIFEST_NAME).download_as_bytes())
+
+    local_manifest_path = os.path.join(local_dir, MANIFEST_NAME)
+    old_manifest = None
+    if os.path.exists(local_manifest_path):
+        with open(local_manifest_path, 'r', encoding='utf-8') as f:
+            old_manifest = json.load(f)
+
+    changed, removed = diff_manifests(old_manifest, manifest)
+    changed_bytes = sum(manifest['entries'][path]['size'] for path in changed)
+    use_archive = old_manifest is None or changed_bytes > manifest['pack']['size'] / 2
+
+    os.makedirs(local_dir, exist_ok=True)
+    if use_archive:
+        pack = zipfile.ZipFile(io.BytesIO(bucket.blob(prefix + manifest['pack']['object']).download_as_bytes()))
+        contents = {path: pack.read(path) for path in changed}
+    else:
+        contents = {
+            path: bucket.blob(prefix + manifest['entries'][path]['object']).download_as_bytes()
+            for path in changed
+        }
+
+    for path, data in contents.items():
+        if sha256_hex(data) != manifest['entries'][path]['sha256']:
+            raise ValueError(f"Hash mismatch for {path} of lesson {lesson_id}")
+        target = os.path.join(local_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(f"{target}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{target}.tmp", target)
+
+    for path in removed:
+        target = os.path.join(local_dir, path)
+        if os.path.exists(target):
+            os.remove(target)
+
+    with open(f"{local_manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{local_manifest_path}.tmp", local_manifest_path)
+
+    return {'downloaded': len(changed), 'deleted': len(removed), 'archive': use_archive}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build offline lesson packs and sync them with delta updates')
+    parser.add_argument('--credentials', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--storage-bucket', help='Firebase Storage bucket name (defaults to the project bucket)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build and publish packs from the lesson mirror')
+    build_parser.add_argument('lesson_ids', nargs='*', help='Lessons to pack (defaults to every mirrored lesson)')
+    build_parser.add_argument('--module-id', help='Pack the lessons of this module')
+    build_parser.add_argument('--mirror', default=lesson_mirror.DEFAULT_MIRROR_PATH, help='Path to the SQLite mirror file')
+    build_parser.add_argument('--workers', type=int, default=8, help='Number of images optimized in parallel')
+
+    sync_parser = subparsers.add_parser('sync', help='Download or update a local copy of a pack')
+    sync_parser.add_argument('lesson_id', help='Lesson to sync')
+    sync_parser.add_argument('local_dir', help='Directory of the local copy')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_lesson_packs(args.mirror, args.lesson_ids, args.module_id, args.credentials, args.storage_bucket, args.workers)
+    else:
+        stats = sync_pack(firebase_client.get_bucket(args.credentials, args.storage_bucket), args.lesson_id, args.local_dir)
+        print(f"Synced {args.lesson_id}: {stats['downloaded']} entries downloaded"
+              f"{' from the archive' if stats['archive'] else ''}, {stats['deleted']} removed")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+import json
+import base64
+import hashlib
+import argparse
+from firebase_admin import firestore
+import firebase_client
+
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 400
+
+# Number of slides kept in the preview of a lesson (as shown by list_lessons_for_students.py)
+PREVIEW_SLIDES = 3
+
+# Rollup documents, keyed by module ID and by school code
+MODULE_STATS = 'moduleStats'
+SCHOOL_STATS = 'schoolStats'
+
+# Totals kept in every rollup document
+ROLLUP_FIELDS = ('lessonCount', 'slideCount', 'imageCount', 'imageBytes')
+
+
+def file_md5(path):
+    """
+    MD5 of a file, base64 encoded like the md5Hash Storage keeps for every object
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return base64.b64encode(digest.digest()).decode('ascii')
+
+
+def content_fingerprint(slides, boilerplate, image_info):
+    """
+    SHA-256 of a lesson's text and image content, as stored
+
+    URLs and storage paths contain the lesson ID and are left out, so the
+    same deck uploaded twice gets the same fingerprint.
+
+    Args:
+        slides (list): Slide dictionaries in slide order
+        boilerplate (list): Boilerplate blocks of the lesson
+        image_info (dict): storagePath -> (md5 hash, size in bytes)
+    """
+    content = {
+        'boilerplate': boilerplate or [],
+        'slides': [
+            {
+                'title': slide_data.get('title', ''),
+                'blocks': slide_data.get('blocks', []),
+                'content': slide_data.get('content', []),
+                'images': [image_info.get(image.get('storagePath'), (None, 0))[0]
+                           for image in slide_data.get('images') or []]
+            }
+            for slide_data in slides
+        ]
+    }
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def compute_lesson_stats(slides, boilerplate, image_info):
+    """
+    Aggregates stored on the lesson document, so listings need no slide reads
+
+    Args:
+        slides (list): Slide dictionaries in slide order, with their uploaded images
+        boilerplate (list): Boilerplate blocks of the lesson
+        image_info (dict): storagePath -> (md5 hash, size in bytes)
+
+    Returns:
+        dict: slideCount, imageCount, imageBytes, fingerprint and preview
+    """
+    images = [image for slide_data in slides for image in slide_data.get('images') or []]
+
+    return {
+        'slideCount': len(slides),
+        'imageCount': len(images),
+        'imageBytes': sum(image_info.get(image.get('storagePath'), (None, 0))[1] for image in images),
+        'fingerprint': content_fingerprint(slides, boilerplate, image_info),
+        'preview': [
+            {
+                'slideNumber': slide_data.get('slideNumber', 0),
+                'title': slide_data.get('title', ''),
+                'images': [
+                    {'url': image.get('url', '#'), 'filename': image.get('filename', 'image')}
+                    for image in slide_data.get('images') or []
+                ]
+            }
+            for slide_data in slides[:PREVIEW_SLIDES]
+        ]
+    }
+
+
+def _rollup_refs(db, module_id, school_code):
+    refs = []
+    if module_id:
+        refs.append(db.collection(MODULE_STATS).document(module_id))
+    if school_code:
+        refs.append(db.collection(SCHOOL_STATS).document(school_code))
+    return refs
+
+
+def add_rollup_increments(batch, db, stats, module_id=None, school_code=None, sign=1):
+    """
+    Add a new lesson to its module and school rollups, in the caller's batch
+
+    The totals are server-side increments, so concurrent uploads to the same
+    module never overwrite each other. sign=-1 takes a deleted lesson out again.
+    """
+    increments = {
+        'lessonCount': firestore.Increment(sign),
+        'slideCount': firestore.Increment(sign * stats['slideCount']),
+        'imageCount': firestore.Increment(sign * stats['imageCount']),
+        'imageBytes': firestore.Increment(sign * stats['imageBytes']),
+        'updatedAt': firestore.SERVER_TIMESTAMP
+    }
+    for ref in _rollup_refs(db, module_id, school_code):
+        batch.set(ref, increments, merge=True)
+
+
+def get_rollup(db, module_id=None, school_code=None):
+    """
+    Totals of a module or a school in one read
+
+    Returns:
+        dict: lessonCount, slideCount, imageCount and imageBytes (zero if nothing was uploaded yet)
+    """
+    collection, key = (MODULE_STATS, module_id) if module_id else (SCHOOL_STATS, school_code)
+    snapshot = db.collection(collection).document(key).get()
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
+    if snapshot.exists:
+        totals.update({field: snapshot.to_dict().get(field, 0) for field in ROLLUP_FIELDS})
+    return totals
+
+
+def _storage_image_info(bucket, lesson_data):
+    # One listing per lesson gives the size and MD5 of every image
+    prefix = f"schools/{lesson_data.get('school_code', 'DMT')}/lessons/{lesson_data['id']}/"
+    return {blob.name: (blob.md5_hash, blob.size or 0) for blob in bucket.list_blobs(prefix=prefix)}
+
+
+def backfill_lesson_stats(db, bucket, dry_run=False):
+    """
+    Add stats to lessons uploaded before them and rebuild the rollups
+
+    Lessons without stats have their slides read once and their images
+    listed in Storage. The module and school rollups are then recomputed
+    from the stats of every lesson and overwritten, which also corrects any
+    drift (e.g. from lessons deleted or migrated by hand).
+
+    Args:
+        db: Firestore client
+        bucket: Storage bucket of the lessons
+        dry_run (bool): Only count the lessons that need stats
+
+    Returns:
+        tuple: (lessons updated, rollup documents written)
+    """
+    batch = db.batch()
+    pending = 0
+    updated = 0
+    rollups = {}
+
+    for snapshot in db.collection('lessons').select(['id', 'school_code', 'module_id', 'boilerplate', 'stats']).stream():
+        lesson_data = snapshot.to_dict()
+        lesson_data.setdefault('id', snapshot.id)
+        stats = lesson_data.get('stats')
+
+        if stats is None:
+            slides = [slide.to_dict() for slide in snapshot.reference.collection('slides').order_by('slideNumber').stream()]
+            image_info = _storage_image_info(bucket, lesson_data)
+            stats = compute_lesson_stats(slides, lesson_data.get('boilerplate'), image_info)
+            updated += 1
+
+            if not dry_run:
+                batch.update(snapshot.reference, {'stats': stats})
+                pending += 1
+                if pending == BATCH_SIZE:
+                    batch.commit()
+                    batch = db.batch()
+                    pending = 0
+
+        for ref in _rollup_refs(db, lesson_data.get('module_id'), lesson_data.get('school_code')):
+            totals = rollups.setdefault(ref.path, (ref, dict.fromkeys(ROLLUP_FIELDS, 0)))[1]
+            totals['lessonCount'] += 1
+            for field in ROLLUP_FIELDS[1:]:
+                totals[field] += stats[field]
+
+    if dry_run:
+        return updated, len(rollups)
+
+    for ref, totals in rollups.values():
+        batch.set(ref, {**totals, 'updatedAt': firestore.SERVER_TIMESTAMP})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return updated, len(rollups)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add stats to previously uploaded lessons and rebuild the module and school rollups')
+    parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--storage-bucket', help='Firebase Storage bucket name (optional)')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the lessons that need stats')
+
+    args = parser.parse_args()
+
+    updated, rollups = backfill_lesson_stats(
+        firebase_client.get_firestore(args.firebase_credentials),
+        firebase_client.get_bucket(args.firebase_credentials, args.storage_bucket),
+        args.dry_run
+    )
+
+    if args.dry_run:
+        print(f"{updated} lessons need stats; {rollups} module and school rollups would be rebuilt")
+    else:
+        print(f"Added stats to {updated} lessons and rebuilt {rollups} module and school rollups")
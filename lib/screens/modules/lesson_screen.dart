@@ -279,8 +279,11 @@ class _LessonScreenState extends State<LessonScreen> {
             slideData['title'] != widget.lessonTitle)
           _buildSectionTitle(slideData['title']),
 
-        // Display any additional content fields
-        if (slideData.containsKey('content'))
+        // Structured blocks from the extractor render as-is; older slides
+        // only have plain content strings
+        if (slideData['blocks'] is List)
+          _buildSlideBlocks(slideData['blocks'] as List<dynamic>)
+        else if (slideData.containsKey('content'))
           _buildContentMetadata(slideData['content']),
 
         // Display images if available
@@ -309,6 +312,83 @@ class _LessonScreenState extends State<LessonScreen> {
     );
   }
 
+  // Method to display the structured blocks of a slide (headings, paragraphs, bullets)
+  Widget _buildSlideBlocks(List<dynamic> blocks) {
+    if (blocks.isEmpty) {
+      return const SizedBox.shrink();
+    }
+
+    return Container(
+      margin: const EdgeInsets.only(bottom: 24),
+      padding: const EdgeInsets.all(16),
+      decoration: BoxDecoration(
+        color: Colors.blue.withOpacity(0.05),
+        borderRadius: BorderRadius.circular(12),
+        border: Border.all(color: Colors.blue.withOpacity(0.2)),
+      ),
+      child: Column(
+        crossAxisAlignment: CrossAxisAlignment.start,
+        children:
+            blocks.whereType<Map>().map((block) {
+              final text = block['text']?.toString() ?? '';
+
+              switch (block['type']) {
+                case 'heading':
+                  return Padding(
+                    padding: const EdgeInsets.only(top: 8, bottom: 8),
+                    child: Text(
+                      text,
+                      style: const TextStyle(
+                        fontSize: 16,
+                        fontWeight: FontWeight.bold,
+                        color: Colors.blue,
+                      ),
+                    ),
+                  );
+                case 'bullet':
+                  final level = (block['level'] as num?)?.toInt() ?? 0;
+                  return Padding(
+                    padding: EdgeInsets.only(bottom: 8, left: 20.0 * level),
+                    child: Row(
+                      crossAxisAlignment: CrossAxisAlignment.start,
+                      children: [
+                        Icon(
+                          level == 0 ? Icons.check_circle : Icons.circle,
+                          size: level == 0 ? 18 : 8,
+                          color: Colors.blue,
+                        ),
+                        const SizedBox(width: 12),
+                        Expanded(
+                          child: Text(
+                            text,
+                            style: const TextStyle(
+                              fontSize: 15,
+                              height: 1.5,
+                              color: Colors.black87,
+                            ),
+                          ),
+                        ),
+                      ],
+                    ),
+                  );
+                default:
+                  return Padding(
+                    padding: const EdgeInsets.only(bottom: 8),
+                    child: Text(
+                      text,
+                      style: const TextStyle(
+                        fontSize: 15,
+                        height: 1.5,
+                        color: Colors.black87,
+                      ),
+                    ),
+                  );
+              }
+            }).toList(),
+      ),
+    );
+  }
+
   // Method to display content metadata in a more appealing card
   Widget _buildContentMetadata(dynamic content) {
     if (content is List && content.isNotEmpty) {
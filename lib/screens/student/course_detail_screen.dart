@@ -1,3 +1,4 @@
+import 'dart:async';
 import 'package:flutter/material.dart';
 import '../../widgets/modern_layout.dart';
 import '../../screens/modules/content_navigator.dart';
@@ -72,6 +73,9 @@ class _CourseDetailScreenState extends State<CourseDetailScreen>
   List<ContentItem> _lesson01Content = [];
   List<ContentItem> _lesson02Content = [];
 
+  // Listeners on lessons that were still publishing when they were loaded
+  final List<StreamSubscription> _publishingSubscriptions = [];
+
   // For workplace assessment
   List<AssessmentItem> _assessmentItems =
       []; // Will be initialized in initState
@@ -172,16 +176,33 @@ class _CourseDetailScreenState extends State<CourseDetailScreen>
 
     try {
       // Load Lesson 01 content
-      final lesson01Items = await _lessonService.getLesson01ContentItems();
+      final lesson01 = await _lessonService.getLessonById(
+        LessonService.lesson01Id,
+      );
 
       // Load Lesson 02 content
-      final lesson02Items = await _lessonService.getLesson02ContentItems();
+      final lesson02 = await _lessonService.getLessonById(
+        LessonService.lesson02Id,
+      );
 
+      if (!mounted) return;
       setState(() {
-        _lesson01Content = lesson01Items;
-        _lesson02Content = lesson02Items;
+        _lesson01Content = _contentItemsOf(lesson01);
+        _lesson02Content = _contentItemsOf(lesson02);
         _isLoading = false;
       });
+
+      // Show slides of a lesson that is still being published as they arrive
+      _followWhilePublishing(
+        LessonService.lesson01Id,
+        lesson01,
+        (items) => _lesson01Content = items,
+      );
+      _followWhilePublishing(
+        LessonService.lesson02Id,
+        lesson02,
+        (items) => _lesson02Content = items,
+      );
     } catch (e) {
       debugPrint('Error loading lesson data: $e');
       setState(() {
@@ -190,8 +211,41 @@ class _CourseDetailScreenState extends State<CourseDetailScreen>
     }
   }
 
+  List<ContentItem> _contentItemsOf(Map<String, dynamic>? lessonData) {
+    if (lessonData == null) {
+      return [];
+    }
+    return _lessonService.convertLessonToContentItems(lessonData);
+  }
+
+  void _followWhilePublishing(
+    String lessonId,
+    Map<String, dynamic>? lessonData,
+    void Function(List<ContentItem> items) update,
+  ) {
+    if (lessonData == null || !_lessonService.isPublishing(lessonData)) {
+      return;
+    }
+
+    late StreamSubscription subscription;
+    subscription = _lessonService.watchLessonById(lessonId).listen((latest) {
+      if (latest == null || !mounted) return;
+      setState(() => update(_contentItemsOf(latest)));
+
+      // The lesson is complete; stop listening
+      if (!_lessonService.isPublishing(latest)) {
+        subscription.cancel();
+        _publishingSubscriptions.remove(subscription);
+      }
+    });
+    _publishingSubscriptions.add(subscription);
+  }
+
   @override
   void dispose() {
+    for (final subscription in _publishingSubscriptions) {
+      subscription.cancel();
+    }
     _tabController.dispose();
     super.dispose();
   }
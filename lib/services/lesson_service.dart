@@ -1,3 +1,4 @@
+import 'dart:async';
 import 'package:flutter/material.dart';
 import 'package:cloud_firestore/cloud_firestore.dart';
 import '../screens/student/course_detail_screen.dart';
@@ -32,21 +33,11 @@ class LessonService {
               .orderBy('slideNumber')
               .get();
 
-      // Process the slides
-      final List<Map<String, dynamic>> slides = [];
-
-      for (var slideDoc in slidesSnapshot.docs) {
-        final slideData = slideDoc.data();
-
-        // Ensure slide data has the necessary fields
-        if (slideData.containsKey('slideNumber') &&
-            slideData.containsKey('title')) {
-          slides.add(slideData);
-        }
-      }
-
       // Add the slides to the lesson data
-      lessonData['slides'] = slides;
+      lessonData['slides'] = _restoreBoilerplate(
+        _readableSlides(slidesSnapshot.docs),
+        lessonData['boilerplate'],
+      );
 
       return lessonData;
     } catch (e) {
@@ -55,6 +46,122 @@ class LessonService {
     }
   }
 
+  // Follow a lesson while it is being published (status 'publishing'):
+  // emits the lesson with the slides published so far, and again whenever
+  // another slide is published or the lesson document changes, so the first
+  // slides can be read right away. Both documents come from their own
+  // listeners; nothing is read again on each update.
+  Stream<Map<String, dynamic>?> watchLessonById(String lessonId) {
+    final lessonRef = _firestore.collection('lessons').doc(lessonId);
+    late StreamController<Map<String, dynamic>?> controller;
+    StreamSubscription? lessonSubscription;
+    StreamSubscription? slidesSubscription;
+    DocumentSnapshot<Map<String, dynamic>>? lessonDoc;
+    QuerySnapshot<Map<String, dynamic>>? slidesSnapshot;
+
+    void emit() {
+      // Wait until both listeners have delivered their first snapshot
+      if (lessonDoc == null || slidesSnapshot == null) {
+        return;
+      }
+      if (!lessonDoc!.exists) {
+        controller.add(null);
+        return;
+      }
+
+      final lessonData = Map<String, dynamic>.from(lessonDoc!.data()!);
+      lessonData['slides'] = _restoreBoilerplate(
+        _readableSlides(slidesSnapshot!.docs),
+        lessonData['boilerplate'],
+      );
+      controller.add(lessonData);
+    }
+
+    controller = StreamController<Map<String, dynamic>?>(
+      onListen: () {
+        lessonSubscription = lessonRef.snapshots().listen((snapshot) {
+          lessonDoc = snapshot;
+          emit();
+        }, onError: controller.addError);
+        slidesSubscription = lessonRef
+            .collection('slides')
+            .orderBy('slideNumber')
+            .snapshots()
+            .listen((snapshot) {
+              slidesSnapshot = snapshot;
+              emit();
+            }, onError: controller.addError);
+      },
+      onCancel: () async {
+        await lessonSubscription?.cancel();
+        await slidesSubscription?.cancel();
+      },
+    );
+
+    return controller.stream;
+  }
+
+  // Whether slides of the lesson are still being published
+  bool isPublishing(Map<String, dynamic> lessonData) {
+    return lessonData['status'] == 'publishing';
+  }
+
+  // Slides that have the fields the lesson screens need
+  List<Map<String, dynamic>> _readableSlides(
+    List<QueryDocumentSnapshot<Map<String, dynamic>>> slideDocs,
+  ) {
+    final List<Map<String, dynamic>> slides = [];
+
+    for (var slideDoc in slideDocs) {
+      final slideData = slideDoc.data();
+
+      // Ensure slide data has the necessary fields
+      if (slideData.containsKey('slideNumber') &&
+          slideData.containsKey('title')) {
+        slides.add(slideData);
+      }
+    }
+
+    return slides;
+  }
+
+  // Put text repeated on most slides of a deck, stored once on the lesson as
+  // 'boilerplate', back in place of the slides' {'type': 'boilerplate'} blocks
+  List<Map<String, dynamic>> _restoreBoilerplate(
+    List<Map<String, dynamic>> slides,
+    dynamic boilerplate,
+  ) {
+    if (boilerplate is! List || boilerplate.isEmpty) {
+      return slides;
+    }
+
+    for (var slide in slides) {
+      final blocks = slide['blocks'];
+      if (blocks is! List ||
+          !blocks.any((block) => block is Map && block['type'] == 'boilerplate')) {
+        continue;
+      }
+
+      final restored =
+          blocks.map((block) {
+            if (block is Map && block['type'] == 'boilerplate') {
+              return Map<String, dynamic>.from(boilerplate[block['ref']] as Map);
+            }
+            return block;
+          }).toList();
+
+      slide['blocks'] = restored;
+      slide['content'] =
+          restored
+              .whereType<Map>()
+              .where((block) => block['text'] != null)
+              .map((block) => block['text'] as String)
+              .toList();
+    }
+
+    return slides;
+  }
+
   // Convert lesson data to ContentItem objects for the course detail screen
   List<ContentItem> convertLessonToContentItems(
     Map<String, dynamic> lessonData,
@@ -67,7 +174,11 @@ class LessonService {
     // Each slide becomes a ContentItem
     for (var slide in slides) {
       final slideNumber = slide['slideNumber'];
-      final title = _extractMainTitle(slide['title']);
+      // Slides with structured blocks already carry a one-line title
+      final title =
+          slide['blocks'] != null
+              ? slide['title'] as String
+              : _extractMainTitle(slide['title']);
 
       // Determine if the slide has images
       final hasImages =
@@ -88,7 +199,8 @@ class LessonService {
     return contentItems;
   }
 
-  // Extract the main title from a slide title string (first line)
+  // Extract the main title from a slide title string (first line), for
+  // slides uploaded before the structured slide model
   String _extractMainTitle(String fullTitle) {
     final parts = fullTitle.split('\n');
     if (parts.isNotEmpty) {
@@ -1,193 +1,296 @@
 #!/usr/bin/env python3
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+import firebase_client
 import sys
 import json
+import argparse
+import textwrap
 from datetime import datetime
+from itertools import islice
+import html_templates
+import lesson_catalog
+import lesson_mirror
+import precompress
 
-def list_lessons_for_students():
+# Number of most recent lessons included in the list
+RECENT_LESSONS = 10
+
+# Number of slides shown in each lesson preview
+PREVIEW_SLIDES = 3
+
+# Slide fields needed to render a preview
+PREVIEW_FIELDS = ['slideNumber', 'title', 'images']
+
+# Page templates, compiled once and streamed to the output file
+LIST_PAGE_START = html_templates.HtmlTemplate("""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Logit LMS - Available Lessons</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 0; padding: 20px; }
+        h1 { color: #2c3e50; }
+        .lesson { border: 1px solid #ddd; margin-bottom: 20px; padding: 15px; border-radius: 5px; }
+        .lesson-title { font-size: 1.5em; font-weight: bold; margin-bottom: 10px; color: #3498db; }
+        .slide { margin-bottom: 5px; padding: 5px; background-color: #f9f9f9; }
+        .images { display: flex; flex-wrap: wrap; margin-top: 10px; }
+        .image-container { margin: 5px; text-align: center; }
+        img { max-width: 200px; max-height: 150px; border: 1px solid #ddd; border-radius: 3px; }
+        .timestamp { font-size: 0.8em; color: #7f8c8d; margin-top: 5px; }
+    </style>
+</head>
+<body>
+    <h1>Logit LMS - Available Lessons</h1>
+    <p>Generated on: {{ generated_on }}</p>
+""")
+
+LESSON_START = html_templates.HtmlTemplate("""
+    <div class="lesson">
+        <div class="lesson-title">{{ title }}</div>
+        <div>ID: {{ lesson_id }}</div>
+        <div class="timestamp">Uploaded: {{ uploaded }}</div>
+        <p>Contains {{ slides_count }} slides</p>
+        <h3>Preview:</h3>
+""")
+
+PREVIEW_SLIDE = html_templates.HtmlTemplate("""
+        <div class="slide">
+            <strong>Slide {{ slide_number }}</strong>: {{ title }}
+        </div>
+""")
+
+PREVIEW_IMAGE = html_templates.HtmlTemplate("""
+            <div class="image-container">
+                <img src="{{ url }}" alt="{{ filename }}">
+                <div>{{ filename }}</div>
+            </div>
+""")
+
+LIST_PAGE_END = html_templates.HtmlTemplate("""
+</body>
+</html>
+""")
+
+def format_lesson_date(lesson_id):
     """
-    Generate a student-friendly list of lessons with direct access URLs
+    Extract the upload date from a lesson ID (LES_[timestamp]_[uuid])
     """
-    # Initialize Firebase
-    try:
-        app = firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        cred = credentials.Certificate('config/service_account.json')
-        app = firebase_admin.initialize_app(cred, {'storageBucket': 'diving-app-8fa28.firebasestorage.app'})
-    
-    # Initialize Firestore
-    db = firestore.client()
-    
-    # Get all lessons
-    lessons = db.collection('lessons').stream()
-    lesson_docs = list(lessons)
-    
-    # Sort lessons by ID (which contains timestamp)
-    sorted_lessons = sorted(lesson_docs, key=lambda doc: doc.id, reverse=True)
-    
-    # HTML output
-    html_output = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Logit LMS - Available Lessons</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 0; padding: 20px; }
-            h1 { color: #2c3e50; }
-            .lesson { border: 1px solid #ddd; margin-bottom: 20px; padding: 15px; border-radius: 5px; }
-            .lesson-title { font-size: 1.5em; font-weight: bold; margin-bottom: 10px; color: #3498db; }
-            .slide { margin-bottom: 5px; padding: 5px; background-color: #f9f9f9; }
-            .images { display: flex; flex-wrap: wrap; margin-top: 10px; }
-            .image-container { margin: 5px; text-align: center; }
-            img { max-width: 200px; max-height: 150px; border: 1px solid #ddd; border-radius: 3px; }
-            .timestamp { font-size: 0.8em; color: #7f8c8d; margin-top: 5px; }
-        </style>
-    </head>
-    <body>
-        <h1>Logit LMS - Available Lessons</h1>
-        <p>Generated on: """ + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
+    timestamp_part = lesson_id.split('_')[1] if '_' in lesson_id else ""
+    formatted_date = ""
+    if timestamp_part and len(timestamp_part) >= 8:
+        try:
+            year = timestamp_part[:4]
+            month = timestamp_part[4:6]
+            day = timestamp_part[6:8]
+            formatted_date = f"{year}-{month}-{day}"
+        except:
+            formatted_date = "Unknown date"
+    return formatted_date
+
+def _count_lesson_slides(slides_ref):
     """
+    Count slides and images of a lesson with one aggregation query
     
-    # Only display the 10 most recent lessons
-    for lesson_doc in sorted_lessons[:10]:
-        lesson_data = lesson_doc.to_dict()
-        lesson_id = lesson_doc.id
-        
-        # Extract timestamp from lesson ID
-        timestamp_part = lesson_id.split('_')[1] if '_' in lesson_id else ""
-        formatted_date = ""
-        if timestamp_part and len(timestamp_part) >= 8:
-            try:
-                year = timestamp_part[:4]
-                month = timestamp_part[4:6]
-                day = timestamp_part[6:8]
-                formatted_date = f"{year}-{month}-{day}"
-            except:
-                formatted_date = "Unknown date"
-        
-        html_output += f"""
-        <div class="lesson">
-            <div class="lesson-title">{lesson_data.get('title', 'Unnamed Lesson')}</div>
-            <div>ID: {lesson_id}</div>
-            <div class="timestamp">Uploaded: {formatted_date}</div>
-        """
-        
-        # Get slides for this lesson
-        slides = db.collection('lessons').document(lesson_id).collection('slides').stream()
-        slides_list = list(slides)
-        
-        # Sort slides by slide number
-        slides_list = sorted(slides_list, key=lambda slide: slide.to_dict().get('slideNumber', 0))
-        
-        html_output += f"<p>Contains {len(slides_list)} slides</p>"
-        
-        # Display first few slides
-        display_slides = slides_list[:3] if len(slides_list) > 3 else slides_list
-        
-        html_output += "<h3>Preview:</h3>"
-        
-        for slide in display_slides:
-            slide_data = slide.to_dict()
-            slide_number = slide_data.get('slideNumber', 'Unknown')
-            slide_title = slide_data.get('title', 'No title')
-            
-            # Truncate title if too long
-            if len(slide_title) > 100:
-                slide_title = slide_title[:100] + "..."
-            
-            html_output += f"""
-            <div class="slide">
-                <strong>Slide {slide_number}</strong>: {slide_title}
-            </div>
-            """
-            
-            # Display images in this slide
-            images = slide_data.get('images', [])
-            if images:
-                html_output += '<div class="images">'
-                
-                for image in images:
-                    url = image.get('url', '#')
-                    filename = image.get('filename', 'image')
-                    
-                    html_output += f"""
-                    <div class="image-container">
-                        <img src="{url}" alt="{filename}">
-                        <div>{filename}</div>
-                    </div>
-                    """
-                
-                html_output += '</div>'
-        
-        html_output += "</div>"
+    Slides written by the uploader carry an imageCount field, so both totals
+    come from server-side aggregations. Sum and average skip slides without
+    the field, so sum / average is the number of slides that have it. Older
+    lessons where some slides lack it fall back to reading only the images
+    field of every slide.
+    """
+    query = slides_ref.count(alias='slides').sum('imageCount', alias='images').avg('imageCount', alias='average')
+    totals = {result.alias: result.value for result in query.get()[0]}
+    slides_count = totals['slides']
+    images_total = totals['images'] or 0
+    average = totals['average']
+    
+    # With no images at all the average is 0 and the number of counted slides is unknown
+    if not slides_count or (average and round(images_total / average) == slides_count):
+        return slides_count, int(images_total)
     
-    html_output += """
-    </body>
-    </html>
+    images_total = sum(
+        len((slide.to_dict() or {}).get('images', []))
+        for slide in slides_ref.select(['images']).stream()
+    )
+    return slides_count, images_total
+
+def summarize_lesson(lesson_doc, preview_slides, slides_count, images_count):
     """
+    Build the listing entry for a lesson from its preview slides and totals
     
-    # Save HTML to file
-    with open('lesson_list_for_students.html', 'w') as f:
-        f.write(html_output)
+    Args:
+        lesson_doc: Lesson DocumentSnapshot (or mirror document)
+        preview_slides (list): First slide dictionaries, in slide order
+        slides_count (int): Number of slides in the lesson
+        images_count (int): Number of images across all slides of the lesson
     
-    print("Generated lesson list for students at: lesson_list_for_students.html")
+    Returns:
+        dict: Lesson entry as written to lesson_list_for_students.json
+    """
+    lesson_data = lesson_doc.to_dict()
     
-    # Also generate a simple JSON file with lesson data
-    lessons_json = []
+    preview = []
+    for slide_data in preview_slides:
+        slide_images = slide_data.get('images', [])
+        preview.append({
+            "slideNumber": slide_data.get('slideNumber', 0),
+            "title": slide_data.get('title', ''),
+            "imageCount": len(slide_images),
+            "imageUrls": [img.get('url', '') for img in slide_images],
+            "images": [
+                {"url": img.get('url', '#'), "filename": img.get('filename', 'image')}
+                for img in slide_images
+            ]
+        })
     
-    for lesson_doc in sorted_lessons[:10]:
-        lesson_data = lesson_doc.to_dict()
-        lesson_id = lesson_doc.id
-        
-        lesson_json = {
-            "id": lesson_id,
-            "title": lesson_data.get('title', 'Unnamed Lesson'),
-            "code": lesson_data.get('code', ''),
-            "slides_count": 0,
-            "images_count": 0,
-            "preview": []
-        }
-        
-        # Get slides for this lesson
-        slides = db.collection('lessons').document(lesson_id).collection('slides').stream()
-        slides_list = list(slides)
+    return {
+        "id": lesson_doc.id,
+        "title": lesson_data.get('title', 'Unnamed Lesson'),
+        "code": lesson_data.get('code', ''),
+        "slides_count": slides_count,
+        "images_count": images_count,
+        "preview": preview
+    }
+
+def fetch_lesson_summary(db, lesson_doc):
+    """
+    Fetch the preview and totals for one lesson from Firestore
+    
+    Lessons uploaded with stats (see lesson_stats.py) already carry both, so
+    they cost no reads beyond the lesson itself. For older lessons the preview
+    is ordered, limited and projected server-side and the totals come from
+    one aggregation query, so the cost is a handful of reads per lesson
+    regardless of how many slides it has.
+    
+    Args:
+        db: Firestore client
+        lesson_doc: Lesson DocumentSnapshot
+    
+    Returns:
+        dict: Lesson entry (see summarize_lesson)
+    """
+    stats = lesson_doc.to_dict().get('stats')
+    if stats:
+        return summarize_lesson(lesson_doc, stats['preview'], stats['slideCount'], stats['imageCount'])
+    
+    slides_ref = db.collection('lessons').document(lesson_doc.id).collection('slides')
+    
+    preview_query = slides_ref.order_by('slideNumber').limit(PREVIEW_SLIDES).select(PREVIEW_FIELDS)
+    preview_slides = [slide.to_dict() for slide in preview_query.stream()]
+    
+    slides_count, images_count = _count_lesson_slides(slides_ref)
+    
+    return summarize_lesson(lesson_doc, preview_slides, slides_count, images_count)
+
+def mirror_lesson_summary(conn, lesson_doc):
+    """
+    Build the listing entry for one lesson from the local mirror
+    """
+    slides = [slide.to_dict() for slide in lesson_mirror.mirror_slides(conn, lesson_doc.id)]
+    images_count = sum(len(slide_data.get('images', [])) for slide_data in slides)
+    
+    return summarize_lesson(lesson_doc, slides[:PREVIEW_SLIDES], len(slides), images_count)
+
+def _template(template, compact):
+    return template.minified() if compact else template
+
+def list_lessons_for_students(mirror_path=None, limit=RECENT_LESSONS, compact=False):
+    """
+    Generate a student-friendly list of lessons with direct access URLs
+    
+    Each lesson is rendered and written to the HTML and JSON files as soon as
+    it is fetched, so time is linear and memory stays flat however many
+    lessons are listed.
+    
+    Args:
+        mirror_path (str): Read from this local SQLite mirror instead of Firestore (optional)
+        limit (int): Number of most recent lessons to include
+        compact (bool): Write minified HTML and compact JSON, with .gz and .br copies
+    """
+    if mirror_path:
+        conn = lesson_mirror.open_mirror(mirror_path)
+        lesson_docs = islice(lesson_mirror.mirror_lessons(conn), limit)
+        get_summary = lambda lesson_doc: mirror_lesson_summary(conn, lesson_doc)
+    else:
+        # Initialize Firestore
+        db = firebase_client.get_firestore()
         
-        # Count images
-        total_images = 0
+        # Get the most recent lessons, newest first, with limited page queries
+        lesson_docs = lesson_catalog.iter_catalog(db, limit=limit)
+        get_summary = lambda lesson_doc: fetch_lesson_summary(db, lesson_doc)
+    
+    with open('lesson_list_for_students.html', 'w', encoding='utf-8') as html_file, \
+         open('lesson_list_for_students.json', 'w', encoding='utf-8') as json_file:
+        _template(LIST_PAGE_START, compact).render_to(
+            html_file, generated_on=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        json_file.write('[')
         
-        # Sort slides by slide number
-        slides_list = sorted(slides_list, key=lambda slide: slide.to_dict().get('slideNumber', 0))
+        # Each lesson is fetched exactly once for both the HTML and JSON output
+        for index, lesson_doc in enumerate(lesson_docs):
+            summary = get_summary(lesson_doc)
+            render_lesson_html(html_file, summary, compact)
+            
+            lesson_json = dict(summary)
+            lesson_json["preview"] = [
+                {key: value for key, value in slide.items() if key != 'images'}
+                for slide in summary['preview']
+            ]
+            if compact:
+                json_file.write(',' if index else '')
+                json_file.write(json.dumps(lesson_json, separators=(',', ':'), ensure_ascii=False))
+            else:
+                json_file.write(',\n' if index else '\n')
+                json_file.write(textwrap.indent(json.dumps(lesson_json, indent=2), '  '))
         
-        lesson_json["slides_count"] = len(slides_list)
+        _template(LIST_PAGE_END, compact).render_to(html_file)
+        json_file.write(']' if compact else '\n]')
+    
+    print("Generated lesson list for students at: lesson_list_for_students.html")
+    print("Generated lesson data JSON at: lesson_list_for_students.json")
+    
+    output_paths = ['lesson_list_for_students.html', 'lesson_list_for_students.json']
+    if compact:
+        precompress.print_sizes(precompress.precompress_paths(output_paths))
+    else:
+        for path in output_paths:
+            precompress.remove_precompressed(path)
+
+def render_lesson_html(out, summary, compact=False):
+    """
+    Write the HTML block for one lesson summary
+    """
+    _template(LESSON_START, compact).render_to(
+        out,
+        title=summary['title'],
+        lesson_id=summary['id'],
+        uploaded=format_lesson_date(summary['id']),
+        slides_count=summary['slides_count']
+    )
+    
+    for slide in summary['preview']:
+        slide_title = slide['title'] or 'No title'
         
-        # Get preview of first 3 slides
-        preview_slides = slides_list[:3] if len(slides_list) > 3 else slides_list
+        # Truncate title if too long
+        if len(slide_title) > 100:
+            slide_title = slide_title[:100] + "..."
         
-        for slide in preview_slides:
-            slide_data = slide.to_dict()
-            
-            slide_images = slide_data.get('images', [])
-            total_images += len(slide_images)
-            
-            preview_slide = {
-                "slideNumber": slide_data.get('slideNumber', 0),
-                "title": slide_data.get('title', ''),
-                "imageCount": len(slide_images),
-                "imageUrls": [img.get('url', '') for img in slide_images]
-            }
-            
-            lesson_json["preview"].append(preview_slide)
+        _template(PREVIEW_SLIDE, compact).render_to(out, slide_number=slide['slideNumber'], title=slide_title)
         
-        lesson_json["images_count"] = total_images
-        lessons_json.append(lesson_json)
-    
-    # Save JSON to file
-    with open('lesson_list_for_students.json', 'w') as f:
-        json.dump(lessons_json, f, indent=2)
+        # Display images in this slide
+        if slide['images']:
+            out.write('<div class="images">')
+            for image in slide['images']:
+                _template(PREVIEW_IMAGE, compact).render_to(out, url=image['url'], filename=image['filename'])
+            out.write('</div>')
     
-    print("Generated lesson data JSON at: lesson_list_for_students.json")
+    out.write("</div>")
 
 if __name__ == "__main__":
-    list_lessons_for_students() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate a student-friendly list of lessons')
+    parser.add_argument('--mirror', help='Read from a local SQLite mirror (see lesson_mirror.py) instead of Firestore')
+    parser.add_argument('--limit', type=int, default=RECENT_LESSONS, help='Number of most recent lessons to include')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write minified HTML and compact JSON, plus precompressed .gz and .br files')
+    
+    args = parser.parse_args()
+    list_lessons_for_students(args.mirror, args.limit, args.compact) 
\ No newline at end of file
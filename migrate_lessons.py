@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from firebase_admin import firestore
+import firebase_client
+import lesson_stats
+import usage_meter
+
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 400
+
+
+def copy_object(source_blob, dest_blob):
+    """
+    Copy an object between buckets with server-side rewrite calls
+
+    Large objects and copies across locations or storage classes take
+    several rewrite calls; the object bytes never leave Google's network.
+    """
+    token, _, _ = dest_blob.rewrite(source_blob)
+    while token is not None:
+        token, _, _ = dest_blob.rewrite(source_blob, token=token)
+
+
+def migrate_lesson(source_db, dest_db, source_bucket, dest_bucket, lesson_id, module_id=None, dry_run=False):
+    """
+    Copy a lesson document, its slides and their images to another project or bucket
+
+    Images are copied object to object and their url fields, including the
+    ones in the preview of the lesson stats, are rewritten to the
+    destination bucket. Slides are written in batches and the lesson
+    document goes into the last batch, so the lesson only shows up once its
+    slides are in place. The same batch adds the lesson to the lessons array
+    of its destination module and, the first time the lesson is migrated,
+    adds its stats to the module and school rollups (see lesson_stats.py).
+    Lessons uploaded before stats were kept are left out of the rollups
+    until lesson_stats.py rebuilds them.
+
+    Args:
+        source_db: Firestore client of the source project
+        dest_db: Firestore client of the destination project
+        source_bucket: Source bucket, opened with the destination credentials
+        dest_bucket: Destination bucket
+        lesson_id (str): Lesson to migrate
+        module_id (str): Module to link the lesson to in the destination (optional)
+        dry_run (bool): Only count what would be copied
+
+    Returns:
+        dict: Number of slides and images copied, or None if the lesson does not exist
+    """
+    lesson_ref = source_db.collection('lessons').document(lesson_id)
+    lesson = lesson_ref.get()
+    if not lesson.exists:
+        return None
+
+    lesson_data = lesson.to_dict()
+    if module_id:
+        lesson_data['module_id'] = module_id
+
+    same_bucket = source_bucket.name == dest_bucket.name
+    stats = {'slides': 0, 'images': 0}
+    slides = []
+    new_urls = {}
+
+    for snapshot in lesson_ref.collection('slides').stream():
+        slide_data = snapshot.to_dict()
+
+        for image in slide_data.get('images') or []:
+            storage_path = image.get('storagePath')
+            if not storage_path:
+                print(f"Warning: {lesson_id}/{snapshot.id} has an image without storagePath, leaving its url as is")
+                continue
+
+            stats['images'] += 1
+            if dry_run or same_bucket:
+                continue
+
+            dest_blob = dest_bucket.blob(storage_path)
+            copy_object(source_bucket.blob(storage_path), dest_blob)
+
+            # Uploaded images are public, as in firebase_uploader.py
+            dest_blob.make_public()
+            new_urls[image.get('url')] = dest_blob.public_url
+            image['url'] = dest_blob.public_url
+
+        slides.append((snapshot.id, slide_data))
+        stats['slides'] += 1
+
+    if dry_run:
+        return stats
+
+    # The preview in the lesson stats repeats the image URLs of the first slides
+    for preview_slide in (lesson_data.get('stats') or {}).get('preview') or []:
+        for image in preview_slide.get('images') or []:
+            image['url'] = new_urls.get(image.get('url'), image.get('url'))
+
+    dest_lesson_ref = dest_db.collection('lessons').document(lesson_id)
+    batch = dest_db.batch()
+    pending = 0
+
+    for slide_id, slide_data in slides:
+        batch.set(dest_lesson_ref.collection('slides').document(slide_id), slide_data)
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = dest_db.batch()
+            pending = 0
+
+    # Migrating a lesson again must not count it twice in the rollups
+    if lesson_data.get('stats') and not dest_lesson_ref.get().exists:
+        lesson_stats.add_rollup_increments(batch, dest_db, lesson_data['stats'],
+                                           lesson_data.get('module_id'), lesson_data.get('school_code'))
+
+    dest_module_id = lesson_data.get('module_id')
+    if dest_module_id:
+        module_ref = dest_db.collection('modules').document(dest_module_id)
+        if module_ref.get().exists:
+            batch.update(module_ref, {'lessons': firestore.ArrayUnion([lesson_id])})
+        else:
+            print(f"Warning: Module {dest_module_id} not found in the destination, {lesson_id} is not linked to it")
+
+    batch.set(dest_lesson_ref, lesson_data)
+    batch.commit()
+
+    return stats
+
+
+def migrate_lessons(source_credentials, dest_credentials, lesson_ids=None, source_module_id=None,
+                    source_bucket_name=None, dest_bucket_name=None, dest_module_id=None,
+                    max_workers=8, dry_run=False):
+    """
+    Migrate lessons between projects or buckets, several lessons at a time
+
+    The destination credentials perform the object rewrites, so they need
+    read access to the source bucket.
+
+    Args:
+        source_credentials (str): Credentials of the project the lessons are in
+        dest_credentials (str): Credentials of the project to copy them to (may be the same)
+        lesson_ids (list): Lessons to migrate
+        source_module_id (str): Migrate every lesson of this source module instead
+        source_bucket_name (str): Source bucket (defaults to the source project bucket)
+        dest_bucket_name (str): Destination bucket (defaults to the destination project bucket)
+        dest_module_id (str): Module to link the lessons to in the destination (optional)
+        max_workers (int): Number of lessons migrated in parallel
+        dry_run (bool): Only count what would be copied
+
+    Returns:
+        dict: lesson_id -> stats (see migrate_lesson), None for missing lessons
+    """
+    source_db = firebase_client.get_firestore(source_credentials)
+    dest_db = firebase_client.get_firestore(dest_credentials)
+
+    source_bucket_name = source_bucket_name or firebase_client.resolve_bucket_name(source_credentials)
+    source_bucket = firebase_client.get_bucket(dest_credentials, source_bucket_name)
+    dest_bucket = firebase_client.get_bucket(dest_credentials, dest_bucket_name)
+
+    if source_module_id:
+        query = source_db.collection('lessons').where('module_id', '==', source_module_id).select([])
+        lesson_ids = [snapshot.id for snapshot in query.stream()]
+
+    print(f"Migrating {len(lesson_ids)} lessons from {source_bucket.name} to {dest_bucket.name}"
+          f"{' (dry run)' if dry_run else ''}")
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(migrate_lesson, source_db, dest_db, source_bucket, dest_bucket,
+                            lesson_id, dest_module_id, dry_run): lesson_id
+            for lesson_id in lesson_ids
+        }
+        for future in as_completed(futures):
+            lesson_id = futures[future]
+            try:
+                results[lesson_id] = future.result()
+            except usage_meter.BudgetExceeded:
+                raise
+            except Exception as e:
+                print(f"Error migrating lesson {lesson_id}: {e}")
+                continue
+
+            if results[lesson_id] is None:
+                print(f"Warning: Lesson {lesson_id} not found")
+            else:
+                print(f"  {lesson_id}: {results[lesson_id]['slides']} slides, {results[lesson_id]['images']} images")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Copy lessons with their slides and images to another project or bucket')
+    parser.add_argument('lesson_ids', nargs='*', help='Lessons to migrate')
+    parser.add_argument('--source-module-id', help='Migrate every lesson of this module')
+    parser.add_argument('--source-credentials', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Credentials of the source project')
+    parser.add_argument('--dest-credentials', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Credentials of the destination project')
+    parser.add_argument('--source-bucket', help='Source bucket (defaults to the source project bucket)')
+    parser.add_argument('--dest-bucket', help='Destination bucket (defaults to the destination project bucket)')
+    parser.add_argument('--dest-module-id', help='Link the migrated lessons to this module')
+    parser.add_argument('--workers', type=int, default=8, help='Number of lessons migrated in parallel')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the slides and images to copy')
+
+    args = parser.parse_args()
+
+    if not args.lesson_ids and not args.source_module_id:
+        parser.error('give lesson IDs or --source-module-id')
+
+    results = migrate_lessons(
+        args.source_credentials,
+        args.dest_credentials,
+        lesson_ids=args.lesson_ids,
+        source_module_id=args.source_module_id,
+        source_bucket_name=args.source_bucket,
+        dest_bucket_name=args.dest_bucket,
+        dest_module_id=args.dest_module_id,
+        max_workers=args.workers,
+        dry_run=args.dry_run
+    )
+
+    migrated = [stats for stats in results.values() if stats]
+    print(f"{'Would migrate' if args.dry_run else 'Migrated'} {len(migrated)} lessons, "
+          f"{sum(stats['slides'] for stats in migrated)} slides, {sum(stats['images'] for stats in migrated)} images")
@@ -3,17 +3,117 @@ import os
 import json
 import shutil
 from pptx import Presentation
+from pptx.enum.shapes import PP_PLACEHOLDER
 from PIL import Image
 import io
 import uuid
+import slide_structure
+from extract_profiler import phase
 
-def extract_pptx_content(pptx_path, output_dir):
+TITLE_PLACEHOLDERS = (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE, PP_PLACEHOLDER.VERTICAL_TITLE)
+
+# Placeholders whose paragraphs are bulleted unless the paragraph says otherwise
+BODY_PLACEHOLDERS = (PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.OBJECT,
+                     PP_PLACEHOLDER.VERTICAL_BODY, PP_PLACEHOLDER.VERTICAL_OBJECT)
+
+def _placeholder_type(shape):
+    return shape.placeholder_format.type if shape.is_placeholder else None
+
+def _paragraph_text(paragraph):
+    # Soft line breaks come through as vertical tabs
+    return paragraph.text.replace('\x0b', ' ').strip()
+
+def _paragraph_is_bulleted(paragraph, in_body_placeholder):
+    """
+    Whether a paragraph is shown with a bullet or number
+
+    An explicit bullet setting on the paragraph wins; otherwise body
+    placeholders are bulleted by their layout and text boxes are bulleted
+    only when the paragraph is indented.
+    """
+    pPr = paragraph._p.pPr
+    if pPr is not None:
+        for child in pPr:
+            tag = child.tag.rsplit('}', 1)[-1]
+            if tag == 'buNone':
+                return False
+            if tag in ('buChar', 'buAutoNum', 'buBlip'):
+                return True
+    return in_body_placeholder or paragraph.level > 0
+
+def _shape_type_name(shape, profiler):
+    # Only needed for profiling; some graphic frames have no supported shape type
+    if profiler is None:
+        return None
+    try:
+        shape_type = shape.shape_type
+    except NotImplementedError:
+        return 'UNKNOWN'
+    return getattr(shape_type, 'name', None) or str(shape_type)
+
+def _paragraph_is_bold(paragraph):
+    runs = [run for run in paragraph.runs if run.text.strip()]
+    return bool(runs) and all(run.font.bold for run in runs)
+
+def extract_text_structure(slide, profiler=None):
+    """
+    Build the structured text of a slide from its text-frame paragraphs
+    
+    The title comes from the title placeholder, or from the first paragraph
+    of the first text shape if the slide has none. Every other paragraph
+    becomes a heading, paragraph or bullet block with its indentation level.
+    
+    Args:
+        slide: python-pptx Slide
+        profiler (ExtractionProfiler): Times every text shape by shape type (optional)
+    
+    Returns:
+        tuple: (title, list of blocks)
+    """
+    text_shapes = [shape for shape in slide.shapes if shape.has_text_frame and shape.text_frame.text.strip()]
+    
+    title = ""
+    title_shape = next((shape for shape in text_shapes if _placeholder_type(shape) in TITLE_PLACEHOLDERS), None)
+    if title_shape is not None:
+        title = " ".join(
+            text for text in (_paragraph_text(paragraph) for paragraph in title_shape.text_frame.paragraphs) if text
+        )
+    
+    blocks = []
+    for shape in text_shapes:
+        if shape is title_shape:
+            continue
+        
+        with phase(profiler, 'shape text', shape_type=_shape_type_name(shape, profiler)):
+            in_body_placeholder = _placeholder_type(shape) in BODY_PLACEHOLDERS
+            for paragraph in shape.text_frame.paragraphs:
+                text = _paragraph_text(paragraph)
+                if not text:
+                    continue
+                
+                # Without a title placeholder the first line on the slide is the title
+                if not title:
+                    title = text
+                    continue
+                
+                blocks.append(slide_structure.paragraph_block(
+                    text,
+                    level=paragraph.level,
+                    bold=_paragraph_is_bold(paragraph),
+                    bulleted=_paragraph_is_bulleted(paragraph, in_body_placeholder)
+                ))
+    
+    return title, blocks
+
+def extract_pptx_content(pptx_path, output_dir, profiler=None):
     """
     Extract content from a PowerPoint file and save it as JSON and images
     
     Args:
         pptx_path (str): Path to the PowerPoint file
         output_dir (str): Directory to save the output files
+        profiler (ExtractionProfiler): Records time and memory per slide,
+            shape type and image size (optional, off by default)
     
     Returns:
         str: Path to the JSON file
@@ -29,58 +129,66 @@ def extract_pptx_content(pptx_path, output_dir):
     filename = os.path.basename(pptx_path).split('.')[0]
     
     # Load presentation
-    prs = Presentation(pptx_path)
+    with phase(profiler, 'load'):
+        prs = Presentation(pptx_path)
     
     # Initialize JSON structure
     course_data = {
         "title": filename,
+        "boilerplate": [],
         "slides": []
     }
     
     # Process each slide
     for i, slide in enumerate(prs.slides):
+        # Extract structured text content from slide
+        with phase(profiler, 'text', slide=i + 1):
+            title, blocks = extract_text_structure(slide, profiler)
+        
         slide_data = {
             "slideNumber": i + 1,
-            "title": "",
-            "content": [],
+            "title": title,
+            "blocks": blocks,
+            # Plain block text, for readers that predate the structured model
+            "content": slide_structure.block_texts(blocks),
             "images": []
         }
         
-        # Extract text content from slide
-        for shape in slide.shapes:
-            if hasattr(shape, "text") and shape.text.strip():
-                # If this is likely a title (first text element with content)
-                if not slide_data["title"] and shape.text.strip():
-                    slide_data["title"] = shape.text.strip()
-                else:
-                    slide_data["content"].append(shape.text.strip())
-            
-            # Extract images
-            if shape.shape_type == 13:  # 13 is the enum value for pictures
-                image = shape.image
-                image_bytes = image.blob
-                
-                # Generate unique filename for the image
-                image_filename = f"{filename}_slide_{i+1}_{uuid.uuid4()}.png"
-                image_path = os.path.join(images_dir, image_filename)
-                
-                # Save the image file
-                with open(image_path, 'wb') as f:
-                    f.write(image_bytes)
-                
-                # Add image reference to slide data
-                slide_data["images"].append({
-                    "filename": image_filename,
-                    "path": f"images/{image_filename}"
-                })
+        with phase(profiler, 'shapes', slide=i + 1):
+            for shape in slide.shapes:
+                with phase(profiler, 'shape', shape_type=_shape_type_name(shape, profiler)):
+                    # Extract images
+                    if shape.shape_type == 13:  # 13 is the enum value for pictures
+                        with phase(profiler, 'image blob'):
+                            image = shape.image
+                            image_bytes = image.blob
+                        
+                        # Generate unique filename for the image
+                        image_filename = f"{filename}_slide_{i+1}_{uuid.uuid4()}.png"
+                        image_path = os.path.join(images_dir, image_filename)
+                        
+                        # Save the image file
+                        with phase(profiler, 'image write', image_bytes=len(image_bytes)):
+                            with open(image_path, 'wb') as f:
+                                f.write(image_bytes)
+                        
+                        # Add image reference to slide data
+                        slide_data["images"].append({
+                            "filename": image_filename,
+                            "path": f"images/{image_filename}"
+                        })
         
         # Add slide data to course data
         course_data["slides"].append(slide_data)
     
+    # Store text repeated on most slides (document codes, running headers) once
+    course_data["boilerplate"] = slide_structure.lift_boilerplate(course_data["slides"])
+    
     # Save JSON file
     json_path = os.path.join(output_dir, f"{filename}.json")
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(course_data, f, indent=2, ensure_ascii=False)
+    with phase(profiler, 'json write'):
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(course_data, f, indent=2, ensure_ascii=False)
     
     return json_path
 
@@ -90,8 +198,27 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Extract content from PowerPoint files')
     parser.add_argument('pptx_path', help='Path to the PowerPoint file')
     parser.add_argument('--output-dir', default='output', help='Directory to save the output files')
+    parser.add_argument('--profile', metavar='DIR',
+                        help='Profile the extraction and write a hot-spot report and flame graph stacks to DIR')
     
     args = parser.parse_args()
     
-    json_path = extract_pptx_content(args.pptx_path, args.output_dir)
+    profiler = None
+    if args.profile:
+        from extract_profiler import ExtractionProfiler
+        profiler = ExtractionProfiler()
+        profiler.start()
+    
+    try:
+        json_path = extract_pptx_content(args.pptx_path, args.output_dir, profiler)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            os.makedirs(args.profile, exist_ok=True)
+            report_path = os.path.join(args.profile, 'profile_report.txt')
+            folded_path = os.path.join(args.profile, 'profile.folded')
+            profiler.write_report(report_path, title=args.pptx_path)
+            profiler.write_folded(folded_path)
+            print(f"Profile written to {report_path} (flame graph stacks: {folded_path})")
+    
     print(f"Content extracted successfully. JSON saved to: {json_path}") 
\ No newline at end of file
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import os
+import gzip
+import json
+import argparse
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; without it only .gz files are written
+    brotli = None
+
+# File types worth compressing; images are already compressed
+COMPRESSIBLE_EXTENSIONS = ('.html', '.json', '.css', '.js', '.svg', '.txt')
+
+_warned_brotli = False
+
+
+def dump_json(data, f, compact=False):
+    """
+    Write JSON either pretty-printed (indent=2) or as compact as possible
+    """
+    if compact:
+        json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+    else:
+        json.dump(data, f, indent=2)
+
+
+def precompress_file(path):
+    """
+    Write .gz and .br siblings of a file at the highest compression levels
+
+    The gzip header carries no timestamp, so unchanged input produces
+    byte-identical output and does not show up as a change on deploy.
+
+    Args:
+        path (str): File to compress
+
+    Returns:
+        dict: Original size and the size of every sibling written, in bytes
+    """
+    global _warned_brotli
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    sizes = {'original': len(content)}
+
+    with open(f"{path}.gz", 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    sizes['gz'] = os.path.getsize(f"{path}.gz")
+
+    if brotli is not None:
+        with open(f"{path}.br", 'wb') as f:
+            f.write(brotli.compress(content, quality=11, mode=brotli.MODE_TEXT))
+        sizes['br'] = os.path.getsize(f"{path}.br")
+    elif not _warned_brotli:
+        print("Warning: brotli is not installed, skipping .br files (pip install Brotli)")
+        _warned_brotli = True
+
+    return sizes
+
+
+def remove_precompressed(path):
+    """
+    Delete the .gz and .br siblings of a file, so an uncompressed rebuild
+    never leaves stale compressed copies to be served instead
+    """
+    for sibling in (f"{path}.gz", f"{path}.br"):
+        if os.path.exists(sibling):
+            os.remove(sibling)
+
+
+def has_precompressed(path):
+    """
+    Whether every sibling precompress_file would write exists and is no older than the file
+    """
+    siblings = [f"{path}.gz"] + ([f"{path}.br"] if brotli is not None else [])
+    modified = os.path.getmtime(path)
+    return all(os.path.exists(sibling) and os.path.getmtime(sibling) >= modified for sibling in siblings)
+
+
+def served_suffix(compact):
+    """
+    Suffix that compact pages add to the files they fetch, so the browser gets a precompressed copy
+
+    Firebase Hosting serves the .br and .gz siblings with their
+    Content-Encoding (see firebase.json), and the browser decodes them as
+    it would the original file. Other builds request the original files.
+
+    Returns:
+        str: '.br' if Brotli is installed, '.gz' otherwise, or '' when not compact
+    """
+    if not compact:
+        return ''
+    return '.br' if brotli is not None else '.gz'
+
+
+def _expand_paths(paths):
+    # Files as given, and every compressible file under directories
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in sorted(files):
+                    if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+
+def precompress_paths(paths):
+    """
+    Precompress the given files, and every compressible file under the given directories
+
+    Returns:
+        dict: path -> sizes (see precompress_file)
+    """
+    return {path: precompress_file(path) for path in _expand_paths(paths)}
+
+
+def remove_precompressed_paths(paths):
+    """
+    Delete the siblings of the given files, and of every compressible file under the given directories
+    """
+    for path in _expand_paths(paths):
+        remove_precompressed(path)
+
+
+def print_sizes(results):
+    """
+    Print the original and compressed size of every file
+    """
+    for path, sizes in results.items():
+        line = f"  {path}: {sizes['original'] / 1024:.1f} KB"
+        for kind in ('gz', 'br'):
+            if kind in sizes:
+                line += f", .{kind} {sizes[kind] / 1024:.1f} KB"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write .gz and .br siblings of generated files')
+    parser.add_argument('paths', nargs='+', help='Files or directories to precompress')
+
+    args = parser.parse_args()
+
+    print_sizes(precompress_paths(args.paths))
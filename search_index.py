@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+import os
+import re
+import json
+import math
+import argparse
+import lesson_mirror
+import slide_structure
+
+# Shard format version, bumped whenever the layout below changes
+INDEX_VERSION = 1
+
+DEFAULT_INDEX_DIR = 'search'
+
+# Common words that are not indexed (they still take up a position, so
+# phrase queries across them keep working)
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'with'
+])
+
+# Derivational suffixes removed after plurals and -ing/-ed, longest first
+_SUFFIXES = (
+    ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'), ('iveness', 'ive'),
+    ('ousness', 'ous'), ('ness', ''), ('ment', ''), ('ly', '')
+)
+
+_WORD = re.compile(r'[^\W_]+')
+_VOWEL = re.compile(r'[aeiouy]')
+_VOWEL_CONSONANT = re.compile(r'[aeiouy]+[^aeiouy]+')
+
+# A short stem ending consonant-vowel-consonant lost a final e (div -> dive)
+_CVC = re.compile(r'[^aeiouy][aeiouy][^aeiouwxy]$')
+
+# -ly is part of the word after these (family, apply, supply)
+_LY_KEEP = re.compile(r'(?:i|([^aeiouyl])\1)$')
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def stem(word):
+    """
+    Reduce a lowercase word to its stem with a small suffix-stripping stemmer
+
+    The browser search widget implements the same rules (SEARCH_WIDGET_JS),
+    so queries typed in the viewer match the terms stored in the shard.
+    """
+    if word.isdigit():
+        return word
+    if len(word) <= 3:
+        return _drop_final_e(word)
+
+    if word.endswith('ies') and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+
+    for suffix in ('ingly', 'edly', 'ing', 'ed'):
+        if word.endswith(suffix):
+            base = word[:-len(suffix)]
+            if suffix.startswith('ed') and base.endswith('e'):
+                # agreed -> agree, but bleed and speed keep their -eed
+                if _VOWEL_CONSONANT.search(base[:-1]):
+                    word = base + 'e'
+            elif len(base) >= 2 and _VOWEL.search(base):
+                word = base
+                # elevated -> elevat -> elevate, so it matches elevate
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                # stopped -> stopp -> stop
+                elif len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'aeioulsz':
+                    word = word[:-1]
+                # diving -> div -> dive
+                elif len(_VOWEL_CONSONANT.findall(word)) == 1 and _CVC.search(word):
+                    word += 'e'
+            break
+
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            base = word[:-len(suffix)]
+            if suffix != 'ly' or not _LY_KEEP.search(base):
+                word = base + replacement
+            break
+
+    return _drop_final_e(word)
+
+
+def _drop_final_e(word):
+    # use, used and using all end up as us; dive keeps its e, as div is what diving strips to
+    if word.endswith('e'):
+        base = word[:-1]
+        measure = len(_VOWEL_CONSONANT.findall(base))
+        if measure > 1 or (measure == 1 and not _CVC.search(base)):
+            return base
+    return word
+
+
+def tokenize(text, start=0):
+    """
+    Split text into stemmed terms with their word positions
+
+    Args:
+        text (str): Text to tokenize
+        start (int): Position of the first word
+
+    Returns:
+        tuple: (list of (position, term), position after the last word)
+    """
+    words = _WORD.findall(text.lower())
+    tokens = [
+        (start + offset, stem(word))
+        for offset, word in enumerate(words)
+        if word not in STOPWORDS
+    ]
+    return tokens, start + len(words)
+
+
+def slide_tokens(slide_data):
+    """
+    Tokenize a slide's title and text blocks
+
+    Returns:
+        tuple: (list of (position, term), number of positions, end of the title)
+    """
+    slide_structure.ensure_slide_structure(slide_data)
+
+    tokens, position = tokenize(slide_data.get('title') or '')
+    title_end = position
+
+    for text in slide_structure.block_texts(slide_data['blocks']):
+        # Leave a gap so phrases never match across two blocks
+        block_tokens, position = tokenize(text, position + 1)
+        tokens.extend(block_tokens)
+
+    return tokens, position, title_end
+
+
+def build_index(lessons, school_code=None):
+    """
+    Build a positional inverted index over the slides of the given lessons
+
+    Every slide is a document. Postings are stored per term as one flat list
+    of integers, [doc delta, count, position deltas..., doc delta, ...], which
+    keeps the JSON shard small and is decoded only for the terms a query uses.
+
+    Args:
+        lessons (iterable): (lesson_id, lesson_data, slides) tuples
+        school_code (str): School the shard belongs to (optional)
+
+    Returns:
+        dict: Shard with lessons, docs and terms
+    """
+    shard_lessons = []
+    docs = []
+    postings = {}
+
+    for lesson_id, lesson_data, slides in lessons:
+        lesson_index = len(shard_lessons)
+        shard_lessons.append([lesson_id, lesson_data.get('title') or lesson_id])
+
+        for slide_data in slides:
+            # Work on a copy so older slides are structured without touching the caller's data
+            slide_data = dict(slide_data)
+            tokens, length, title_end = slide_tokens(slide_data)
+            doc_index = len(docs)
+            docs.append([lesson_index, slide_data.get('slideNumber'), slide_data['title'], length, title_end])
+
+            for position, term in tokens:
+                postings.setdefault(term, {}).setdefault(doc_index, []).append(position)
+
+    terms = {}
+    for term in sorted(postings):
+        encoded = []
+        previous_doc = 0
+        for doc_index, positions in postings[term].items():
+            encoded.append(doc_index - previous_doc)
+            encoded.append(len(positions))
+            previous_position = 0
+            for position in positions:
+                encoded.append(position - previous_position)
+                previous_position = position
+            previous_doc = doc_index
+        terms[term] = encoded
+
+    return {
+        'version': INDEX_VERSION,
+        'school': school_code,
+        'lessons': shard_lessons,
+        'docs': docs,
+        'terms': terms
+    }
+
+
+def build_school_indexes(conn):
+    """
+    Build one index shard per school from the local lesson mirror
+
+    Returns:
+        dict: school_code -> shard (lessons without a school go under 'default')
+    """
+    by_school = {}
+    for lesson in lesson_mirror.mirror_lessons(conn):
+        slides = [slide.to_dict() for slide in lesson_mirror.mirror_slides(conn, lesson.id)]
+        slides.sort(key=lambda slide_data: slide_data.get('slideNumber', 0))
+        by_school.setdefault(lesson.get('school_code') or 'default', []).append(
+            (lesson.id, lesson.to_dict(), slides)
+        )
+
+    return {school: build_index(lessons, school) for school, lessons in by_school.items()}
+
+
+def write_shard(shard, path):
+    """
+    Write a shard as compact JSON, replacing any previous file atomically
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(shard, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def parse_query(query):
+    """
+    Split a query into stemmed terms and quoted phrases
+
+    Returns:
+        list: Each item is a list of (offset, term); single words have one item
+    """
+    clauses = []
+    for phrase, word in _QUERY_PART.findall(query):
+        tokens, _ = tokenize(phrase or word)
+        if tokens:
+            first = tokens[0][0]
+            clauses.append([(position - first, term) for position, term in tokens])
+    return clauses
+
+
+class SearchIndex:
+    """
+    Query API over a shard written by build_index
+
+    Postings of a term are decoded the first time a query uses it, so
+    loading a shard costs one JSON parse and queries stay in memory.
+    """
+
+    def __init__(self, shard):
+        if shard.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {shard.get('version')}")
+
+        self.school = shard.get('school')
+        self.lessons = shard['lessons']
+        self.docs = shard['docs']
+        self._terms = shard['terms']
+        self._decoded = {}
+        self._average_length = (sum(doc[3] for doc in self.docs) / len(self.docs)) if self.docs else 0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def postings(self, term):
+        """
+        Return {doc_index: [positions]} for a term
+        """
+        if term not in self._decoded:
+            encoded = self._terms.get(term, [])
+            decoded = {}
+            doc_index = 0
+            i = 0
+            while i < len(encoded):
+                doc_index += encoded[i]
+                count = encoded[i + 1]
+                positions = []
+                position = 0
+                for delta in encoded[i + 2:i + 2 + count]:
+                    position += delta
+                    positions.append(position)
+                decoded[doc_index] = positions
+                i += 2 + count
+            self._decoded[term] = decoded
+        return self._decoded[term]
+
+    def _phrase_positions(self, clause, doc_index):
+        # Start positions where every term of the clause appears at its offset
+        first_offset, first_term = clause[0]
+        starts = [position - first_offset for position in self.postings(first_term)[doc_index]]
+        for offset, term in clause[1:]:
+            positions = set(self.postings(term)[doc_index])
+            starts = [start for start in starts if start + offset in positions]
+        return starts
+
+    def search(self, query, limit=10):
+        """
+        Find slides containing every word and quoted phrase of the query
+
+        Results are ranked with BM25; matches in the slide title count double.
+
+        Args:
+            query (str): Words and "quoted phrases"
+            limit (int): Maximum number of results
+
+        Returns:
+            list: Result dicts with lessonId, lessonTitle, slideNumber, title and score
+        """
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+
+        terms = {term for clause in clauses for _, term in clause}
+        candidates = None
+        for term in terms:
+            docs = set(self.postings(term))
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return []
+
+        total_docs = len(self.docs)
+        scored = []
+        for doc_index in candidates:
+            if any(len(clause) > 1 and not self._phrase_positions(clause, doc_index) for clause in clauses):
+                continue
+
+            lesson_index, slide_number, title, length, title_end = self.docs[doc_index]
+            score = 0.0
+            for term in terms:
+                positions = self.postings(term)[doc_index]
+                frequency = len(positions) + sum(1 for position in positions if position < title_end)
+                document_frequency = len(self.postings(term))
+                idf = math.log(1 + (total_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+                norm = _K1 * (1 - _B + _B * length / (self._average_length or 1))
+                score += idf * frequency * (_K1 + 1) / (frequency + norm)
+
+            scored.append((score, doc_index))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        results = []
+        for score, doc_index in scored[:limit]:
+            lesson_index, slide_number, title, _, _ = self.docs[doc_index]
+            lesson_id, lesson_title = self.lessons[lesson_index]
+            results.append({
+                'lessonId': lesson_id,
+                'lessonTitle': lesson_title,
+                'slideNumber': slide_number,
+                'title': title,
+                'score': round(score, 4)
+            })
+        return results
+
+
+# Browser side of the search: the same tokenizer and stemmer as above, a
+# lazy shard loader, and the search box wired into the viewer page
+SEARCH_WIDGET_JS = """
+        // Full-text search over the slide index built with the page
+        const SEARCH_STOPWORDS = new Set(%(stopwords)s);
+        const SEARCH_SUFFIXES = %(suffixes)s;
+        const searchBox = document.querySelector('.lesson-search');
+        const searchInput = document.querySelector('.search-input');
+        const searchResults = document.querySelector('.search-results');
+        let searchIndexRequest = null;
+        let searchTimer = null;
+
+        function dropFinalE(word) {
+            if (!word.endsWith('e')) return word;
+            const base = word.slice(0, -1);
+            const measure = (base.match(/[aeiouy]+[^aeiouy]+/g) || []).length;
+            return measure > 1 || (measure === 1 && !/[^aeiouy][aeiouy][^aeiouwxy]$/.test(base)) ? base : word;
+        }
+
+        function searchStem(word) {
+            if (/^[0-9]+$/.test(word)) return word;
+            if (word.length <= 3) return dropFinalE(word);
+
+            if (word.endsWith('ies') && word.length > 4) {
+                word = word.slice(0, -3) + 'y';
+            } else if (word.endsWith('sses')) {
+                word = word.slice(0, -2);
+            } else if (word.endsWith('s') && !/(ss|us|is)$/.test(word)) {
+                word = word.slice(0, -1);
+            }
+
+            for (const suffix of ['ingly', 'edly', 'ing', 'ed']) {
+                if (word.endsWith(suffix)) {
+                    const base = word.slice(0, -suffix.length);
+                    if (suffix.startsWith('ed') && base.endsWith('e')) {
+                        if (/[aeiouy]+[^aeiouy]+/.test(base.slice(0, -1))) word = base + 'e';
+                    } else if (base.length >= 2 && /[aeiouy]/.test(base)) {
+                        word = base;
+                        const last = word[word.length - 1];
+                        if (/(at|bl|iz)$/.test(word)) {
+                            word += 'e';
+                        } else if (word.length > 3 && last === word[word.length - 2] && !'aeioulsz'.includes(last)) {
+                            word = word.slice(0, -1);
+                        } else if ((word.match(/[aeiouy]+[^aeiouy]+/g) || []).length === 1 && /[^aeiouy][aeiouy][^aeiouwxy]$/.test(word)) {
+                            word += 'e';
+                        }
+                    }
+                    break;
+                }
+            }
+
+            for (const [suffix, replacement] of SEARCH_SUFFIXES) {
+                if (word.endsWith(suffix) && word.length - suffix.length >= 3) {
+                    const base = word.slice(0, -suffix.length);
+                    if (suffix !== 'ly' || !/(?:i|([^aeiouyl])\\1)$/.test(base)) {
+                        word = base + replacement;
+                    }
+                    break;
+                }
+            }
+
+            return dropFinalE(word);
+        }
+
+        // [[offset, term], ...] for every indexed word, offsets counted from the first one
+        function searchTokens(text) {
+            const words = text.toLowerCase().match(/[\\p{L}\\p{N}]+/gu) || [];
+            const tokens = [];
+            words.forEach((word, position) => {
+                if (!SEARCH_STOPWORDS.has(word)) tokens.push([position, searchStem(word)]);
+            });
+            return tokens.map(([position, term]) => [position - tokens[0][0], term]);
+        }
+
+        function loadSearchIndex() {
+            if (!searchIndexRequest) {
+                searchIndexRequest = fetch(searchBox.dataset.index)
+                    .then(response => {
+                        if (!response.ok) throw new Error('Failed to load the search index');
+                        return response.json();
+                    })
+                    .then(shard => {
+                        const index = { shard, decoded: new Map(), averageLength: 0 };
+                        shard.docs.forEach(doc => index.averageLength += doc[3]);
+                        index.averageLength = index.averageLength / (shard.docs.length || 1) || 1;
+                        return index;
+                    });
+                searchIndexRequest.catch(() => searchIndexRequest = null);
+            }
+            return searchIndexRequest;
+        }
+
+        // Map of doc index -> positions, decoded from the delta-encoded postings once
+        function searchPostings(index, term) {
+            if (!index.decoded.has(term)) {
+                const encoded = index.shard.terms[term] || [];
+                const postings = new Map();
+                let doc = 0;
+                for (let i = 0; i < encoded.length; i += 2 + encoded[i + 1]) {
+                    doc += encoded[i];
+                    const positions = [];
+                    let position = 0;
+                    for (let j = 0; j < encoded[i + 1]; j++) {
+                        position += encoded[i + 2 + j];
+                        positions.push(position);
+                    }
+                    postings.set(doc, positions);
+                }
+                index.decoded.set(term, postings);
+            }
+            return index.decoded.get(term);
+        }
+
+        function runSearch(index, query, limit) {
+            const clauses = [];
+            const pattern = /"([^"]*)"|(\\S+)/g;
+            let match;
+            while ((match = pattern.exec(query)) !== null) {
+                const tokens = searchTokens(match[1] !== undefined ? match[1] : match[2]);
+                if (tokens.length) clauses.push(tokens);
+            }
+            if (!clauses.length) return [];
+
+            const terms = [...new Set(clauses.flat().map(([, term]) => term))];
+            let candidates = null;
+            for (const term of terms) {
+                const docs = searchPostings(index, term);
+                candidates = candidates === null
+                    ? [...docs.keys()]
+                    : candidates.filter(doc => docs.has(doc));
+                if (!candidates.length) return [];
+            }
+
+            const phraseMatches = (clause, doc) => {
+                let starts = searchPostings(index, clause[0][1]).get(doc).map(position => position - clause[0][0]);
+                for (const [offset, term] of clause.slice(1)) {
+                    const positions = new Set(searchPostings(index, term).get(doc));
+                    starts = starts.filter(start => positions.has(start + offset));
+                }
+                return starts.length > 0;
+            };
+
+            const totalDocs = index.shard.docs.length;
+            const scored = [];
+            candidates.forEach(doc => {
+                if (clauses.some(clause => clause.length > 1 && !phraseMatches(clause, doc))) return;
+
+                const [, , , length, titleEnd] = index.shard.docs[doc];
+                let score = 0;
+                terms.forEach(term => {
+                    const postings = searchPostings(index, term);
+                    const positions = postings.get(doc);
+                    const frequency = positions.length + positions.filter(position => position < titleEnd).length;
+                    const idf = Math.log(1 + (totalDocs - postings.size + 0.5) / (postings.size + 0.5));
+                    const norm = 1.2 * (1 - 0.75 + 0.75 * length / index.averageLength);
+                    score += idf * frequency * 2.2 / (frequency + norm);
+                });
+                scored.push([score, doc]);
+            });
+
+            scored.sort((a, b) => b[0] - a[0] || a[1] - b[1]);
+            return scored.slice(0, limit).map(([score, doc]) => {
+                const [lessonIndex, slideNumber, title] = index.shard.docs[doc];
+                const [lessonId, lessonTitle] = index.shard.lessons[lessonIndex];
+                return { lessonId, lessonTitle, slideNumber, title, score };
+            });
+        }
+
+        function openSearchResult(result) {
+            searchResults.replaceChildren();
+            const lessonIndex = lessonsIndex.findIndex(lesson => lesson.id === result.lessonId);
+            if (lessonIndex >= 0) {
+                loadLesson(lessonIndex, result.slideNumber);
+            } else if (searchBox.dataset.lessonUrl) {
+                window.location.href = searchBox.dataset.lessonUrl.replace('{id}', encodeURIComponent(result.lessonId))
+                    + `#slide=${result.slideNumber}`;
+            }
+        }
+
+        function showSearchResults(query) {
+            if (!query.trim()) {
+                searchResults.replaceChildren();
+                return;
+            }
+
+            loadSearchIndex().then(index => {
+                // Ignore results for a query the student has already changed
+                if (searchInput.value !== query) return;
+
+                const items = runSearch(index, query, 10).map(result => {
+                    const item = document.createElement('li');
+                    item.textContent = `${result.lessonTitle} - Slide ${result.slideNumber}: ${result.title}`;
+                    item.addEventListener('click', () => openSearchResult(result));
+                    return item;
+                });
+
+                if (!items.length) {
+                    const empty = document.createElement('li');
+                    empty.classList.add('search-empty');
+                    empty.textContent = 'No matching slides';
+                    items.push(empty);
+                }
+                searchResults.replaceChildren(...items);
+            }).catch(() => {
+                searchResults.replaceChildren();
+            });
+        }
+
+        function initializeSearch() {
+            if (!searchBox || !searchBox.dataset.index) return;
+
+            searchBox.hidden = false;
+            searchInput.addEventListener('focus', () => loadSearchIndex().catch(() => {}), { once: true });
+            searchInput.addEventListener('input', () => {
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => showSearchResults(searchInput.value), 150);
+            });
+        }
+
+        document.addEventListener('DOMContentLoaded', initializeSearch);
+""" % {
+    'stopwords': json.dumps(sorted(STOPWORDS)),
+    'suffixes': json.dumps([list(pair) for pair in _SUFFIXES])
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build and query the full-text slide search index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build one index shard per school from the lesson mirror')
+    build_parser.add_argument('--mirror', default=lesson_mirror.DEFAULT_MIRROR_PATH, help='Path to the SQLite mirror file')
+    build_parser.add_argument('--output', default=DEFAULT_INDEX_DIR, help='Directory for the shards (SCHOOL.json)')
+
+    query_parser = subparsers.add_parser('query', help='Search a shard')
+    query_parser.add_argument('shard', help='Index shard, e.g. search/DMT.json')
+    query_parser.add_argument('query', help='Words and "quoted phrases" to search for')
+    query_parser.add_argument('--limit', type=int, default=10, help='Maximum number of results')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        conn = lesson_mirror.open_mirror(args.mirror)
+        for school, shard in build_school_indexes(conn).items():
+            path = os.path.join(args.output, f"{school}.json")
+            write_shard(shard, path)
+            print(f"  {school}: {len(shard['docs'])} slides, {len(shard['terms'])} terms -> {path}")
+    else:
+        index = SearchIndex.load(args.shard)
+        for result in index.search(args.query, args.limit):
+            print(f"  {result['score']:.2f}  {result['lessonTitle']} - Slide {result['slideNumber']}: {result['title']}"
+                  f"  ({result['lessonId']})")
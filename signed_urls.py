@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import os
+import json
+import time
+import datetime
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CACHE_PATH = '.cache/signed_urls.json'
+
+# Signed URLs are valid for 1 hour, matching firebase_storage_list.py
+DEFAULT_EXPIRATION = 60 * 60
+
+# Cached URLs are regenerated once they are this close to expiring
+DEFAULT_REFRESH_MARGIN = 5 * 60
+
+
+class SignedUrlCache:
+    """
+    Persistent cache of V4 signed URLs keyed by bucket, object name, generation and lifetime
+
+    A new object generation (re-upload) never reuses an old URL, a URL
+    signed for one lifetime is never handed out for another, and cached URLs
+    are only handed out while they stay valid for at least the refresh
+    margin.
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"Warning: Ignoring unreadable signed URL cache {cache_path}")
+
+    @staticmethod
+    def key(bucket_name, blob_name, generation, expiration):
+        return f"{bucket_name}/{blob_name}#{generation or ''}@{expiration}"
+
+    def get(self, bucket_name, blob_name, generation, expiration=DEFAULT_EXPIRATION):
+        entry = self._entries.get(self.key(bucket_name, blob_name, generation, expiration))
+        if entry and entry['expires_at'] - self.refresh_margin > time.time():
+            return entry['url']
+        return None
+
+    def put(self, bucket_name, blob_name, generation, url, expires_at, expiration=DEFAULT_EXPIRATION):
+        with self._lock:
+            self._entries[self.key(bucket_name, blob_name, generation, expiration)] = {
+                'url': url,
+                'expires_at': expires_at
+            }
+
+    def save(self):
+        """
+        Write the cache to disk, dropping entries that have already expired
+        """
+        if not self.cache_path:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if entry['expires_at'] > now
+            }
+            entries = dict(self._entries)
+
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file first so an interrupted run cannot corrupt the cache
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+def generate_signed_urls(blobs, expiration=DEFAULT_EXPIRATION, max_workers=8, cache=None):
+    """
+    Get V4 signed GET URLs for many blobs, reusing cached URLs where possible
+
+    URLs missing from the cache (or close to expiring) are signed in parallel
+    on a thread pool.
+
+    Args:
+        blobs (iterable): google.cloud.storage Blob objects
+        expiration (int): URL lifetime in seconds
+        max_workers (int): Number of URLs signed in parallel
+        cache (SignedUrlCache): Cache to read and update (defaults to the on-disk cache)
+
+    Returns:
+        dict: Blob name -> signed URL
+    """
+    if cache is None:
+        cache = SignedUrlCache()
+
+    urls = {}
+    to_sign = []
+
+    for blob in blobs:
+        url = cache.get(blob.bucket.name, blob.name, blob.generation, expiration)
+        if url:
+            urls[blob.name] = url
+        else:
+            to_sign.append(blob)
+
+    def sign(blob):
+        expires_at = time.time() + expiration
+        url = blob.generate_signed_url(
+            version="v4",
+            expiration=datetime.timedelta(seconds=expiration),
+            method="GET"
+        )
+        cache.put(blob.bucket.name, blob.name, blob.generation, url, expires_at, expiration)
+        return blob.name, url
+
+    if to_sign:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for name, url in executor.map(sign, to_sign):
+                urls[name] = url
+
+    cache.save()
+    return urls
+
+
+def signed_urls_for_paths(bucket, storage_paths, expiration=DEFAULT_EXPIRATION, max_workers=8, cache=None):
+    """
+    Get signed URLs for objects given by storage path, e.g. the storagePath of slide images
+
+    Object generations are looked up with one listing per directory rather
+    than one metadata request per object. Paths that do not exist in the
+    bucket are left out of the result.
+
+    Args:
+        bucket: google.cloud.storage Bucket
+        storage_paths (iterable): Object names
+        expiration (int): URL lifetime in seconds
+        max_workers (int): Number of URLs signed in parallel
+        cache (SignedUrlCache): Cache to read and update (defaults to the on-disk cache)
+
+    Returns:
+        dict: Storage path -> signed URL
+    """
+    wanted = set(storage_paths)
+    # Top-level objects are listed from the bucket root, whose prefix is empty rather than '/'
+    prefixes = {posixpath.join(posixpath.dirname(path), '') for path in wanted}
+
+    blobs = []
+    for prefix in sorted(prefixes):
+        for blob in bucket.list_blobs(prefix=prefix, delimiter='/'):
+            if blob.name in wanted:
+                blobs.append(blob)
+
+    missing = wanted - {blob.name for blob in blobs}
+    if missing:
+        print(f"Warning: {len(missing)} storage paths not found in bucket {bucket.name}")
+
+    return generate_signed_urls(blobs, expiration, max_workers, cache)
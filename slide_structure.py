@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# Structured slide model shared by the extractor, uploaders and viewers.
+# A slide carries a plain "title" and a list of "blocks", each one of
+#   {"type": "heading", "text": ...}
+#   {"type": "paragraph", "text": ...}
+#   {"type": "bullet", "text": ..., "level": 0..8}
+# so clients render them directly instead of parsing the slide text.
+#
+# Blocks that repeat on most slides of a deck (document codes, running
+# headers) are stored once in the lesson's "boilerplate" list; slides keep
+#   {"type": "boilerplate", "ref": index into that list}
+# in their place. restore_boilerplate puts the original blocks back.
+
+import json
+
+# Shorter all-caps lines (e.g. "CPR", "AED") are treated as ordinary text
+HEADING_MIN_LENGTH = 4
+
+# A block is boilerplate when it appears on more than this share of the
+# slides of a deck with at least BOILERPLATE_MIN_SLIDES slides
+BOILERPLATE_MIN_SHARE = 0.5
+BOILERPLATE_MIN_SLIDES = 3
+
+# Shorter text costs about as much as the reference that would replace it
+BOILERPLATE_MIN_LENGTH = 12
+
+
+def is_heading_text(text):
+    """
+    True for all-caps lines such as "SIGNS AND SYMPTOMS:"
+    """
+    return len(text) >= HEADING_MIN_LENGTH and text == text.upper() and text != text.lower()
+
+
+def paragraph_block(text, level=0, bold=False, bulleted=False):
+    """
+    Classify one text-frame paragraph as a heading, paragraph or bullet
+
+    Args:
+        text (str): Paragraph text
+        level (int): Indentation level of the paragraph (0-8)
+        bold (bool): Every run of the paragraph is bold
+        bulleted (bool): The paragraph is shown with a bullet or number
+
+    Returns:
+        dict: Block
+    """
+    if bulleted:
+        return {"type": "bullet", "text": text, "level": level}
+    if level == 0 and (bold or is_heading_text(text)):
+        return {"type": "heading", "text": text}
+    return {"type": "paragraph", "text": text}
+
+
+def blocks_from_lines(lines):
+    """
+    Build blocks from plain lines of text, with all-caps lines as headings
+    """
+    return [paragraph_block(line) for line in (line.strip() for line in lines) if line]
+
+
+def block_texts(blocks):
+    """
+    Plain text of every block, for consumers that only understand "content" strings
+
+    Boilerplate references are skipped; restore_boilerplate first to include them.
+    """
+    return [block["text"] for block in blocks if "text" in block]
+
+
+def ensure_slide_structure(slide_data):
+    """
+    Add "title" and "blocks" to a slide extracted before the structured model
+
+    Older extracts put a whole text frame into "title" and other text boxes
+    into "content". The first line becomes the title and everything else is
+    split into blocks, once, so no client has to do it while rendering.
+    Slides that already have blocks are returned unchanged.
+
+    Args:
+        slide_data (dict): Slide dictionary, updated in place
+
+    Returns:
+        dict: The same slide dictionary
+    """
+    if "blocks" in slide_data:
+        return slide_data
+
+    lines = [line.strip() for line in (slide_data.get("title") or "").split("\n") if line.strip()]
+    blocks = blocks_from_lines(lines[1:])
+
+    for text in slide_data.get("content") or []:
+        if isinstance(text, str):
+            blocks.extend(blocks_from_lines(text.split("\n")))
+
+    slide_data["title"] = lines[0] if lines else ""
+    slide_data["blocks"] = blocks
+    return slide_data
+
+
+def _block_key(block):
+    return json.dumps(block, sort_keys=True, ensure_ascii=False)
+
+
+def _has_derived_content(slide_data):
+    # Only slides whose content is exactly their block text can drop and rebuild it
+    return slide_data.get("content") == block_texts(slide_data.get("blocks") or [])
+
+
+def find_boilerplate(slides):
+    """
+    Blocks that repeat on most slides of a deck, in order of first appearance
+
+    Args:
+        slides (list): Slide dictionaries with blocks
+
+    Returns:
+        list: Boilerplate blocks
+    """
+    if len(slides) < BOILERPLATE_MIN_SLIDES:
+        return []
+
+    counts = {}
+    blocks = {}
+    for slide_data in slides:
+        if not _has_derived_content(slide_data):
+            continue
+        slide_keys = set()
+        for block in slide_data.get("blocks") or []:
+            if len(block.get("text", "")) < BOILERPLATE_MIN_LENGTH:
+                continue
+            key = _block_key(block)
+            blocks.setdefault(key, block)
+            if key not in slide_keys:
+                slide_keys.add(key)
+                counts[key] = counts.get(key, 0) + 1
+
+    return [block for key, block in blocks.items() if counts[key] > BOILERPLATE_MIN_SHARE * len(slides)]
+
+
+def lift_boilerplate(slides):
+    """
+    Replace boilerplate blocks of a deck's slides with references, in place
+
+    Slide "content" drops the lifted text too. Slides whose content is not
+    just their block text (older uploads) are left untouched, so
+    restore_boilerplate always gives back the original slides.
+
+    Args:
+        slides (list): Slide dictionaries with blocks and content
+
+    Returns:
+        list: Boilerplate blocks, to store with the lesson as "boilerplate"
+    """
+    boilerplate = find_boilerplate(slides)
+    refs = {_block_key(block): index for index, block in enumerate(boilerplate)}
+    if not refs:
+        return boilerplate
+
+    for slide_data in slides:
+        if not _has_derived_content(slide_data):
+            continue
+        slide_data["blocks"] = [
+            {"type": "boilerplate", "ref": refs[_block_key(block)]} if _block_key(block) in refs else block
+            for block in slide_data["blocks"]
+        ]
+        slide_data["content"] = block_texts(slide_data["blocks"])
+
+    return boilerplate
+
+
+def restore_boilerplate(slides, boilerplate):
+    """
+    Put lifted boilerplate blocks (and their content text) back into slides, in place
+
+    Args:
+        slides (list): Slide dictionaries, possibly with boilerplate references
+        boilerplate (list): The lesson's "boilerplate" blocks (may be None)
+
+    Returns:
+        list: The same slides
+    """
+    if not boilerplate:
+        return slides
+
+    for slide_data in slides:
+        blocks = slide_data.get("blocks") or []
+        if not any(block.get("type") == "boilerplate" for block in blocks):
+            continue
+        slide_data["blocks"] = [
+            dict(boilerplate[block["ref"]]) if block.get("type") == "boilerplate" else block
+            for block in blocks
+        ]
+        slide_data["content"] = block_texts(slide_data["blocks"])
+
+    return slides
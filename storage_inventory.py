@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import io
+import os
+import csv
+import json
+import argparse
+import firebase_client
+
+INVENTORY_FIELDS = ['name', 'size', 'content_type', 'updated', 'generation', 'school', 'lesson']
+
+
+def classify_blob_path(name):
+    """
+    Split a storage path into its school code and lesson ID
+
+    Lesson content is stored under schools/SCHOOL_CODE/lessons/LESSON_ID/...;
+    anything else is reported without a school or lesson.
+
+    Returns:
+        tuple: (school_code or None, lesson_id or None)
+    """
+    parts = name.split('/')
+    school = parts[1] if len(parts) > 2 and parts[0] == 'schools' else None
+    lesson = parts[3] if school and len(parts) > 4 and parts[2] == 'lessons' else None
+    return school, lesson
+
+
+def _empty_rollups():
+    return {'total': {'objects': 0, 'bytes': 0}, 'schools': {}, 'lessons': {}, 'content_types': {}}
+
+
+def _add_to_rollup(group, key, size):
+    entry = group.setdefault(key, {'objects': 0, 'bytes': 0})
+    entry['objects'] += 1
+    entry['bytes'] += size
+
+
+def _add_row(rollups, row):
+    size = int(row['size'] or 0)
+    rollups['total']['objects'] += 1
+    rollups['total']['bytes'] += size
+    _add_to_rollup(rollups['content_types'], row['content_type'], size)
+    if row['school']:
+        _add_to_rollup(rollups['schools'], row['school'], size)
+    if row['lesson']:
+        _add_to_rollup(rollups['lessons'], f"{row['school']}/{row['lesson']}", size)
+
+
+def _rollups_from_output(output_path, output_format):
+    """
+    Rebuild the rollups from the rows of an inventory file
+
+    Checkpoints leave the rollups out, as the per-lesson totals grow with the
+    bucket; a resumed run reads back the rows it already wrote instead.
+    """
+    rollups = _empty_rollups()
+    with open(output_path, 'r', newline='', encoding='utf-8') as f:
+        rows = csv.DictReader(f) if output_format == 'csv' else (json.loads(line) for line in f)
+        for row in rows:
+            _add_row(rollups, row)
+    return rollups
+
+
+def _load_checkpoint(checkpoint_path):
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r') as f:
+            return json.load(f)
+    return None
+
+
+def _save_checkpoint(checkpoint_path, checkpoint):
+    # Replace atomically so an interrupted run always leaves a usable checkpoint
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def build_storage_inventory(bucket, output_path, prefix=None, output_format='jsonl',
+                            page_size=1000, checkpoint_path=None):
+    """
+    Stream an inventory of a Storage bucket to a JSONL or CSV file
+
+    Objects are listed one page at a time and written out as they arrive, so
+    memory use does not grow with the number of objects. Byte and object
+    counts per school, lesson and content type are aggregated in the same
+    pass. After every page the page token and output length in bytes are
+    checkpointed; rerunning with the same checkpoint resumes from the last
+    completed page without duplicating rows, and rebuilds the rollups from
+    the rows already written. A checkpoint whose output file is gone or
+    shorter than recorded starts a fresh run.
+
+    Args:
+        bucket: google.cloud.storage Bucket
+        output_path (str): Inventory file to write
+        prefix (str): Only list objects under this prefix, e.g. schools/DMT/lessons/ (optional)
+        output_format (str): 'jsonl' or 'csv'
+        page_size (int): Objects requested per listing page
+        checkpoint_path (str): Checkpoint file for resuming (optional)
+
+    Returns:
+        dict: Rollups with total, schools, lessons and content_types entries
+    """
+    checkpoint = _load_checkpoint(checkpoint_path)
+
+    if checkpoint:
+        if checkpoint.get('prefix') != prefix or checkpoint.get('output_path') != output_path:
+            raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different inventory run")
+        if not os.path.exists(output_path) or os.path.getsize(output_path) < checkpoint['output_bytes']:
+            print(f"Warning: {output_path} is missing or shorter than {checkpoint_path} recorded, starting over")
+            checkpoint = None
+
+    if checkpoint:
+        # Drop anything written after the last checkpointed page
+        os.truncate(output_path, checkpoint['output_bytes'])
+        rollups = _rollups_from_output(output_path, output_format)
+        if checkpoint.get('done'):
+            print(f"Inventory already complete according to {checkpoint_path}")
+            return rollups
+
+        page_token = checkpoint['page_token']
+        out = open(output_path, 'ab')
+        print(f"Resuming inventory after {rollups['total']['objects']} objects")
+    else:
+        rollups = _empty_rollups()
+        page_token = None
+        out = open(output_path, 'wb')
+
+    # Each page is formatted as text, then written as bytes, so out.tell() is a byte offset
+    buffer = io.StringIO(newline='')
+    writer = None
+    if output_format == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=INVENTORY_FIELDS)
+        if not checkpoint:
+            writer.writeheader()
+
+    with out:
+        blobs = bucket.list_blobs(prefix=prefix, page_size=page_size, page_token=page_token)
+
+        for page in blobs.pages:
+            for blob in page:
+                school, lesson = classify_blob_path(blob.name)
+
+                row = {
+                    'name': blob.name,
+                    'size': blob.size or 0,
+                    'content_type': blob.content_type or 'unknown',
+                    'updated': blob.updated.isoformat() if blob.updated else None,
+                    'generation': blob.generation,
+                    'school': school,
+                    'lesson': lesson
+                }
+                if writer:
+                    writer.writerow(row)
+                else:
+                    buffer.write(json.dumps(row) + '\n')
+
+                _add_row(rollups, row)
+
+            out.write(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+            out.flush()
+
+            if checkpoint_path:
+                _save_checkpoint(checkpoint_path, {
+                    'prefix': prefix,
+                    'output_path': output_path,
+                    'page_token': blobs.next_page_token,
+                    'output_bytes': out.tell(),
+                    'done': blobs.next_page_token is None
+                })
+
+            print(f"  ... {rollups['total']['objects']} objects, {rollups['total']['bytes'] / (1024 * 1024):.2f} MB")
+
+    return rollups
+
+
+def print_rollups(rollups):
+    """
+    Print the per-school, per-lesson and per-content-type totals
+    """
+    total = rollups['total']
+    print(f"\nTotal: {total['objects']} objects, {total['bytes'] / (1024 * 1024):.2f} MB")
+
+    for title, group in (('School', 'schools'), ('Lesson', 'lessons'), ('Content Type', 'content_types')):
+        if not rollups[group]:
+            continue
+        print(f"\nBy {title.lower()}:")
+        for key, entry in sorted(rollups[group].items(), key=lambda item: item[1]['bytes'], reverse=True):
+            print(f"  - {key}: {entry['objects']} objects, {entry['bytes'] / 1024:.2f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Stream an inventory of Firebase Storage with size rollups')
+    parser.add_argument('credentials', help='Path to Firebase credentials JSON file')
+    parser.add_argument('output', help='Inventory file to write')
+    parser.add_argument('--prefix', help='Only list objects under this prefix, e.g. schools/DMT/lessons/')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='Inventory file format')
+    parser.add_argument('--page-size', type=int, default=1000, help='Objects requested per listing page')
+    parser.add_argument('--checkpoint', help='Checkpoint file used to resume an interrupted inventory')
+    parser.add_argument('--summary', help='Also write the rollups to this JSON file')
+    parser.add_argument('--storage-bucket', help='Firebase Storage bucket name (defaults to the project bucket)')
+
+    args = parser.parse_args()
+
+    bucket = firebase_client.get_bucket(args.credentials, args.storage_bucket)
+
+    print(f"\n===== STORAGE INVENTORY: {bucket.name}/{args.prefix or ''} =====\n")
+
+    rollups = build_storage_inventory(
+        bucket,
+        args.output,
+        args.prefix,
+        args.format,
+        args.page_size,
+        args.checkpoint
+    )
+
+    print_rollups(rollups)
+
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(rollups, f, indent=2)
+        print(f"\nRollups saved to: {args.summary}")
@@ -1,647 +1,1086 @@
 #!/usr/bin/env python3
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+import firebase_client
 import sys
 import json
 from datetime import datetime
 import os
+import argparse
+import html_templates
+import precompress
+import slide_structure
+import search_index
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_student_lesson_viewer():
-    """
-    Generate an interactive student-focused lesson viewer specifically for Lesson_01 and Lesson_02
-    """
-    # Initialize Firebase
-    try:
-        app = firebase_admin.get_app()
-    except ValueError:
-        # If not initialized, initialize it
-        cred = credentials.Certificate('config/service_account.json')
-        app = firebase_admin.initialize_app(cred, {'storageBucket': 'diving-app-8fa28.firebasestorage.app'})
-    
-    # Initialize Firestore
-    db = firestore.client()
-    
-    # Specific lesson IDs from our README documentation
-    lesson_ids = [
-        "LES_20250514005426_9db35c81-6661-4b90",  # Lesson_01
-        "LES_20250514005500_90b1977f-fe0d-45df"   # Lesson_02
-    ]
-    
-    lessons_data = []
-    
-    print("Fetching data for Lesson 01 and Lesson 02...")
-    
-    # Get lesson data for each lesson ID
-    for lesson_id in lesson_ids:
-        lesson_doc = db.collection('lessons').document(lesson_id).get()
-        
-        if not lesson_doc.exists:
-            print(f"Warning: Lesson with ID {lesson_id} not found")
-            continue
-            
-        lesson_data = lesson_doc.to_dict()
-        
-        # Get all slides for this lesson
-        slides = db.collection('lessons').document(lesson_id).collection('slides').stream()
-        slides_list = list(slides)
+# Lessons shown when no lesson IDs or module ID are given (see README.md)
+DEFAULT_LESSON_IDS = [
+    "LES_20250514005426_9db35c81-6661-4b90",  # Lesson_01
+    "LES_20250514005500_90b1977f-fe0d-45df"   # Lesson_02
+]
+
+# Per-lesson JSON shards are written here, relative to the viewer page
+LESSON_SHARD_DIR = 'lessons'
+
+# Viewer page before and after the inline lesson index, compiled once
+VIEWER_PAGE_START = html_templates.HtmlTemplate("""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ title }}</title>
+    <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap" rel="stylesheet">
+    {{ styles|raw }}
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Logit LMS - Interactive Lesson Viewer</h1>
+            <p>Your personalized learning experience for Accident Management</p>
+        </div>
         
-        # Sort slides by slide number
-        slides_list = sorted(slides_list, key=lambda slide: slide.to_dict().get('slideNumber', 0))
+        <div class="lesson-tabs">
+            <!-- Tabs will be generated by JS -->
+        </div>
         
-        # Process slides
-        processed_slides = []
+        <div class="lesson-search" data-index="{{ search_index }}" data-lesson-url="{{ lesson_url }}" hidden>
+            <input type="search" class="search-input" placeholder="Search all slides..." aria-label="Search all slides">
+            <ul class="search-results"></ul>
+        </div>
         
-        for slide in slides_list:
-            slide_data = slide.to_dict()
+        <div class="lesson-content">
+            <div class="slides-nav">
+                <button class="nav-btn prev-slide">Previous</button>
+                <span class="slide-counter">Slide 1 of 15</span>
+                <button class="nav-btn next-slide">Next</button>
+            </div>
             
-            # Process images to ensure they have valid URLs
-            processed_images = []
-            for image in slide_data.get('images', []):
-                if 'url' in image and image['url'] and not image['url'].startswith('PLACEHOLDER'):
-                    processed_images.append(image)
+            <div class="slides-container">
+                <!-- Slide content will be inserted here by JavaScript -->
+            </div>
             
-            slide_data['images'] = processed_images
-            processed_slides.append(slide_data)
+            <div class="progress-container">
+                <div class="progress-bar" style="width: 0%"></div>
+            </div>
+        </div>
         
-        # Add processed slides to the lesson data
-        lesson_data['slides'] = processed_slides
-        lessons_data.append({
-            'id': lesson_id,
-            'data': lesson_data
-        })
+        <div class="footer">
+            <p>© 2025 Logit LMS. All content is for educational purposes.</p>
+            <p>Generated on: {{ generated_on }}</p>
+        </div>
+    </div>
     
-    print(f"Found {len(lessons_data)} lessons")
+    <!-- Modal for image enlargement -->
+    <div class="modal" id="imageModal">
+        <span class="close-modal">&times;</span>
+        <div class="modal-content">
+            <img id="modalImage" src="" alt="Enlarged image">
+        </div>
+    </div>
     
-    # Generate engaging student view HTML
-    html_output = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Logit LMS - Interactive Lesson Viewer</title>
-        <link href="https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap" rel="stylesheet">
-        <style>
-            :root {
-                --primary-color: #3498db;
-                --secondary-color: #2ecc71;
-                --accent-color: #e74c3c;
-                --text-color: #2c3e50;
-                --light-gray: #f5f7fa;
-                --dark-gray: #7f8c8d;
-                --white: #ffffff;
-                --shadow: 0 3px 10px rgba(0, 0, 0, 0.1);
-            }
-            
-            * {
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }
-            
-            body {
-                font-family: 'Roboto', sans-serif;
-                color: var(--text-color);
-                background-color: var(--light-gray);
-                line-height: 1.6;
-            }
-            
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 20px;
-            }
-            
-            .header {
-                text-align: center;
-                margin-bottom: 30px;
-                padding: 20px;
-                background-color: var(--white);
-                border-radius: 10px;
-                box-shadow: var(--shadow);
-            }
-            
-            .header h1 {
-                color: var(--primary-color);
-                margin-bottom: 10px;
-            }
-            
-            .header p {
-                color: var(--dark-gray);
-            }
-            
-            .lesson-tabs {
-                display: flex;
-                margin-bottom: 20px;
-                border-radius: 8px;
-                overflow: hidden;
-                box-shadow: var(--shadow);
-            }
-            
-            .tab {
-                flex: 1;
-                padding: 15px;
-                text-align: center;
-                background-color: var(--white);
-                cursor: pointer;
-                font-weight: 500;
-                transition: all 0.3s ease;
-            }
-            
-            .tab:hover {
-                background-color: rgba(52, 152, 219, 0.1);
-            }
-            
-            .tab.active {
-                background-color: var(--primary-color);
-                color: var(--white);
-            }
-            
-            .lesson-content {
-                background-color: var(--white);
-                border-radius: 10px;
-                box-shadow: var(--shadow);
-                overflow: hidden;
-                margin-bottom: 30px;
-            }
-            
-            .slides-nav {
-                display: flex;
-                justify-content: center;
-                align-items: center;
-                padding: 15px;
-                background-color: var(--primary-color);
-                color: white;
-            }
-            
-            .nav-btn {
-                background-color: transparent;
-                border: 2px solid var(--white);
-                color: var(--white);
-                padding: 8px 15px;
-                border-radius: 30px;
-                cursor: pointer;
-                margin: 0 10px;
-                font-weight: 500;
-                transition: all 0.3s ease;
-            }
-            
-            .nav-btn:hover {
-                background-color: var(--white);
-                color: var(--primary-color);
-            }
-            
-            .slide-counter {
-                font-weight: 500;
-                margin: 0 15px;
-            }
-            
+    <script>
+        // Lesson index; each lesson's slides live in their own JSON shard
+        const lessonsIndex = """)
+
+VIEWER_PAGE_END = html_templates.HtmlTemplate(""";
+    </script>
+    {{ scripts|raw }}
+</body>
+</html>
+""")
+
+# Viewer styles and script, inlined into the page or written out as assets
+VIEWER_CSS = """
+        :root {
+            --primary-color: #3498db;
+            --secondary-color: #2ecc71;
+            --accent-color: #e74c3c;
+            --text-color: #2c3e50;
+            --light-gray: #f5f7fa;
+            --dark-gray: #7f8c8d;
+            --white: #ffffff;
+            --shadow: 0 3px 10px rgba(0, 0, 0, 0.1);
+        }
+        
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+        
+        body {
+            font-family: 'Roboto', sans-serif;
+            color: var(--text-color);
+            background-color: var(--light-gray);
+            line-height: 1.6;
+        }
+        
+        .container {
+            max-width: 1200px;
+            margin: 0 auto;
+            padding: 20px;
+        }
+        
+        .header {
+            text-align: center;
+            margin-bottom: 30px;
+            padding: 20px;
+            background-color: var(--white);
+            border-radius: 10px;
+            box-shadow: var(--shadow);
+        }
+        
+        .header h1 {
+            color: var(--primary-color);
+            margin-bottom: 10px;
+        }
+        
+        .header p {
+            color: var(--dark-gray);
+        }
+        
+        .lesson-tabs {
+            display: flex;
+            flex-wrap: wrap;
+            margin-bottom: 20px;
+            border-radius: 8px;
+            overflow: hidden;
+            box-shadow: var(--shadow);
+        }
+        
+        .tab {
+            flex: 1;
+            padding: 15px;
+            text-align: center;
+            background-color: var(--white);
+            cursor: pointer;
+            font-weight: 500;
+            transition: all 0.3s ease;
+        }
+        
+        .tab:hover {
+            background-color: rgba(52, 152, 219, 0.1);
+        }
+        
+        .tab.active {
+            background-color: var(--primary-color);
+            color: var(--white);
+        }
+        
+        .lesson-content {
+            background-color: var(--white);
+            border-radius: 10px;
+            box-shadow: var(--shadow);
+            overflow: hidden;
+            margin-bottom: 30px;
+        }
+        
+        .slides-nav {
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            padding: 15px;
+            background-color: var(--primary-color);
+            color: white;
+        }
+        
+        .nav-btn {
+            background-color: transparent;
+            border: 2px solid var(--white);
+            color: var(--white);
+            padding: 8px 15px;
+            border-radius: 30px;
+            cursor: pointer;
+            margin: 0 10px;
+            font-weight: 500;
+            transition: all 0.3s ease;
+        }
+        
+        .nav-btn:hover {
+            background-color: var(--white);
+            color: var(--primary-color);
+        }
+        
+        .slide-counter {
+            font-weight: 500;
+            margin: 0 15px;
+        }
+        
+        .slide {
+            padding: 30px;
+            display: none;
+        }
+        
+        .slide.active {
+            display: block;
+            animation: fadeIn 0.5s ease;
+        }
+        
+        @keyframes fadeIn {
+            from { opacity: 0; }
+            to { opacity: 1; }
+        }
+        
+        .slide-title {
+            font-size: 1.8rem;
+            margin-bottom: 20px;
+            color: var(--primary-color);
+            border-bottom: 2px solid var(--light-gray);
+            padding-bottom: 10px;
+        }
+        
+        .slide-content {
+            margin-bottom: 25px;
+            white-space: pre-line;
+        }
+        
+        .slide-content p {
+            margin-bottom: 15px;
+        }
+        
+        .slide-images {
+            display: flex;
+            flex-wrap: wrap;
+            justify-content: center;
+            gap: 20px;
+            margin-top: 20px;
+        }
+        
+        .slide-image {
+            border-radius: 8px;
+            overflow: hidden;
+            box-shadow: var(--shadow);
+            transition: transform 0.3s ease;
+            max-width: 100%;
+        }
+        
+        .slide-image:hover {
+            transform: scale(1.03);
+        }
+        
+        .slide-image img {
+            max-width: 100%;
+            height: auto;
+            display: block;
+        }
+        
+        .footer {
+            text-align: center;
+            padding: 20px;
+            color: var(--dark-gray);
+            font-size: 0.9rem;
+        }
+        
+        .progress-container {
+            width: 100%;
+            height: 10px;
+            background-color: var(--light-gray);
+            border-radius: 5px;
+            margin-top: 15px;
+            overflow: hidden;
+        }
+        
+        .progress-bar {
+            height: 100%;
+            background-color: var(--secondary-color);
+            border-radius: 5px;
+            transition: width 0.3s ease;
+        }
+        
+        .content-section {
+            background-color: var(--light-gray);
+            padding: 15px;
+            border-radius: 8px;
+            margin-bottom: 15px;
+        }
+        
+        .content-heading {
+            font-weight: 500;
+            margin-bottom: 5px;
+            color: var(--primary-color);
+        }
+        
+        .tab-group {
+            flex-basis: 100%;
+            font-weight: 500;
+            color: var(--primary-color);
+            padding: 5px 0;
+        }
+        
+        .lesson-search {
+            position: relative;
+            margin-bottom: 20px;
+        }
+        
+        .search-input {
+            width: 100%;
+            padding: 10px 15px;
+            border: 1px solid var(--light-gray);
+            border-radius: 8px;
+            font-size: 1rem;
+        }
+        
+        .search-results {
+            list-style: none;
+            background-color: white;
+            box-shadow: var(--shadow);
+            border-radius: 8px;
+            max-height: 300px;
+            overflow-y: auto;
+        }
+        
+        .search-results li {
+            padding: 10px 15px;
+            cursor: pointer;
+        }
+        
+        .search-results li:hover {
+            background-color: var(--light-gray);
+        }
+        
+        .search-results .search-empty {
+            cursor: default;
+            color: #777;
+        }
+        
+        .content-bullets {
+            margin: 0 0 15px 20px;
+        }
+        
+        .content-bullets li {
+            margin-bottom: 5px;
+        }
+        
+        /* Responsive adjustments */
+        @media (max-width: 768px) {
             .slide {
-                padding: 30px;
-                display: none;
-            }
-            
-            .slide.active {
-                display: block;
-                animation: fadeIn 0.5s ease;
-            }
-            
-            @keyframes fadeIn {
-                from { opacity: 0; }
-                to { opacity: 1; }
+                padding: 20px;
             }
             
             .slide-title {
-                font-size: 1.8rem;
-                margin-bottom: 20px;
-                color: var(--primary-color);
-                border-bottom: 2px solid var(--light-gray);
-                padding-bottom: 10px;
-            }
-            
-            .slide-content {
-                margin-bottom: 25px;
-                white-space: pre-line;
-            }
-            
-            .slide-content p {
-                margin-bottom: 15px;
+                font-size: 1.5rem;
             }
             
             .slide-images {
-                display: flex;
-                flex-wrap: wrap;
-                justify-content: center;
-                gap: 20px;
-                margin-top: 20px;
+                flex-direction: column;
+                align-items: center;
             }
             
             .slide-image {
-                border-radius: 8px;
-                overflow: hidden;
-                box-shadow: var(--shadow);
-                transition: transform 0.3s ease;
                 max-width: 100%;
             }
-            
-            .slide-image:hover {
-                transform: scale(1.03);
-            }
-            
-            .slide-image img {
-                max-width: 100%;
-                height: auto;
-                display: block;
+        }
+        
+        /* Image modal for enlargement */
+        .modal {
+            display: none;
+            position: fixed;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 100%;
+            background-color: rgba(0, 0, 0, 0.8);
+            z-index: 1000;
+            justify-content: center;
+            align-items: center;
+        }
+        
+        .modal-content {
+            max-width: 80%;
+            max-height: 80%;
+        }
+        
+        .modal-content img {
+            width: 100%;
+            height: auto;
+            object-fit: contain;
+        }
+        
+        .close-modal {
+            position: absolute;
+            top: 20px;
+            right: 30px;
+            color: white;
+            font-size: 35px;
+            cursor: pointer;
+        }
+"""
+
+VIEWER_JS = """
+        // DOM Elements
+        const lessonTabs = document.querySelector('.lesson-tabs');
+        const slidesContainer = document.querySelector('.slides-container');
+        const slideCounter = document.querySelector('.slide-counter');
+        const prevButton = document.querySelector('.prev-slide');
+        const nextButton = document.querySelector('.next-slide');
+        const progressBar = document.querySelector('.progress-bar');
+        const modal = document.getElementById('imageModal');
+        const modalImg = document.getElementById('modalImage');
+        const closeModal = document.querySelector('.close-modal');
+        
+        // Lesson shards requested so far, as promises, by lesson index
+        const lessonCache = new Map();
+        
+        // Slides kept in the DOM on each side of the current one
+        const SLIDE_WINDOW = 1;
+        
+        // Navigation latency samples kept for viewerMetrics
+        const MAX_NAVIGATION_SAMPLES = 500;
+        
+        // State
+        let currentLessonIndex = 0;
+        let currentSlideIndex = 0;
+        let totalSlides = 0;
+        let currentSlides = [];
+        let publishingNote = '';
+        let currentBoilerplate = [];
+        
+        // Rendered slide nodes by slide index, and detached nodes kept for reuse
+        const slideNodes = new Map();
+        const sparePool = [];
+        
+        // Image URLs already requested ahead of time
+        const prefetchedImages = new Set();
+        
+        // Milliseconds from a navigation to the next frame, readable from the console
+        const navigationTimings = [];
+        window.viewerMetrics = {
+            navigations: navigationTimings,
+            summary() {
+                const times = navigationTimings.map(sample => sample.ms).sort((a, b) => a - b);
+                if (times.length === 0) return { count: 0 };
+                const at = fraction => times[Math.min(times.length - 1, Math.floor(fraction * times.length))];
+                return { count: times.length, median: at(0.5), p95: at(0.95), max: times[times.length - 1] };
             }
+        };
+        
+        // Initialize the app
+        function initializeApp() {
+            // Create lesson tabs
+            lessonsIndex.forEach((lesson, index) => {
+                // Label each module of a course before its first lesson
+                if (lesson.module && (index === 0 || lessonsIndex[index - 1].module !== lesson.module)) {
+                    const group = document.createElement('div');
+                    group.classList.add('tab-group');
+                    group.textContent = lesson.module;
+                    lessonTabs.appendChild(group);
+                }
+                
+                const tab = document.createElement('div');
+                tab.classList.add('tab');
+                if (index === 0) tab.classList.add('active');
+                tab.textContent = lesson.title || `Lesson ${index + 1}`;
+                tab.addEventListener('click', () => switchLesson(index));
+                lessonTabs.appendChild(tab);
+            });
             
-            .footer {
-                text-align: center;
-                padding: 20px;
-                color: var(--dark-gray);
-                font-size: 0.9rem;
+            // Load the first lesson, at the slide named in the URL (e.g. #slide=4) if any
+            if (lessonsIndex.length > 0) {
+                const slideMatch = window.location.hash.match(/slide=(\\d+)/);
+                loadLesson(0, slideMatch ? Number(slideMatch[1]) : null);
             }
             
-            .progress-container {
-                width: 100%;
-                height: 10px;
-                background-color: var(--light-gray);
-                border-radius: 5px;
-                margin-top: 15px;
-                overflow: hidden;
-            }
+            // Event listeners
+            prevButton.addEventListener('click', showPreviousSlide);
+            nextButton.addEventListener('click', showNextSlide);
+            closeModal.addEventListener('click', () => modal.style.display = 'none');
             
-            .progress-bar {
-                height: 100%;
-                background-color: var(--secondary-color);
-                border-radius: 5px;
-                transition: width 0.3s ease;
-            }
+            // Keyboard navigation
+            document.addEventListener('keydown', (e) => {
+                if (e.key === 'ArrowLeft') {
+                    showPreviousSlide();
+                } else if (e.key === 'ArrowRight') {
+                    showNextSlide();
+                } else if (e.key === 'Escape' && modal.style.display === 'flex') {
+                    modal.style.display = 'none';
+                }
+            });
             
-            .content-section {
-                background-color: var(--light-gray);
-                padding: 15px;
-                border-radius: 8px;
-                margin-bottom: 15px;
+            // Close modal if clicked outside the image
+            window.addEventListener('click', (e) => {
+                if (e.target === modal) {
+                    modal.style.display = 'none';
+                }
+            });
+        }
+        
+        // Fetch a lesson shard once; repeated calls share the same request
+        function fetchLesson(index) {
+            if (!lessonCache.has(index)) {
+                const entry = lessonsIndex[index];
+                const request = entry.data
+                    ? Promise.resolve(entry.data)
+                    : fetch(entry.shard).then(response => {
+                        if (!response.ok) throw new Error(`Failed to load ${entry.shard}`);
+                        return response.json();
+                    });
+                
+                // Allow a retry if the request failed
+                request.catch(() => lessonCache.delete(index));
+                lessonCache.set(index, request);
             }
+            return lessonCache.get(index);
+        }
+        
+        // Load a specific lesson, optionally opening the slide with the given number
+        function loadLesson(index, startSlideNumber = null) {
+            if (index < 0 || index >= lessonsIndex.length) return;
             
-            .content-heading {
-                font-weight: 500;
-                margin-bottom: 5px;
-                color: var(--primary-color);
-            }
+            currentLessonIndex = index;
+            currentSlideIndex = 0;
             
-            /* Responsive adjustments */
-            @media (max-width: 768px) {
-                .slide {
-                    padding: 20px;
+            // Update active tab
+            document.querySelectorAll('.tab').forEach((tab, i) => {
+                if (i === index) {
+                    tab.classList.add('active');
+                } else {
+                    tab.classList.remove('active');
                 }
+            });
+            
+            releaseAllSlides();
+            currentSlides = [];
+            totalSlides = 0;
+            slideCounter.textContent = 'Loading...';
+            
+            fetchLesson(index).then(lesson => {
+                // Ignore the response if the student has moved to another lesson
+                if (currentLessonIndex !== index) return;
                 
-                .slide-title {
-                    font-size: 1.5rem;
-                }
+                // Slides are rendered on demand around the current one
+                currentSlides = lesson.slides || [];
+                totalSlides = currentSlides.length;
+                currentBoilerplate = lesson.boilerplate || [];
                 
-                .slide-images {
-                    flex-direction: column;
-                    align-items: center;
-                }
+                // A lesson still being published shows the slides that are ready so far
+                publishingNote = lesson.status === 'publishing'
+                    ? ` (still publishing, ${lesson.slideCount || '?'} slides in total)`
+                    : '';
                 
-                .slide-image {
-                    max-width: 100%;
+                // Show the requested slide, or the first one
+                const startIndex = currentSlides.findIndex(slide => slide.slideNumber === startSlideNumber);
+                showSlide(Math.max(startIndex, 0));
+                
+                // Prefetch the next lesson while the student reads this one
+                if (index + 1 < lessonsIndex.length) {
+                    fetchLesson(index + 1).catch(() => {});
                 }
-            }
+            }).catch(() => {
+                if (currentLessonIndex === index) {
+                    slideCounter.textContent = 'Could not load this lesson. Select the tab to retry.';
+                }
+            });
+        }
+        
+        // Fill a slide node, new or recycled, with the content of a slide
+        function renderSlide(slideElement, slide, index) {
+            slideElement.className = 'slide';
+            slideElement.dataset.index = index;
             
-            /* Image modal for enlargement */
-            .modal {
-                display: none;
-                position: fixed;
-                top: 0;
-                left: 0;
-                width: 100%;
-                height: 100%;
-                background-color: rgba(0, 0, 0, 0.8);
-                z-index: 1000;
-                justify-content: center;
-                align-items: center;
-            }
+            // Slide title
+            const titleElement = document.createElement('h2');
+            titleElement.classList.add('slide-title');
+            titleElement.textContent = `Slide ${slide.slideNumber}: ${slide.title}`;
+            slideElement.appendChild(titleElement);
             
-            .modal-content {
-                max-width: 80%;
-                max-height: 80%;
-            }
+            // Blocks arrive already structured; a heading opens a new section
+            const contentElement = document.createElement('div');
+            contentElement.classList.add('slide-content');
             
-            .modal-content img {
-                width: 100%;
-                height: auto;
-                object-fit: contain;
-            }
+            let container = contentElement;
+            let list = null;
             
-            .close-modal {
-                position: absolute;
-                top: 20px;
-                right: 30px;
-                color: white;
-                font-size: 35px;
-                cursor: pointer;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Logit LMS - Interactive Lesson Viewer</h1>
-                <p>Your personalized learning experience for Accident Management</p>
-            </div>
+            (slide.blocks || []).forEach(block => {
+                // Text repeated on most slides is stored once with the lesson
+                if (block.type === 'boilerplate') {
+                    block = currentBoilerplate[block.ref];
+                    if (!block) return;
+                }
+                
+                if (block.type === 'heading') {
+                    container = document.createElement('div');
+                    container.classList.add('content-section');
+                    
+                    const headingElement = document.createElement('h3');
+                    headingElement.classList.add('content-heading');
+                    headingElement.textContent = block.text;
+                    container.appendChild(headingElement);
+                    
+                    contentElement.appendChild(container);
+                    list = null;
+                } else if (block.type === 'bullet') {
+                    if (!list) {
+                        list = document.createElement('ul');
+                        list.classList.add('content-bullets');
+                        container.appendChild(list);
+                    }
+                    
+                    const item = document.createElement('li');
+                    item.textContent = block.text;
+                    item.style.marginLeft = `${(block.level || 0) * 1.5}em`;
+                    list.appendChild(item);
+                } else {
+                    const paragraph = document.createElement('p');
+                    paragraph.textContent = block.text;
+                    container.appendChild(paragraph);
+                    list = null;
+                }
+            });
             
-            <div class="lesson-tabs">
-                <!-- Tabs will be generated by JS -->
-            </div>
+            slideElement.appendChild(contentElement);
             
-            <div class="lesson-content">
-                <div class="slides-nav">
-                    <button class="nav-btn prev-slide">Previous</button>
-                    <span class="slide-counter">Slide 1 of 15</span>
-                    <button class="nav-btn next-slide">Next</button>
-                </div>
+            // Images
+            if (slide.images && slide.images.length > 0) {
+                const imagesElement = document.createElement('div');
+                imagesElement.classList.add('slide-images');
                 
-                <div class="slides-container">
-                    <!-- Slide content will be inserted here by JavaScript -->
-                </div>
+                slide.images.forEach(image => {
+                    if (image.url) {
+                        const imageContainer = document.createElement('div');
+                        imageContainer.classList.add('slide-image');
+                        
+                        const img = document.createElement('img');
+                        img.src = image.url;
+                        img.alt = image.filename || 'Slide image';
+                        img.loading = 'lazy';
+                        
+                        // Make image clickable to enlarge
+                        img.addEventListener('click', () => {
+                            modalImg.src = image.url;
+                            modal.style.display = 'flex';
+                        });
+                        
+                        imageContainer.appendChild(img);
+                        imagesElement.appendChild(imageContainer);
+                    }
+                });
                 
-                <div class="progress-container">
-                    <div class="progress-bar" style="width: 0%"></div>
-                </div>
-            </div>
+                slideElement.appendChild(imagesElement);
+            }
             
-            <div class="footer">
-                <p>© 2025 Logit LMS. All content is for educational purposes.</p>
-                <p>Generated on: """ + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
-            </div>
-        </div>
+            return slideElement;
+        }
         
-        <!-- Modal for image enlargement -->
-        <div class="modal" id="imageModal">
-            <span class="close-modal">&times;</span>
-            <div class="modal-content">
-                <img id="modalImage" src="" alt="Enlarged image">
-            </div>
-        </div>
+        // Switch to a different lesson
+        function switchLesson(index) {
+            loadLesson(index);
+        }
         
-        <script>
-            // Lesson data from Firebase
-            const lessonsData = """ + json.dumps(lessons_data) + """;
-            
-            // DOM Elements
-            const lessonTabs = document.querySelector('.lesson-tabs');
-            const slidesContainer = document.querySelector('.slides-container');
-            const slideCounter = document.querySelector('.slide-counter');
-            const prevButton = document.querySelector('.prev-slide');
-            const nextButton = document.querySelector('.next-slide');
-            const progressBar = document.querySelector('.progress-bar');
-            const modal = document.getElementById('imageModal');
-            const modalImg = document.getElementById('modalImage');
-            const closeModal = document.querySelector('.close-modal');
+        // Detach every rendered slide, keeping the nodes for reuse
+        function releaseAllSlides() {
+            slideNodes.forEach(releaseSlide);
+            slideNodes.clear();
+        }
+        
+        function releaseSlide(node) {
+            // Dropping the children lets the browser free their images
+            node.remove();
+            node.replaceChildren();
+            sparePool.push(node);
+        }
+        
+        // Keep only the current slide and its neighbours in the DOM
+        function updateSlideWindow(index) {
+            const first = Math.max(0, index - SLIDE_WINDOW);
+            const last = Math.min(totalSlides - 1, index + SLIDE_WINDOW);
             
-            // State
-            let currentLessonIndex = 0;
-            let currentSlideIndex = 0;
-            let totalSlides = 0;
+            slideNodes.forEach((node, slideIndex) => {
+                if (slideIndex < first || slideIndex > last) {
+                    releaseSlide(node);
+                    slideNodes.delete(slideIndex);
+                }
+            });
             
-            // Initialize the app
-            function initializeApp() {
-                // Create lesson tabs
-                lessonsData.forEach((lesson, index) => {
-                    const tab = document.createElement('div');
-                    tab.classList.add('tab');
-                    if (index === 0) tab.classList.add('active');
-                    tab.textContent = lesson.data.title || `Lesson ${index + 1}`;
-                    tab.addEventListener('click', () => switchLesson(index));
-                    lessonTabs.appendChild(tab);
-                });
-                
-                // Load the first lesson
-                if (lessonsData.length > 0) {
-                    loadLesson(0);
+            // Render slides entering the window and keep the nodes in slide order
+            let previous = null;
+            for (let i = first; i <= last; i++) {
+                let node = slideNodes.get(i);
+                if (!node) {
+                    node = renderSlide(sparePool.pop() || document.createElement('div'), currentSlides[i], i);
+                    slideNodes.set(i, node);
                 }
                 
-                // Event listeners
-                prevButton.addEventListener('click', showPreviousSlide);
-                nextButton.addEventListener('click', showNextSlide);
-                closeModal.addEventListener('click', () => modal.style.display = 'none');
-                
-                // Keyboard navigation
-                document.addEventListener('keydown', (e) => {
-                    if (e.key === 'ArrowLeft') {
-                        showPreviousSlide();
-                    } else if (e.key === 'ArrowRight') {
-                        showNextSlide();
-                    } else if (e.key === 'Escape' && modal.style.display === 'flex') {
-                        modal.style.display = 'none';
-                    }
-                });
+                if (previous) {
+                    if (previous.nextSibling !== node) previous.after(node);
+                } else if (slidesContainer.firstChild !== node) {
+                    slidesContainer.prepend(node);
+                }
+                previous = node;
                 
-                // Close modal if clicked outside the image
-                window.addEventListener('click', (e) => {
-                    if (e.target === modal) {
-                        modal.style.display = 'none';
-                    }
-                });
+                node.classList.toggle('active', i === index);
             }
+        }
+        
+        // Request a slide's images while the student reads the current one,
+        // so they come from the cache when the slide is shown
+        function prefetchSlideImages(index) {
+            const slide = currentSlides[index];
+            if (!slide || !slide.images) return;
             
-            // Load a specific lesson
-            function loadLesson(index) {
-                if (index < 0 || index >= lessonsData.length) return;
-                
-                currentLessonIndex = index;
-                currentSlideIndex = 0;
-                
-                // Update active tab
-                document.querySelectorAll('.tab').forEach((tab, i) => {
-                    if (i === index) {
-                        tab.classList.add('active');
-                    } else {
-                        tab.classList.remove('active');
+            const schedule = window.requestIdleCallback || (callback => setTimeout(callback, 200));
+            schedule(() => {
+                slide.images.forEach(image => {
+                    if (image.url && !prefetchedImages.has(image.url)) {
+                        prefetchedImages.add(image.url);
+                        new Image().src = image.url;
                     }
                 });
-                
-                const lesson = lessonsData[index].data;
-                const slides = lesson.slides || [];
-                totalSlides = slides.length;
-                
-                // Clear slides container
-                slidesContainer.innerHTML = '';
-                
-                // Create slides
-                slides.forEach((slide, slideIndex) => {
-                    const slideElement = createSlideElement(slide, slideIndex);
-                    slidesContainer.appendChild(slideElement);
+            });
+        }
+        
+        // Record the time from a navigation until the browser can paint it
+        function recordNavigation(lessonIndex, slideIndex, started) {
+            requestAnimationFrame(() => {
+                navigationTimings.push({
+                    lesson: lessonIndex,
+                    slide: slideIndex,
+                    ms: Math.round((performance.now() - started) * 10) / 10
                 });
-                
-                // Show first slide
-                showSlide(0);
-            }
+                if (navigationTimings.length > MAX_NAVIGATION_SAMPLES) navigationTimings.shift();
+            });
+        }
+        
+        // Show a specific slide
+        function showSlide(index) {
+            if (index < 0 || index >= totalSlides) return;
             
-            // Create HTML for a slide
-            function createSlideElement(slide, index) {
-                const slideElement = document.createElement('div');
-                slideElement.classList.add('slide');
-                slideElement.dataset.index = index;
-                
-                // Slide title
-                const titleElement = document.createElement('h2');
-                titleElement.classList.add('slide-title');
-                titleElement.textContent = `Slide ${slide.slideNumber}: ${slide.title.split('\\n')[0]}`;
-                slideElement.appendChild(titleElement);
-                
-                // Format content (handling newlines and sections)
-                const contentElement = document.createElement('div');
-                contentElement.classList.add('slide-content');
-                
-                const titleParts = slide.title.split('\\n').filter(Boolean);
-                
-                // First line is the main title, already shown above
-                // Format the rest as content sections
-                if (titleParts.length > 1) {
-                    for (let i = 1; i < titleParts.length; i++) {
-                        const part = titleParts[i].trim();
-                        
-                        // Check if this is a heading (all caps with optional colon)
-                        if (part === part.toUpperCase() && part.length > 3) {
-                            const sectionElement = document.createElement('div');
-                            sectionElement.classList.add('content-section');
-                            
-                            const headingElement = document.createElement('h3');
-                            headingElement.classList.add('content-heading');
-                            headingElement.textContent = part;
-                            sectionElement.appendChild(headingElement);
-                            
-                            // Look ahead for content that belongs to this heading
-                            let j = i + 1;
-                            let sectionContent = '';
-                            
-                            while (j < titleParts.length && 
-                                   !(titleParts[j] === titleParts[j].toUpperCase() && titleParts[j].length > 3)) {
-                                sectionContent += titleParts[j] + '\\n';
-                                j++;
-                            }
-                            
-                            if (sectionContent) {
-                                const contentParagraph = document.createElement('p');
-                                contentParagraph.textContent = sectionContent.trim();
-                                sectionElement.appendChild(contentParagraph);
-                            }
-                            
-                            contentElement.appendChild(sectionElement);
-                            i = j - 1; // Skip to the next section
-                        } else {
-                            const paragraph = document.createElement('p');
-                            paragraph.textContent = part;
-                            contentElement.appendChild(paragraph);
-                        }
-                    }
-                }
-                
-                slideElement.appendChild(contentElement);
-                
-                // Images
-                if (slide.images && slide.images.length > 0) {
-                    const imagesElement = document.createElement('div');
-                    imagesElement.classList.add('slide-images');
-                    
-                    slide.images.forEach(image => {
-                        if (image.url) {
-                            const imageContainer = document.createElement('div');
-                            imageContainer.classList.add('slide-image');
-                            
-                            const img = document.createElement('img');
-                            img.src = image.url;
-                            img.alt = image.filename || 'Slide image';
-                            img.loading = 'lazy';
-                            
-                            // Make image clickable to enlarge
-                            img.addEventListener('click', () => {
-                                modalImg.src = image.url;
-                                modal.style.display = 'flex';
-                            });
-                            
-                            imageContainer.appendChild(img);
-                            imagesElement.appendChild(imageContainer);
-                        }
-                    });
-                    
-                    slideElement.appendChild(imagesElement);
-                }
-                
-                return slideElement;
-            }
+            const started = performance.now();
+            currentSlideIndex = index;
             
-            // Switch to a different lesson
-            function switchLesson(index) {
-                loadLesson(index);
-            }
+            // Update slides
+            updateSlideWindow(index);
             
-            // Show a specific slide
-            function showSlide(index) {
-                if (index < 0 || index >= totalSlides) return;
-                
-                currentSlideIndex = index;
-                
-                // Update slides
-                const slides = document.querySelectorAll('.slide');
-                slides.forEach((slide, i) => {
-                    if (i === index) {
-                        slide.classList.add('active');
-                    } else {
-                        slide.classList.remove('active');
-                    }
-                });
-                
-                // Update counter
-                slideCounter.textContent = `Slide ${index + 1} of ${totalSlides}`;
-                
-                // Update progress bar
-                const progress = ((index + 1) / totalSlides) * 100;
-                progressBar.style.width = `${progress}%`;
-                
-                // Update button states
-                prevButton.disabled = index === 0;
-                nextButton.disabled = index === totalSlides - 1;
-            }
+            // Update counter
+            slideCounter.textContent = `Slide ${index + 1} of ${totalSlides}${publishingNote}`;
             
-            // Show the previous slide
-            function showPreviousSlide() {
-                if (currentSlideIndex > 0) {
-                    showSlide(currentSlideIndex - 1);
-                }
-            }
+            // Update progress bar
+            const progress = ((index + 1) / totalSlides) * 100;
+            progressBar.style.width = `${progress}%`;
             
-            // Show the next slide
-            function showNextSlide() {
-                if (currentSlideIndex < totalSlides - 1) {
-                    showSlide(currentSlideIndex + 1);
-                }
+            // Update button states
+            prevButton.disabled = index === 0;
+            nextButton.disabled = index === totalSlides - 1;
+            
+            recordNavigation(currentLessonIndex, index, started);
+            prefetchSlideImages(index + 1);
+        }
+        
+        // Show the previous slide
+        function showPreviousSlide() {
+            if (currentSlideIndex > 0) {
+                showSlide(currentSlideIndex - 1);
+            }
+        }
+        
+        // Show the next slide
+        function showNextSlide() {
+            if (currentSlideIndex < totalSlides - 1) {
+                showSlide(currentSlideIndex + 1);
+            }
+        }
+        
+        // Initialize the app when the DOM is loaded
+        document.addEventListener('DOMContentLoaded', initializeApp);
+"""
+
+def render_viewer_page(out, lessons_index, title="Logit LMS - Interactive Lesson Viewer", styles=None, scripts=None,
+                       compact=False, search_index_url=None, lesson_url=None):
+    """
+    Stream a viewer page for the given lesson index to an open file
+    
+    Args:
+        out: File-like object to write to
+        lessons_index (list): Index entries (see write_lesson_shards)
+        title (str): Page title
+        styles (str): Markup that loads the viewer CSS (defaults to an inline <style>)
+        scripts (str): Markup that loads the viewer script (defaults to an inline <script>)
+        compact (bool): Minify the page markup and the inline CSS and script
+        search_index_url (str): Search index shard, relative to the page; no search box without it
+        lesson_url (str): Page URL of other lessons with an {id} placeholder, for search
+                          results outside this page (optional)
+    """
+    page_start = VIEWER_PAGE_START.minified() if compact else VIEWER_PAGE_START
+    page_end = VIEWER_PAGE_END.minified() if compact else VIEWER_PAGE_END
+    
+    if styles is None:
+        styles = f"<style>{viewer_css(compact)}</style>"
+    if scripts is None:
+        scripts = f"<script>{viewer_js(compact)}</script>"
+    
+    page_start.render_to(
+        out,
+        title=title,
+        styles=styles,
+        generated_on=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        search_index=search_index_url,
+        lesson_url=lesson_url
+    )
+    html_templates.write_script_json(out, lessons_index)
+    page_end.render_to(out, scripts=scripts)
+
+def fetch_lesson_slides(db, lesson_id):
+    """
+    Fetch the slides of a lesson, sorted by slide number, with placeholder images removed
+    
+    Args:
+        db: Firestore client
+        lesson_id (str): Lesson document ID
+    
+    Returns:
+        list: Slide dictionaries
+    """
+    slides = db.collection('lessons').document(lesson_id).collection('slides').stream()
+    return prepare_slides([slide.to_dict() for slide in slides])
+
+def prepare_slides(slides_list):
+    """
+    Sort slide dictionaries by slide number, remove placeholder images and
+    give slides from older uploads the structured title and blocks
+    
+    Args:
+        slides_list (list): Slide dictionaries from Firestore or the lesson mirror
+    
+    Returns:
+        list: The same slides, sorted
+    """
+    # Sort slides by slide number
+    slides_list.sort(key=lambda slide_data: slide_data.get('slideNumber', 0))
+    
+    for slide_data in slides_list:
+        slide_structure.ensure_slide_structure(slide_data)
+        
+        # Process images to ensure they have valid URLs
+        slide_data['images'] = [
+            image for image in slide_data.get('images', [])
+            if 'url' in image and image['url'] and not image['url'].startswith('PLACEHOLDER')
+        ]
+    
+    return slides_list
+
+def fetch_course_modules(db, course_id):
+    """
+    Fetch the modules of a course in sortcode order (served by the course_id, sortcode index)
+    """
+    return list(db.collection('modules').where('course_id', '==', course_id).order_by('sortcode').stream())
+
+def fetch_module_lessons(db, module_id):
+    """
+    Fetch the lessons of a module in sortcode order (served by the module_id, sortcode index)
+    """
+    return list(db.collection('lessons').where('module_id', '==', module_id).order_by('sortcode').stream())
+
+def fetch_lessons_data(db, lesson_ids=None, module_id=None, max_workers=8, course_id=None):
+    """
+    Fetch lessons and their slides for the viewer
+    
+    Lessons come from indexed course/module queries or a single batched
+    get_all call, and every slide subcollection is fetched on a shared
+    thread pool. For a course, the module lesson queries run concurrently
+    and each lesson's slides are requested as soon as its module answers,
+    so the whole course is fetched in one pass.
+    
+    Args:
+        db: Firestore client
+        lesson_ids (list): Lesson IDs to fetch, in display order (optional)
+        module_id (str): Fetch all lessons of this module in sortcode order (optional)
+        max_workers (int): Number of Firestore requests run in parallel
+        course_id (str): Fetch all lessons of every module of this course, in
+                         module and lesson sortcode order (optional)
+    
+    Returns:
+        list: [{'id': lesson_id, 'data': lesson_data, 'module': {'id', 'title'} or None}]
+              in display order
+    """
+    lessons_ref = db.collection('lessons')
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        lesson_docs = []
+        slide_futures = []
+        
+        def add_lessons(docs, module=None):
+            for lesson_doc in docs:
+                lesson_docs.append((lesson_doc, module))
+                slide_futures.append(executor.submit(fetch_lesson_slides, db, lesson_doc.id))
+        
+        if course_id:
+            modules = fetch_course_modules(db, course_id)
+            module_futures = [executor.submit(fetch_module_lessons, db, module.id) for module in modules]
+            for module_doc, future in zip(modules, module_futures):
+                module = {'id': module_doc.id, 'title': module_doc.to_dict().get('title')}
+                add_lessons(future.result(), module)
+        elif module_id:
+            # Module lessons come back complete from the query, no get_all needed
+            add_lessons(fetch_module_lessons(db, module_id))
+        else:
+            lesson_ids = lesson_ids or DEFAULT_LESSON_IDS
+            snapshots = {
+                snapshot.id: snapshot
+                for snapshot in db.get_all([lessons_ref.document(lesson_id) for lesson_id in lesson_ids])
             }
             
-            // Initialize the app when the DOM is loaded
-            document.addEventListener('DOMContentLoaded', initializeApp);
-        </script>
-    </body>
-    </html>
+            found = []
+            for lesson_id in lesson_ids:
+                snapshot = snapshots.get(lesson_id)
+                if snapshot is None or not snapshot.exists:
+                    print(f"Warning: Lesson with ID {lesson_id} not found")
+                    continue
+                found.append(snapshot)
+            add_lessons(found)
+        
+        lessons_data = []
+        for (lesson_doc, module), future in zip(lesson_docs, slide_futures):
+            lesson_data = lesson_doc.to_dict()
+            lesson_data['slides'] = future.result()
+            lessons_data.append({
+                'id': lesson_doc.id,
+                'data': lesson_data,
+                'module': module
+            })
+    
+    return lessons_data
+
+def viewer_css(compact=False):
+    """
+    Return the viewer stylesheet, minified when compact
+    """
+    return html_templates.minify_css(VIEWER_CSS) if compact else VIEWER_CSS
+
+def viewer_js(compact=False):
+    """
+    Return the viewer script, with the search widget, minified when compact
+    """
+    script = VIEWER_JS + search_index.SEARCH_WIDGET_JS
+    return html_templates.minify_js(script) if compact else script
+
+def write_lesson_shards(lessons_data, output_dir, inline_data=False):
+    """
+    Write one compact JSON shard per lesson and return the viewer's lesson index
+    
+    The index holds only what the tabs need (title, slide count and shard
+    path), so the page size does not depend on how many lessons it lists;
+    each shard is fetched when its tab is opened.
+    
+    Args:
+        lessons_data (list): [{'id': lesson_id, 'data': lesson_data}] in display order
+        output_dir (str): Directory of the viewer page
+        inline_data (bool): Embed the lesson data in the index instead of writing
+                            shards, for opening the page straight from disk
+    
+    Returns:
+        list: Index entries in display order
+    """
+    shard_dir = os.path.join(output_dir, LESSON_SHARD_DIR)
+    if not inline_data:
+        os.makedirs(shard_dir, exist_ok=True)
+    
+    lessons_index = []
+    for lesson in lessons_data:
+        lesson_data = lesson['data']
+        entry = {
+            'id': lesson['id'],
+            'title': lesson_data.get('title'),
+            'slideCount': len(lesson_data.get('slides', []))
+        }
+        if lesson.get('module'):
+            entry['module'] = lesson['module']['title'] or lesson['module']['id']
+        
+        if inline_data:
+            entry['data'] = lesson_data
+        else:
+            entry['shard'] = f"{LESSON_SHARD_DIR}/{lesson['id']}.json"
+            with open(os.path.join(shard_dir, f"{lesson['id']}.json"), 'w', encoding='utf-8') as f:
+                json.dump(lesson_data, f, separators=(',', ':'), ensure_ascii=False)
+        
+        lessons_index.append(entry)
+    
+    return lessons_index
+
+def generate_student_lesson_viewer(lesson_ids=None, module_id=None, max_workers=8, inline_data=False, compact=False,
+                                   course_id=None):
     """
+    Generate an interactive student-focused lesson viewer
+    
+    Args:
+        lesson_ids (list): Lesson IDs to include (defaults to Lesson_01 and Lesson_02)
+        module_id (str): Include every lesson of this module instead (optional)
+        max_workers (int): Number of Firestore requests run in parallel
+        inline_data (bool): Embed all lesson data in the page instead of per-lesson shards
+        compact (bool): Write minified HTML and compact JSON, with .gz and .br copies
+        course_id (str): Include every lesson of every module of this course instead (optional)
+    """
+    # Initialize Firestore
+    db = firebase_client.get_firestore()
+    
+    if course_id:
+        print(f"Fetching modules and lessons for course {course_id}...")
+    elif module_id:
+        print(f"Fetching lessons for module {module_id}...")
+    else:
+        print(f"Fetching data for {len(lesson_ids or DEFAULT_LESSON_IDS)} lessons...")
+    
+    lessons_data = fetch_lessons_data(db, lesson_ids, module_id, max_workers, course_id)
+    
+    print(f"Found {len(lessons_data)} lessons")
     
     # Create output directory if it doesn't exist
     os.makedirs('student_content', exist_ok=True)
     
-    # Save HTML to file
-    with open('student_content/interactive_lesson_viewer.html', 'w') as f:
-        f.write(html_output)
+    lessons_index = write_lesson_shards(lessons_data, 'student_content', inline_data)
+    
+    # The search box fetches its index, so it needs the page to be served like the shards
+    search_index_url = None
+    if not inline_data:
+        search_index_url = 'search_index.json'
+        search_index.write_shard(
+            search_index.build_index(
+                (lesson['id'], lesson['data'], lesson['data'].get('slides', [])) for lesson in lessons_data
+            ),
+            os.path.join('student_content', search_index_url)
+        )
+    
+    # Compact pages fetch the precompressed shards and search index
+    suffix = precompress.served_suffix(compact)
+    if suffix and not inline_data:
+        lessons_index = [{**entry, 'shard': entry['shard'] + suffix} for entry in lessons_index]
+    
+    # Stream the page to disk: static markup, then the lesson index, then the script
+    with open('student_content/interactive_lesson_viewer.html', 'w', encoding='utf-8') as f:
+        render_viewer_page(f, lessons_index, compact=compact,
+                           search_index_url=search_index_url and search_index_url + suffix)
     
     print("Generated interactive lesson viewer at: student_content/interactive_lesson_viewer.html")
+    if not inline_data:
+        print(f"Saved {len(lessons_index)} lesson shards in: student_content/{LESSON_SHARD_DIR}/")
+        print(f"Saved search index at: student_content/{search_index_url}")
     
     # Also save the lesson data as JSON for reference
-    with open('student_content/lesson_data.json', 'w') as f:
-        json.dump(lessons_data, f, indent=2)
+    with open('student_content/lesson_data.json', 'w', encoding='utf-8') as f:
+        precompress.dump_json(lessons_data, f, compact)
     
     print("Saved lesson data at: student_content/lesson_data.json")
+    
+    output_paths = ['student_content/interactive_lesson_viewer.html', 'student_content/lesson_data.json']
+    if not inline_data:
+        output_paths.append(os.path.join('student_content', LESSON_SHARD_DIR))
+        output_paths.append(os.path.join('student_content', search_index_url))
+    if compact:
+        results = precompress.precompress_paths(output_paths)
+        print(f"Precompressed {len(results)} files")
+    else:
+        # Stale siblings would be served instead of the files just written
+        precompress.remove_precompressed_paths(output_paths)
 
 if __name__ == "__main__":
-    generate_student_lesson_viewer() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Generate an interactive student lesson viewer')
+    parser.add_argument('lesson_ids', nargs='*', help='Lesson IDs to include (defaults to Lesson_01 and Lesson_02)')
+    parser.add_argument('--module-id', help='Include every lesson of this module, in sortcode order')
+    parser.add_argument('--course-id', help='Include every lesson of every module of this course, in sortcode order')
+    parser.add_argument('--workers', type=int, default=8, help='Number of Firestore requests run in parallel')
+    parser.add_argument('--inline-data', action='store_true',
+                        help='Embed all lesson data in the page (for opening it from disk instead of a web server)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write minified HTML and compact JSON, plus precompressed .gz and .br files')
+    
+    args = parser.parse_args()
+    
+    generate_student_lesson_viewer(args.lesson_ids, args.module_id, args.workers, args.inline_data, args.compact,
+                                   args.course_id) 
\ No newline at end of file
@@ -0,0 +1,112 @@
+import pytest
+
+pytest.importorskip('firebase_admin')
+
+import migrate_lessons
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocument:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+
+    def get(self):
+        return FakeSnapshot(self.path.rsplit('/', 1)[-1], self._store.get(self.path))
+
+    def collection(self, name):
+        return FakeCollection(self._store, f"{self.path}/{name}")
+
+
+class FakeCollection:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+
+    def document(self, doc_id):
+        return FakeDocument(self._store, f"{self.path}/{doc_id}")
+
+    def stream(self):
+        prefix = f"{self.path}/"
+        return [FakeSnapshot(path[len(prefix):], data) for path, data in sorted(self._store.items())
+                if path.startswith(prefix) and '/' not in path[len(prefix):]]
+
+
+class FakeBatch:
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref.path, data))
+
+    def update(self, ref, data):
+        pass
+
+    def commit(self):
+        self._store.update(self._writes)
+        self._writes = []
+
+
+class FakeDb:
+    def __init__(self, store=None):
+        self.store = store or {}
+
+    def collection(self, name):
+        return FakeCollection(self.store, name)
+
+    def batch(self):
+        return FakeBatch(self.store)
+
+
+class FakeBlob:
+    def __init__(self, bucket_name, name):
+        self.public_url = f"https://storage.googleapis.com/{bucket_name}/{name}"
+
+    def rewrite(self, source, token=None):
+        return None, 0, 0
+
+    def make_public(self):
+        pass
+
+
+class FakeBucket:
+    def __init__(self, name):
+        self.name = name
+
+    def blob(self, name):
+        return FakeBlob(self.name, name)
+
+
+def test_preview_urls_point_at_the_destination_bucket():
+    path = 'schools/DMT/lessons/LES_1/images/slide1_image1.png'
+    old_url = f"https://storage.googleapis.com/old-bucket/{path}"
+    image = {'filename': 'slide1_image1.png', 'url': old_url, 'storagePath': path}
+    source_db = FakeDb({
+        'lessons/LES_1': {
+            'id': 'LES_1',
+            'school_code': 'DMT',
+            'stats': {'slideCount': 1, 'imageCount': 1, 'imageBytes': 10,
+                      'preview': [{'slideNumber': 1, 'title': 'Intro',
+                                   'images': [{'url': old_url, 'filename': 'slide1_image1.png'}]}]}
+        },
+        'lessons/LES_1/slides/SLIDE_1': {'slideNumber': 1, 'images': [image]}
+    })
+    dest_db = FakeDb()
+
+    stats = migrate_lessons.migrate_lesson(source_db, dest_db, FakeBucket('old-bucket'),
+                                           FakeBucket('new-bucket'), 'LES_1')
+
+    new_url = f"https://storage.googleapis.com/new-bucket/{path}"
+    assert stats == {'slides': 1, 'images': 1}
+    assert dest_db.store['lessons/LES_1/slides/SLIDE_1']['images'][0]['url'] == new_url
+    assert dest_db.store['lessons/LES_1']['stats']['preview'][0]['images'][0]['url'] == new_url
@@ -0,0 +1,50 @@
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import search_index
+
+# Words that must share a stem, so a search for one finds the others
+EQUIVALENT = [
+    ('dive', 'dives', 'diving', 'dived'),
+    ('elevate', 'elevated', 'elevating'),
+    ('hope', 'hoping', 'hoped'),
+    ('stop', 'stopped', 'stopping'),
+    ('create', 'created', 'creating'),
+    ('organize', 'organized', 'organizing'),
+    ('quick', 'quickly'),
+    ('use', 'uses', 'used', 'using'),
+    ('agree', 'agrees', 'agreed', 'agreeing'),
+]
+
+# Words whose -ly belongs to the word
+UNCHANGED = ['apply', 'supply', 'family']
+
+WORDS = sorted({word for group in EQUIVALENT for word in group} | set(UNCHANGED) | {
+    'bleed', 'speed', 'freed', 'ice', 'icing', 'carefully', 'processing', 'relational', 'filing', 'happily', 'fully', 'hopping'
+})
+
+
+@pytest.mark.parametrize('group', EQUIVALENT)
+def test_inflections_share_a_stem(group):
+    assert len({search_index.stem(word) for word in group}) == 1
+
+
+@pytest.mark.parametrize('word', UNCHANGED)
+def test_ly_is_kept_after_a_short_base(word):
+    assert search_index.stem(word) == word
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+def test_browser_stemmer_matches():
+    js = search_index.SEARCH_WIDGET_JS
+    suffixes = re.search(r'const SEARCH_SUFFIXES = .*?;', js).group(0)
+    functions = [re.search(rf'function {name}\(word\) \{{.*?\n        \}}\n', js, re.S).group(0)
+                 for name in ('dropFinalE', 'searchStem')]
+    script = f"{suffixes}\n{''.join(functions)}\nconsole.log(JSON.stringify({json.dumps(WORDS)}.map(searchStem)));"
+
+    output = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True).stdout
+    assert json.loads(output) == [search_index.stem(word) for word in WORDS]
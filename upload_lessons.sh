@@ -11,11 +11,9 @@ source venv/bin/activate
 # Install required packages
 pip install firebase-admin
 
-# Get project_id from the service account JSON
-PROJECT_ID=$(grep -o '"project_id": "[^"]*' config/service_account.json | cut -d'"' -f4)
-STORAGE_BUCKET="${PROJECT_ID}.appspot.com"
+# Resolve the project's storage bucket once (cached for later runs by firebase_client.py)
+STORAGE_BUCKET=$(python3 firebase_client.py config/service_account.json | sed 's/^Storage bucket: //')
 
-echo "Using Firebase project: $PROJECT_ID"
 echo "Using storage bucket: $STORAGE_BUCKET"
 
 # Upload Lesson_01
@@ -26,4 +24,9 @@ python3 firebase_uploader.py output/Lesson_01.json lib/assets/images config/serv
 echo "Uploading Lesson_02..."
 python3 firebase_uploader.py output/Lesson_02.json lib/assets/images config/service_account.json --storage-bucket $STORAGE_BUCKET
 
+# Refresh the local mirror and rebuild the per-school search index
+echo "Updating search index..."
+python3 lesson_mirror.py config/service_account.json
+python3 search_index.py build
+
 echo "Upload complete. Run check_images.py to verify." 
\ No newline at end of file
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import firebase_client
+import usage_meter
+
+# Seconds to wait for a lesson to become consistent before reporting what is missing
+DEFAULT_TIMEOUT = 600
+
+# Status of a lesson that is fully written (see firebase_uploader.py)
+STATUS_READY = "ready"
+
+
+class VerificationFailed(RuntimeError):
+    pass
+
+
+class LessonVerifier:
+    """
+    Verifies a lesson while it is being written, from Firestore snapshot listeners
+
+    Listeners on the lesson document and its slides subcollection see every
+    write as it lands. Each new or changed slide has its images checked in
+    Storage right away, so once the last write is in, nothing needs to be
+    read again. The lesson is settled when it is "ready" (or has no status),
+    all slideCount slides are in and every image check has finished; it is
+    consistent if no problems were found by then.
+
+    Attach the verifier before the first write so no write is missed;
+    attaching later works as well, as listeners start with the current
+    documents.
+    """
+
+    def __init__(self, db, bucket, lesson_id, max_workers=8):
+        self.lesson_id = lesson_id
+        self.bucket = bucket
+        self._lesson_ref = db.collection('lessons').document(lesson_id)
+        self._lock = threading.Lock()
+        self._settled = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._watches = []
+        self._started = None
+
+        self._lesson = None
+        self._slides = {}
+        self._slides_delivered = False
+        self._image_checks = {}
+        self._pending_checks = 0
+
+    def start(self):
+        """
+        Attach the snapshot listeners
+
+        Returns:
+            LessonVerifier: self
+        """
+        self._started = time.time()
+        self._watches = [
+            self._lesson_ref.on_snapshot(self._on_lesson),
+            self._lesson_ref.collection('slides').on_snapshot(self._on_slides)
+        ]
+        return self
+
+    def stop(self):
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+        self._executor.shutdown(wait=False)
+
+    def _on_lesson(self, snapshots, changes, read_time):
+        # Listeners are billed one read per document they deliver
+        usage_meter.get_meter().record('reads', max(len(changes), 1))
+        with self._lock:
+            for snapshot in snapshots:
+                self._lesson = snapshot.to_dict() if snapshot.exists else None
+            self._check_settled()
+
+    def _on_slides(self, snapshot, changes, read_time):
+        usage_meter.get_meter().record('reads', max(len(changes), 1))
+        with self._lock:
+            self._slides_delivered = True
+            for change in changes:
+                slide_id = change.document.id
+                if change.type.name == 'REMOVED':
+                    self._slides.pop(slide_id, None)
+                    continue
+
+                slide_data = change.document.to_dict()
+                self._slides[slide_id] = slide_data
+                for image in slide_data.get('images') or []:
+                    storage_path = image.get('storagePath')
+                    if storage_path and storage_path not in self._image_checks:
+                        # Images are uploaded before their slide is written, so they must exist already
+                        self._image_checks[storage_path] = None
+                        self._pending_checks += 1
+                        self._executor.submit(self._check_image, storage_path)
+            self._check_settled()
+
+    def _check_image(self, storage_path):
+        try:
+            exists = self.bucket.blob(storage_path).exists()
+        except Exception as e:
+            print(f"Warning: Could not check {storage_path}: {e}")
+            exists = False
+        with self._lock:
+            self._image_checks[storage_path] = exists
+            self._pending_checks -= 1
+            self._check_settled()
+
+    def _check_settled(self):
+        # Called with the lock held after every change; until the slides listener
+        # has delivered once, a lesson without slideCount would look empty
+        if self._lesson is None or not self._slides_delivered or self._pending_checks:
+            return
+        if self._lesson.get('status', STATUS_READY) != STATUS_READY:
+            return
+        expected = self._lesson.get('slideCount')
+        if expected is not None and len(self._slides) < expected:
+            return
+        self._settled.set()
+
+    def problems(self):
+        """
+        Everything inconsistent about the lesson as seen so far
+        """
+        with self._lock:
+            if self._lesson is None:
+                return [f"Lesson {self.lesson_id} does not exist"]
+
+            problems = []
+            status = self._lesson.get('status', STATUS_READY)
+            if status != STATUS_READY:
+                problems.append(f"Lesson status is '{status}'")
+
+            expected = self._lesson.get('slideCount')
+            if expected is not None and len(self._slides) != expected:
+                problems.append(f"{len(self._slides)} of {expected} slides written")
+
+            for slide_id, slide_data in sorted(self._slides.items()):
+                images = slide_data.get('images') or []
+                if 'imageCount' in slide_data and slide_data['imageCount'] != len(images):
+                    problems.append(f"{slide_id}: imageCount is {slide_data['imageCount']} "
+                                    f"but the slide has {len(images)} images")
+                for image in images:
+                    storage_path = image.get('storagePath')
+                    if not storage_path:
+                        problems.append(f"{slide_id}: image {image.get('filename', 'Unknown')} has no storagePath")
+                    elif self._image_checks.get(storage_path) is None:
+                        problems.append(f"{slide_id}: {storage_path} not checked yet")
+                    elif not self._image_checks[storage_path]:
+                        problems.append(f"{slide_id}: {storage_path} not found in Storage")
+
+            return problems
+
+    def wait(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Block until the lesson is settled or the timeout passes, then stop listening
+
+        Returns:
+            dict: Verification report with consistent, slides, images, problems and seconds
+        """
+        self._settled.wait(timeout)
+        self.stop()
+
+        problems = self.problems()
+        with self._lock:
+            images = len(self._image_checks)
+            slides = len(self._slides)
+        return {
+            'lessonId': self.lesson_id,
+            'consistent': self._settled.is_set() and not problems,
+            'slides': slides,
+            'images': images,
+            'problems': problems,
+            'seconds': round(time.time() - self._started, 2)
+        }
+
+
+def print_report(report):
+    if report['consistent']:
+        print(f"✅ Lesson {report['lessonId']} is consistent: {report['slides']} slides, "
+              f"{report['images']} images in Storage (verified {report['seconds']}s after the listeners attached)")
+        return
+
+    print(f"❌ Lesson {report['lessonId']} is not consistent after {report['seconds']}s:")
+    for problem in report['problems'] or ["Still being written"]:
+        print(f"  - {problem}")
+
+
+def verify_lesson(lesson_id, firebase_credentials_path=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                  storage_bucket_name=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Watch a lesson until it is consistent, e.g. while another process publishes it
+
+    Args:
+        lesson_id (str): Lesson to verify
+        firebase_credentials_path (str): Path to Firebase credentials JSON file
+        storage_bucket_name (str): Firebase Storage bucket name (optional)
+        timeout (float): Seconds to wait for the lesson to settle
+
+    Returns:
+        dict: Verification report (see LessonVerifier.wait)
+    """
+    # Initialize Firestore and Storage
+    db = firebase_client.get_firestore(firebase_credentials_path)
+    bucket = firebase_client.get_bucket(firebase_credentials_path, storage_bucket_name)
+
+    return LessonVerifier(db, bucket, lesson_id).start().wait(timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Verify a lesson as it is published, from Firestore snapshot listeners')
+    parser.add_argument('lesson_id', help='Lesson to verify')
+    parser.add_argument('firebase_credentials', nargs='?', default=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Path to Firebase credentials JSON file')
+    parser.add_argument('--storage-bucket', help='Firebase Storage bucket name (optional)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='Seconds to wait for the lesson to become consistent')
+
+    args = parser.parse_args()
+
+    report = verify_lesson(args.lesson_id, args.firebase_credentials, args.storage_bucket, args.timeout)
+    print_report(report)
+    sys.exit(0 if report['consistent'] else 1)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+import io
+import os
+import sys
+import atexit
+import threading
+from collections.abc import Iterable, Mapping
+
+# List prices in USD per operation / byte (Firestore and Cloud Storage, us multi-region)
+PRICES_USD = {
+    'reads': 0.06 / 100000,
+    'writes': 0.18 / 100000,
+    'deletes': 0.02 / 100000,
+    'class_a': 0.05 / 10000,
+    'class_b': 0.004 / 10000,
+    'egress_bytes': 0.12 / (1024 ** 3)
+}
+
+LABELS = {
+    'reads': 'Firestore document reads',
+    'writes': 'Firestore document writes',
+    'deletes': 'Firestore document deletes',
+    'class_a': 'Storage class A operations',
+    'class_b': 'Storage class B operations',
+    'egress_bytes': 'Storage egress'
+}
+
+# A run stops with BudgetExceeded once its estimated cost passes this many USD
+BUDGET_ENV = 'LOGIT_COST_BUDGET'
+
+# Operations billed once per call, by client class and method
+CALL_COSTS = {
+    'DocumentReference': {
+        'get': 'reads', 'collections': 'reads',
+        'set': 'writes', 'create': 'writes', 'update': 'writes',
+        'delete': 'deletes'
+    },
+    'WriteBatch': {'set': 'writes', 'create': 'writes', 'update': 'writes', 'delete': 'deletes'},
+    'CollectionReference': {'add': 'writes'},
+    'AggregationQuery': {'get': 'reads', 'stream': 'reads'},
+    'Bucket': {'exists': 'class_b', 'reload': 'class_b', 'get_blob': 'class_b', 'copy_blob': 'class_a'},
+    'Blob': {
+        'exists': 'class_b', 'reload': 'class_b',
+        'upload_from_filename': 'class_a', 'upload_from_string': 'class_a', 'upload_from_file': 'class_a',
+        'patch': 'class_a', 'update': 'class_a', 'make_public': 'class_a', 'rewrite': 'class_a',
+        'compose': 'class_a',
+        'download_as_bytes': 'class_b', 'download_as_string': 'class_b', 'download_as_text': 'class_b',
+        'download_to_filename': 'class_b', 'download_to_file': 'class_b'
+    }
+}
+
+# Methods billed one read per document returned (and at least one read per query)
+PER_DOCUMENT_READS = {
+    'Client': ('get_all',),
+    'CollectionReference': ('stream', 'get', 'list_documents'),
+    'Query': ('stream', 'get'),
+    'CollectionGroup': ('stream', 'get')
+}
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+class UsageMeter:
+    """
+    Counts billable Firestore and Storage operations of one run and guards its budget
+    """
+
+    def __init__(self, budget_usd=None):
+        self.budget_usd = budget_usd
+        self.counts = {kind: 0 for kind in PRICES_USD}
+        self._lock = threading.Lock()
+        self._exceeded = False
+
+    def record(self, kind, amount=1):
+        """
+        Add billable operations (or egress bytes) and enforce the budget
+
+        Once the budget is exceeded every further operation raises as well,
+        so worker threads of the same run stop too.
+
+        Raises:
+            BudgetExceeded: The estimated cost of the run passed the budget
+        """
+        with self._lock:
+            if self._exceeded:
+                raise BudgetExceeded(f"Cost budget of ${self.budget_usd:g} already exceeded")
+            self.counts[kind] += amount
+            if self.budget_usd is not None and self.cost() > self.budget_usd:
+                self._exceeded = True
+                raise BudgetExceeded(
+                    f"Estimated cost ${self.cost():.4f} exceeded the budget of ${self.budget_usd:g} "
+                    f"after {self.counts[kind]} {LABELS[kind].lower()}"
+                )
+
+    def cost(self):
+        """
+        Estimated cost of the run so far in USD
+        """
+        return sum(count * PRICES_USD[kind] for kind, count in self.counts.items())
+
+    def summary(self):
+        """
+        Lines describing every operation type used and the estimated cost
+        """
+        lines = ["Firebase usage for this run:"]
+        for kind, count in self.counts.items():
+            if not count:
+                continue
+            amount = f"{count / (1024 * 1024):.1f} MB" if kind == 'egress_bytes' else count
+            lines.append(f"  {LABELS[kind]}: {amount} (${count * PRICES_USD[kind]:.4f})")
+        line = f"  Estimated cost: ${self.cost():.4f}"
+        if self.budget_usd is not None:
+            line += f" of ${self.budget_usd:g} budget"
+        lines.append(line)
+        return lines
+
+    def print_summary(self):
+        if any(self.counts.values()):
+            print('\n'.join(self.summary()), file=sys.stderr)
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def get_meter():
+    """
+    Return the process-wide meter, created on first use with the budget
+    from the LOGIT_COST_BUDGET environment variable (USD, optional)
+
+    The usage summary is printed to stderr when the process exits.
+    """
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            budget = os.environ.get(BUDGET_ENV)
+            _meter = UsageMeter(float(budget) if budget else None)
+            atexit.register(_meter.print_summary)
+        return _meter
+
+
+def _is_client_object(value):
+    module = type(value).__module__ or ''
+    return module.startswith(('google.cloud.firestore', 'google.cloud.storage', 'google.api_core.page_iterator'))
+
+
+def _wrap(value, meter):
+    if isinstance(value, Metered):
+        return value
+    if isinstance(value, list):
+        return [_wrap(item, meter) for item in value]
+    if _is_client_object(value):
+        return Metered(value, meter)
+    return value
+
+
+# Arguments that are iterable but passed through as they are
+_OPAQUE_ITERABLES = (str, bytes, bytearray, memoryview, io.IOBase, Mapping)
+
+_CONTAINERS = (list, tuple, set, frozenset, dict)
+
+
+def _holds_metered(value):
+    if isinstance(value, Metered):
+        return True
+    if isinstance(value, dict):
+        return any(_holds_metered(item) for item in value.values())
+    if isinstance(value, _CONTAINERS):
+        return any(_holds_metered(item) for item in value)
+    return False
+
+
+def _unwrap(value):
+    # Containers are only rebuilt when they hold proxies, so plain write data passes through untouched
+    if isinstance(value, Metered):
+        return value._target
+    if isinstance(value, _CONTAINERS):
+        if not _holds_metered(value):
+            return value
+        if isinstance(value, dict):
+            return {key: _unwrap(item) for key, item in value.items()}
+        return type(value)(_unwrap(item) for item in value)
+    if isinstance(value, _OPAQUE_ITERABLES) or not isinstance(value, Iterable) or _is_client_object(value):
+        return value
+    # Generators and other iterables are unwrapped as the client consumes them
+    return (_unwrap(item) for item in value)
+
+
+class Metered:
+    """
+    Proxy around a Firestore or Storage client object that records billable operations
+
+    Every client object reached through it (collections, queries, snapshots,
+    batches, blobs) is wrapped as well, and proxies passed back into client
+    methods are unwrapped, so tools use it exactly like the real client.
+    """
+
+    __slots__ = ('_target', '_meter')
+
+    def __init__(self, target, meter):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_meter', meter)
+
+    def __getattr__(self, name):
+        class_name = type(self._target).__name__
+
+        if name == 'pages' and class_name == 'HTTPIterator':
+            return self._pages()
+
+        value = getattr(self._target, name)
+        if not callable(value):
+            return _wrap(value, self._meter)
+
+        if name in PER_DOCUMENT_READS.get(class_name, ()):
+            return self._per_document(value)
+        if name == 'list_blobs':
+            return lambda *args, **kwargs: Metered(value(*_unwrap(args), **_unwrap(kwargs)), self._meter)
+
+        kind = CALL_COSTS.get(class_name, {}).get(name)
+
+        def call(*args, **kwargs):
+            if kind:
+                self._meter.record(kind)
+            result = value(*_unwrap(args), **_unwrap(kwargs))
+            if class_name == 'Blob' and kind == 'class_b' and name.startswith('download'):
+                self._record_egress(name, args, kwargs, result)
+            return _wrap(result, self._meter)
+
+        return call
+
+    def _per_document(self, method):
+        meter = self._meter
+
+        def call(*args, **kwargs):
+            result = method(*_unwrap(args), **_unwrap(kwargs))
+            if isinstance(result, list):
+                meter.record('reads', max(len(result), 1))
+                return _wrap(result, meter)
+            return _stream(result)
+
+        def _stream(iterator):
+            count = 0
+            for item in iterator:
+                count += 1
+                meter.record('reads')
+                yield _wrap(item, meter)
+            if not count:
+                meter.record('reads')
+
+        return call
+
+    def _pages(self):
+        # Every page of a Storage listing is one class A request
+        for page in self._target.pages:
+            self._meter.record('class_a')
+            yield Metered(page, self._meter)
+
+    def _record_egress(self, name, args, kwargs, result):
+        if isinstance(result, (bytes, str)):
+            size = len(result)
+        elif name == 'download_to_filename':
+            filename = args[0] if args else kwargs.get('filename')
+            size = os.path.getsize(filename)
+        else:
+            size = self._target.size or 0
+        self._meter.record('egress_bytes', size)
+
+    def __iter__(self):
+        if type(self._target).__name__ == 'HTTPIterator':
+            for page in self._pages():
+                yield from page
+        else:
+            for item in self._target:
+                yield _wrap(item, self._meter)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, _unwrap(value))
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return repr(self._target)
+
+
+def metered(client):
+    """
+    Wrap a Firestore client or Storage bucket so its operations count
+    towards the process-wide meter
+    """
+    return Metered(client, get_meter())
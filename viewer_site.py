@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import lesson_mirror
+import html_templates
+import precompress
+import search_index
+import firebase_client
+import student_lesson_viewer
+
+DEFAULT_SITE_DIR = 'site'
+MANIFEST_NAME = 'build-manifest.json'
+
+# Bump when page markup changes in a way the asset hashes do not capture
+BUILD_VERSION = 2
+
+ASSET_DIR = 'assets'
+DATA_DIR = 'data'
+PAGE_DIR = 'lessons'
+
+# Search index over every lesson of the site, fetched by the search box of each page
+SEARCH_INDEX_NAME = 'search-index.json'
+
+INDEX_PAGE_START = html_templates.HtmlTemplate("""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Logit LMS - Lessons</title>
+    <link rel="stylesheet" href="{{ stylesheet }}">
+</head>
+<body>
+    <header>
+        <h1>Logit LMS Lessons</h1>
+        <p>Generated on {{ generated_on }}</p>
+    </header>
+    <div class="container">
+        <div class="lesson-tabs">
+""")
+
+INDEX_LESSON = html_templates.HtmlTemplate("""            <a class="lesson-tab" href="{{ href }}">{{ title }} ({{ slide_count }} slides)</a>
+""")
+
+INDEX_PAGE_END = html_templates.HtmlTemplate("""        </div>
+    </div>
+</body>
+</html>
+""")
+
+
+def content_hash(content):
+    """
+    Short SHA-256 hex digest used in content-addressed file names
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def _write_file(path, content):
+    # Write to a temporary name first so a page is never served half-written
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _remove(output_dir, relative_path):
+    path = os.path.join(output_dir, relative_path)
+    for file_path in (path, f"{path}.gz", f"{path}.br"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _compress_outputs(output_dir, relative_paths, compact):
+    # Compact builds ship .gz and .br copies; other builds must not leave stale ones behind
+    for relative_path in relative_paths:
+        path = os.path.join(output_dir, relative_path)
+        if compact:
+            precompress.precompress_file(path)
+        else:
+            precompress.remove_precompressed(path)
+
+
+def _siblings_current(path, compact):
+    # Whether the .gz and .br copies of an existing file already match the build mode
+    if compact:
+        return precompress.has_precompressed(path)
+    return not any(os.path.exists(f"{path}{suffix}") for suffix in ('.gz', '.br'))
+
+
+def load_manifest(output_dir):
+    """
+    Load the build manifest of a previous build, or an empty one
+
+    Returns:
+        dict: {'build': int, 'assets': {...}, 'lessons': {lesson_id: {...}}}
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {'build': None, 'assets': {}, 'lessons': {}}
+
+
+def save_manifest(output_dir, manifest):
+    _write_file(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, indent=2))
+
+
+def write_assets(output_dir, compact=False):
+    """
+    Write the viewer CSS and script under content-hashed names
+
+    A changed stylesheet or script gets a new file name, so pages can be
+    cached indefinitely and still pick up the new version once rebuilt.
+
+    Args:
+        output_dir (str): Site directory
+        compact (bool): Minify the assets and write .gz and .br copies
+
+    Returns:
+        dict: {'css': relative path, 'js': relative path}
+    """
+    os.makedirs(os.path.join(output_dir, ASSET_DIR), exist_ok=True)
+
+    assets = {}
+    for kind, content in (('css', student_lesson_viewer.viewer_css(compact)),
+                          ('js', student_lesson_viewer.viewer_js(compact))):
+        relative_path = f"{ASSET_DIR}/viewer.{content_hash(content)}.{kind}"
+        path = os.path.join(output_dir, relative_path)
+        written = not os.path.exists(path)
+        if written:
+            _write_file(path, content)
+        if written or not _siblings_current(path, compact):
+            _compress_outputs(output_dir, [relative_path], compact)
+        assets[kind] = relative_path
+
+    return assets
+
+
+def render_lesson(mirror_path, lesson_id, output_dir, assets, compact=False):
+    """
+    Render the data shard and page of one lesson from the mirror
+
+    Runs in a worker process, so it opens its own mirror connection.
+
+    Args:
+        mirror_path (str): Path to the SQLite lesson mirror
+        lesson_id (str): Lesson to render
+        output_dir (str): Site directory
+        assets (dict): Asset paths returned by write_assets
+        compact (bool): Minify the page and write .gz and .br copies of page and data
+
+    Returns:
+        dict: Manifest entry with title, slideCount, data and page paths
+    """
+    conn = lesson_mirror.open_mirror(mirror_path)
+    try:
+        lesson_data = lesson_mirror.mirror_lesson(conn, lesson_id).to_dict()
+        lesson_data['slides'] = student_lesson_viewer.prepare_slides(
+            [slide.to_dict() for slide in lesson_mirror.mirror_slides(conn, lesson_id)]
+        )
+    finally:
+        conn.close()
+
+    shard = json.dumps(lesson_data, separators=(',', ':'), ensure_ascii=False)
+    data_path = f"{DATA_DIR}/{lesson_id}.{content_hash(shard)}.json"
+    _write_file(os.path.join(output_dir, data_path), shard)
+
+    # Pages live one directory down, so every link goes through ..; compact pages load precompressed copies
+    suffix = precompress.served_suffix(compact)
+    lessons_index = [{
+        'id': lesson_id,
+        'title': lesson_data.get('title'),
+        'slideCount': len(lesson_data['slides']),
+        'shard': f"../{data_path}{suffix}"
+    }]
+
+    page_path = f"{PAGE_DIR}/{lesson_id}.html"
+    tmp_path = os.path.join(output_dir, f"{page_path}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        student_lesson_viewer.render_viewer_page(
+            f,
+            lessons_index,
+            title=f"Logit LMS - {lesson_data.get('title') or lesson_id}",
+            styles=f'<link rel="stylesheet" href="../{assets["css"]}{suffix}">',
+            scripts=f'<script src="../{assets["js"]}{suffix}"></script>',
+            compact=compact,
+            search_index_url=f"../{SEARCH_INDEX_NAME}{suffix}",
+            lesson_url="{id}.html"
+        )
+    os.replace(tmp_path, os.path.join(output_dir, page_path))
+
+    _compress_outputs(output_dir, [data_path, page_path], compact)
+
+    return {
+        'title': lesson_data.get('title'),
+        'slideCount': len(lesson_data['slides']),
+        'data': data_path,
+        'page': page_path
+    }
+
+
+def _select_lessons(conn, lesson_ids=None, module_id=None):
+    # Lesson IDs in the order they appear on the index page
+    if lesson_ids:
+        return [lesson_id for lesson_id in lesson_ids if lesson_mirror.mirror_lesson(conn, lesson_id)]
+
+    lessons = list(lesson_mirror.mirror_lessons(conn))
+    if module_id:
+        lessons = [lesson for lesson in lessons if lesson.get('module_id') == module_id]
+        lessons.sort(key=lambda lesson: lesson.get('sortcode') or 0)
+    return [lesson.id for lesson in lessons]
+
+
+def write_search_index(mirror_path, output_dir, lesson_ids, compact=False):
+    """
+    Rebuild the site search index from the mirror, rewriting it only if it changed
+
+    The .gz and .br siblings are checked on their own, and written or removed
+    to match compact even when the index itself is unchanged.
+
+    Returns:
+        bool: True if the index file was written
+    """
+    conn = lesson_mirror.open_mirror(mirror_path)
+    try:
+        lessons = [
+            (lesson_id, lesson_mirror.mirror_lesson(conn, lesson_id).to_dict(),
+             student_lesson_viewer.prepare_slides(
+                 [slide.to_dict() for slide in lesson_mirror.mirror_slides(conn, lesson_id)]
+             ))
+            for lesson_id in lesson_ids
+        ]
+    finally:
+        conn.close()
+
+    content = json.dumps(search_index.build_index(lessons), separators=(',', ':'), ensure_ascii=False)
+    path = os.path.join(output_dir, SEARCH_INDEX_NAME)
+
+    unchanged = False
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            unchanged = f.read() == content
+
+    if not unchanged:
+        _write_file(path, content)
+
+    # The index is the same in both modes, so switching modes still has to add or remove its siblings
+    if not unchanged or not _siblings_current(path, compact):
+        _compress_outputs(output_dir, [SEARCH_INDEX_NAME], compact)
+
+    return not unchanged
+
+
+def write_index_page(output_dir, lesson_ids, lessons, assets, compact=False):
+    """
+    Write index.html linking every lesson page, in display order
+    """
+    templates = [INDEX_PAGE_START, INDEX_LESSON, INDEX_PAGE_END]
+    if compact:
+        templates = [template.minified() for template in templates]
+    page_start, lesson_link, page_end = templates
+
+    index_path = os.path.join(output_dir, 'index.html')
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        page_start.render_to(
+            f,
+            stylesheet=assets['css'] + precompress.served_suffix(compact),
+            generated_on=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        for lesson_id in lesson_ids:
+            entry = lessons[lesson_id]
+            lesson_link.render_to(
+                f,
+                href=entry['page'],
+                title=entry['title'] or lesson_id,
+                slide_count=entry['slideCount']
+            )
+        page_end.render_to(f)
+    os.replace(tmp_path, index_path)
+
+    _compress_outputs(output_dir, ['index.html'], compact)
+
+
+def build_viewer_site(mirror_path=lesson_mirror.DEFAULT_MIRROR_PATH, output_dir=DEFAULT_SITE_DIR,
+                      lesson_ids=None, module_id=None, max_workers=None, force=False, compact=False):
+    """
+    Incrementally build a static site with one viewer page per lesson
+
+    The build manifest records the mirror version of every rendered lesson
+    (lesson and slide update times). Only lessons whose version changed
+    since the last build are rendered again, in parallel worker processes;
+    pages of removed lessons are deleted. Assets and data shards use
+    content-hashed names, so unchanged files keep their URLs between builds.
+
+    Args:
+        mirror_path (str): Path to the SQLite lesson mirror
+        output_dir (str): Site directory
+        lesson_ids (list): Only build these lessons, in this order (optional)
+        module_id (str): Only build lessons of this module, in sortcode order (optional)
+        max_workers (int): Number of worker processes (defaults to the CPU count)
+        force (bool): Render every lesson even if it is unchanged
+        compact (bool): Minify pages and assets and write .gz and .br copies of every file
+
+    Returns:
+        dict: Counts of rendered, unchanged and removed lessons
+    """
+    for directory in (output_dir, os.path.join(output_dir, DATA_DIR), os.path.join(output_dir, PAGE_DIR)):
+        os.makedirs(directory, exist_ok=True)
+
+    manifest = load_manifest(output_dir)
+    assets = write_assets(output_dir, compact)
+
+    # Pages reference the assets, and the compressed copies they load, by name, so either change means new pages
+    if (manifest.get('assets') != assets or manifest.get('build') != BUILD_VERSION
+            or manifest.get('compact', False) != compact
+            or manifest.get('servedSuffix', '') != precompress.served_suffix(compact)):
+        force = True
+
+    conn = lesson_mirror.open_mirror(mirror_path)
+    try:
+        selected = _select_lessons(conn, lesson_ids, module_id)
+        versions = lesson_mirror.lesson_versions(conn)
+    finally:
+        conn.close()
+
+    previous = manifest.get('lessons', {})
+    changed = [
+        lesson_id for lesson_id in selected
+        if force or previous.get(lesson_id, {}).get('version') != versions[lesson_id]
+    ]
+
+    lessons = {lesson_id: previous[lesson_id] for lesson_id in selected if lesson_id not in changed}
+
+    if changed:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                lesson_id: executor.submit(render_lesson, mirror_path, lesson_id, output_dir, assets, compact)
+                for lesson_id in changed
+            }
+            for lesson_id, future in futures.items():
+                entry = future.result()
+                entry['version'] = versions[lesson_id]
+                lessons[lesson_id] = entry
+                print(f"  Rendered {lesson_id} ({entry['slideCount']} slides)")
+
+    # Remove shards replaced by a new version and pages of lessons no longer built
+    removed = 0
+    for lesson_id, old_entry in previous.items():
+        new_entry = lessons.get(lesson_id)
+        if new_entry is None:
+            _remove(output_dir, old_entry['page'])
+            removed += 1
+        if new_entry is None or new_entry['data'] != old_entry['data']:
+            _remove(output_dir, old_entry['data'])
+
+    for kind, old_path in manifest.get('assets', {}).items():
+        if assets.get(kind) != old_path:
+            _remove(output_dir, old_path)
+
+    if changed or removed or force or not os.path.exists(os.path.join(output_dir, SEARCH_INDEX_NAME)):
+        write_search_index(mirror_path, output_dir, selected, compact)
+
+    write_index_page(output_dir, selected, lessons, assets, compact)
+
+    save_manifest(output_dir, {
+        'build': BUILD_VERSION,
+        'compact': compact,
+        'servedSuffix': precompress.served_suffix(compact),
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'assets': assets,
+        'lessons': lessons
+    })
+
+    return {'rendered': len(changed), 'unchanged': len(selected) - len(changed), 'removed': removed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Incrementally build static per-lesson viewer pages from the lesson mirror')
+    parser.add_argument('lesson_ids', nargs='*', help='Only build these lessons (defaults to every mirrored lesson)')
+    parser.add_argument('--mirror', default=lesson_mirror.DEFAULT_MIRROR_PATH, help='Path to the SQLite mirror file')
+    parser.add_argument('--output', default=DEFAULT_SITE_DIR, help='Site directory')
+    parser.add_argument('--module-id', help='Only build lessons of this module, in sortcode order')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (defaults to the CPU count)')
+    parser.add_argument('--force', action='store_true', help='Render every lesson even if it is unchanged')
+    parser.add_argument('--compact', action='store_true',
+                        help='Minify pages and assets and write precompressed .gz and .br files')
+    parser.add_argument('--sync', metavar='CREDENTIALS', nargs='?', const=firebase_client.DEFAULT_CREDENTIALS_PATH,
+                        help='Sync the mirror from Firestore before building')
+
+    args = parser.parse_args()
+
+    if args.sync:
+        conn = lesson_mirror.open_mirror(args.mirror)
+        stats = lesson_mirror.sync_mirror(firebase_client.get_firestore(args.sync), conn)
+        conn.close()
+        print(f"Mirror synced: {stats['lessons_fetched']} lessons, {stats['slides_fetched']} slides fetched")
+
+    print(f"Building viewer site in: {args.output}")
+
+    stats = build_viewer_site(
+        args.mirror,
+        args.output,
+        args.lesson_ids,
+        args.module_id,
+        args.workers,
+        args.force,
+        args.compact
+    )
+
+    print(f"Rendered: {stats['rendered']}, unchanged: {stats['unchanged']}, removed: {stats['removed']}")
+    print(f"Site index: {os.path.join(args.output, 'index.html')}")